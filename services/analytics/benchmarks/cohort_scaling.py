@@ -0,0 +1,104 @@
+"""
+Cohort Scaling Benchmark
+Wall time of cross-user cohort metrics as worker processes are added
+
+Seeds a synthetic population, then runs the sharded cohort computation
+with an increasing number of workers (four shards per worker) and prints
+the speedup over a single worker. Every run computes the same merged
+result, which is checked against the single-worker run.
+
+Point ANALYTICS_DATABASE_URL at Postgres for representative numbers; the
+SQLite default serializes readers on one file and will not scale.
+
+    python benchmarks/cohort_scaling.py --users 1000000 --sessions-per-user 3 --workers 1 2 4 8
+"""
+
+from datetime import datetime, timedelta
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+SERVICES_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, SERVICES_DIR)
+os.environ.setdefault("ANALYTICS_DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+
+from sqlalchemy import insert  # noqa: E402
+
+from analytics.database.connection import engine  # noqa: E402
+from analytics.database.tables import focus_sessions, metadata  # noqa: E402
+from analytics.services.metrics_calculator import CohortMetricsCalculator  # noqa: E402
+
+SESSION_TYPES = ("pomodoro", "deep_work", "short_break", "custom")
+
+
+def seed(users: int, sessions_per_user: int, batch_size: int = 50000):
+    metadata.drop_all(engine)
+    metadata.create_all(engine)
+
+    now = datetime.utcnow()
+    batch = []
+    with engine.begin() as connection:
+        for user in range(users):
+            first = now - timedelta(days=random.randrange(120))
+            for n in range(sessions_per_user):
+                start = first + timedelta(days=n * random.randrange(1, 15), hours=random.randrange(24))
+                actual = random.randrange(5, 60)
+                batch.append({
+                    "user_id": f"user-{user:07d}",
+                    "session_type": random.choice(SESSION_TYPES),
+                    "status": "completed" if actual > 20 else "cancelled",
+                    "start_time": start,
+                    "start_date": start.date(),
+                    "start_hour": start.hour,
+                    "end_time": start + timedelta(minutes=actual),
+                    "planned_duration": 50,
+                    "actual_duration": actual,
+                    "productivity_score": random.uniform(1, 10),
+                    "interruption_count": random.randrange(4)
+                })
+                if len(batch) >= batch_size:
+                    connection.execute(insert(focus_sessions), batch)
+                    batch = []
+        if batch:
+            connection.execute(insert(focus_sessions), batch)
+
+
+def run(workers: int, chunk_size: int):
+    calculator = CohortMetricsCalculator(workers=workers, shards=workers * 4, chunk_size=chunk_size)
+    try:
+        # Warm the pool so process start-up is not counted
+        calculator._get_executor().submit(int).result()
+        started = time.perf_counter()
+        partial = calculator.compute_partial()
+        return time.perf_counter() - started, partial
+    finally:
+        calculator.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000000)
+    parser.add_argument("--sessions-per-user", type=int, default=3)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    seed(args.users, args.sessions_per_user)
+    print(f"seeded {args.users} users x {args.sessions_per_user} sessions in {time.perf_counter() - started:.1f}s")
+
+    baseline = None
+    for workers in args.workers:
+        elapsed, partial = run(workers, args.chunk_size)
+        if baseline is None:
+            baseline = (elapsed, partial.users, partial.cohort_users)
+        elif (partial.users, partial.cohort_users) != baseline[1:]:
+            raise SystemExit(f"{workers} workers produced a different result")
+        print(f"{workers:3d} workers: {elapsed:8.2f}s  speedup {baseline[0] / elapsed:5.2f}x  ({partial.users} users)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+from sqlalchemy import (
+    func, select, MetaData, Table, Column, Integer, SmallInteger, String, Boolean, Date, DateTime, Float, Uuid
+)
+
+# Tables are owned and migrated by the focus engine; analytics only reads them,
+# so they are mirrored here as Core tables and never created from this service
+metadata = MetaData()
+
+# Sessions still running have no outcome yet
+OPEN_SESSION_STATUSES = ("active", "paused")
+
+focus_sessions = Table(
+    "focus_sessions",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("session_uuid", Uuid),
+    Column("user_id", String(255)),
+    Column("session_type", String(50)),
+    Column("status", String(20)),
+    Column("start_time", DateTime),
+    Column("start_date", Date),
+    Column("start_hour", SmallInteger),
+    Column("end_time", DateTime),
+    Column("planned_duration", Integer),
+    Column("actual_duration", Integer),
+    Column("completion_reason", String(50)),
+    Column("completion_rate", Float),
+    Column("productivity_score", Float),
+    Column("interruption_count", Integer),
+    Column("focus_quality", String(50)),
+    Column("playlist_id", String(255)),
+    Column("updated_at", DateTime)
+)
+
+users = Table(
+    "users",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("username", String(255)),
+    Column("created_at", DateTime),
+    Column("is_active", Boolean)
+)
+
+
+def user_data_version(connection, user_id: str) -> tuple:
+    """Fingerprint of a user's sessions for cache validation
+    
+    The focus engine's analytics version counters live in its own
+    processes, so the version is read from the data: session count,
+    highest id, latest end_time and latest updated_at. Count and id move
+    on inserts and deletes, end_time on completions, and updated_at on
+    every write including in-place edits such as focus_quality and
+    productivity_score.
+    """
+    return tuple(connection.execute(
+        select(
+            func.count(focus_sessions.c.id),
+            func.max(focus_sessions.c.id),
+            func.max(focus_sessions.c.end_time),
+            func.max(focus_sessions.c.updated_at)
+        ).where(focus_sessions.c.user_id == user_id)
+    ).one())
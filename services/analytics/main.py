@@ -0,0 +1,87 @@
+"""
+Focus Flow - Analytics Service
+Main FastAPI application for cross-session analytics and data exports
+"""
+
+from fastapi import FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+from contextlib import asynccontextmanager, suppress
+import asyncio
+import uvicorn
+import logging
+
+from analytics.config.settings import get_settings
+from analytics.routers import comparisons, export, metrics
+from analytics.services.comparative_analyzer import comparative_analyzer
+from analytics.services.metrics_calculator import cohort_calculator
+
+# initialize settings and logging
+settings = get_settings()
+logging.basicConfig(level=settings.log_level)
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """application lifespan management"""
+    logger.info("📊 analytics service starting up...")
+    sketch_refresher = asyncio.create_task(
+        comparative_analyzer.run_refresher(settings.comparison_refresh_seconds)
+    )
+    yield
+    logger.info("📴 analytics service shutting down...")
+    sketch_refresher.cancel()
+    with suppress(asyncio.CancelledError):
+        await sketch_refresher
+    cohort_calculator.shutdown()
+
+# create fastapi application
+app = FastAPI(
+    title="Focus Flow - Analytics",
+    description="Cross-session analytics, trends, comparisons and data exports",
+    version="1.0.0",
+    docs_url="/docs" if settings.debug_mode else None,
+    redoc_url="/redoc" if settings.debug_mode else None,
+    lifespan=lifespan
+)
+
+# configure cors
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=settings.cors_origins,
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+app.include_router(export.router, prefix=f"{settings.api_prefix}/export", tags=["export"])
+app.include_router(metrics.router, prefix=f"{settings.api_prefix}/metrics", tags=["metrics"])
+app.include_router(comparisons.router, prefix=f"{settings.api_prefix}/comparisons", tags=["comparisons"])
+
+@app.get("/health")
+async def health_check():
+    """health check endpoint"""
+    return {
+        "status": "healthy",
+        "service": "analytics",
+        "version": "1.0.0"
+    }
+
+@app.get("/")
+async def root():
+    """root endpoint with service information"""
+    return {
+        "service": "Focus Flow - Analytics",
+        "version": "1.0.0",
+        "status": "operational",
+        "description": "Cross-session analytics, trends, comparisons and data exports",
+        "port": settings.port
+    }
+
+if __name__ == "__main__":
+    uvicorn.run(
+        "analytics.main:app",
+        host=settings.host,
+        port=settings.port,
+        reload=settings.debug_mode,
+        log_level=settings.log_level.lower()
+    )
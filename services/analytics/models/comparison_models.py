@@ -0,0 +1,45 @@
+from pydantic import BaseModel
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional
+
+
+class MetricPercentile(BaseModel):
+    """A user's weekly value for one metric and its percentile among active users"""
+    metric: str
+    value: Optional[float] = None
+    percentile: Optional[float] = None
+    population: int
+    population_median: Optional[float] = None
+
+
+class PercentileComparison(BaseModel):
+    """Pydantic model for population comparison API responses"""
+    user_id: str
+    week_start: date
+    metrics: List[MetricPercentile]
+    population_built_at: Optional[datetime] = None
+
+
+class MetricChange(BaseModel):
+    """One metric in both periods, with the difference"""
+    current: float
+    previous: float
+    delta: float
+    percent_change: Optional[float] = None
+
+
+class PeriodSummary(BaseModel):
+    """A period's date range and its user stats"""
+    start_date: date
+    end_date: date
+    stats: Dict[str, Any]
+
+
+class PeriodComparisonResponse(BaseModel):
+    """Pydantic model for period-over-period comparison API responses"""
+    user_id: str
+    preset: str
+    current: PeriodSummary
+    previous: PeriodSummary
+    changes: Dict[str, MetricChange]
+    distribution_changes: Dict[str, Dict[str, MetricChange]]
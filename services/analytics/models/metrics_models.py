@@ -0,0 +1,38 @@
+from pydantic import BaseModel, Field
+from datetime import date, datetime
+from typing import Dict, List, Optional
+
+
+class SessionTypeCompletion(BaseModel):
+    """Completion and productivity for one session type across all users"""
+    total_sessions: int
+    completed_sessions: int
+    completion_rate: float
+    average_productivity_score: float
+    average_actual_duration: float
+
+
+class WeekdayFocus(BaseModel):
+    """Focus minutes started on one weekday across all users"""
+    weekday: str
+    total_sessions: int
+    total_focus_time_minutes: int
+    completed_focus_time_minutes: int
+
+
+class RetentionCohort(BaseModel):
+    """Share of a signup week's users active in each following week"""
+    signup_week: date
+    users: int
+    retention: List[float] = Field(description="Index 0 is the signup week itself")
+
+
+class CohortMetricsResponse(BaseModel):
+    """Pydantic model for cohort metrics API responses"""
+    total_users: int
+    total_sessions: int
+    completion_by_session_type: Dict[str, SessionTypeCompletion]
+    focus_minutes_by_weekday: List[WeekdayFocus]
+    retention_by_signup_week: List[RetentionCohort]
+    since: Optional[datetime] = None
+    computed_at: datetime
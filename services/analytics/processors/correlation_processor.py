@@ -0,0 +1,170 @@
+"""
+Correlation Processor
+Vectorized Pearson and Spearman correlations between session factors and outcomes
+"""
+
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Numeric factors taken straight from session columns
+NUMERIC_FACTORS = ("start_hour", "planned_duration", "interruption_count")
+
+# Outcomes every factor is correlated against
+OUTCOMES = ("completed", "productivity_score")
+
+# Pairs with fewer complete observations than this are reported as None
+MIN_OBSERVATIONS = 5
+
+
+def _numpy() -> Any:
+    import numpy
+    return numpy
+
+
+class SessionFrame:
+    """Column-major feature matrix built from session rows
+
+    Numeric factors are used as-is, session types are one-hot encoded and
+    playlist use becomes a 0/1 flag. Missing values are NaN, and every
+    correlation is computed over the rows where both columns are present.
+    """
+
+    def __init__(self, columns: List[str], matrix: Any):
+        self.columns = columns
+        self.matrix = matrix
+
+    @property
+    def rows(self) -> int:
+        return self.matrix.shape[0]
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Any]) -> "SessionFrame":
+        """Build a frame from rows with the session columns as attributes"""
+        np = _numpy()
+
+        numeric: List[Tuple[float, ...]] = []
+        session_types: List[str] = []
+        for row in rows:
+            numeric.append((
+                *(getattr(row, name) for name in NUMERIC_FACTORS),
+                0.0 if row.playlist_id is None else 1.0,
+                1.0 if row.status == "completed" else 0.0,
+                row.productivity_score
+            ))
+            session_types.append(row.session_type or "unknown")
+
+        base_columns = [*NUMERIC_FACTORS, "has_playlist", *OUTCOMES]
+        if not numeric:
+            return cls(base_columns, np.empty((0, len(base_columns))))
+
+        # None becomes NaN on conversion to float
+        values = np.array(numeric, dtype=float)
+
+        kinds, codes = np.unique(np.array(session_types), return_inverse=True)
+        one_hot = (codes[:, None] == np.arange(len(kinds))[None, :]).astype(float)
+
+        # Outcomes go last so factor columns are contiguous
+        factors = np.hstack([values[:, :-len(OUTCOMES)], one_hot, values[:, -len(OUTCOMES):]])
+        columns = [*NUMERIC_FACTORS, "has_playlist", *(f"type_{kind}" for kind in kinds), *OUTCOMES]
+        return cls(columns, factors)
+
+
+class CorrelationProcessor:
+    """Correlation matrices over a SessionFrame in a handful of matrix products"""
+
+    @staticmethod
+    def pearson(matrix: Any) -> Tuple[Any, Any]:
+        """Pairwise-complete Pearson correlation matrix and pair counts
+
+        With a 0/1 mask of present values, every pairwise sum is a product
+        of the masked matrix and the mask, so no pair is visited in Python.
+        """
+        np = _numpy()
+
+        present = ~np.isnan(matrix)
+        mask = present.astype(float)
+
+        # Centre on column means first to keep the sums well conditioned
+        means = np.where(present, matrix, 0.0).sum(axis=0) / np.maximum(present.sum(axis=0), 1)
+        values = np.where(present, matrix - means, 0.0)
+
+        counts = mask.T @ mask
+        sum_x = values.T @ mask
+        sum_y = sum_x.T
+        sum_xx = (values ** 2).T @ mask
+        sum_yy = sum_xx.T
+        sum_xy = values.T @ values
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            covariance = sum_xy - sum_x * sum_y / counts
+            variance_x = sum_xx - sum_x ** 2 / counts
+            variance_y = sum_yy - sum_y ** 2 / counts
+            correlation = covariance / np.sqrt(variance_x * variance_y)
+
+        # Constant columns and thin pairs have no meaningful correlation
+        correlation[(counts < MIN_OBSERVATIONS) | ~np.isfinite(correlation)] = np.nan
+        return np.clip(correlation, -1.0, 1.0), counts
+
+    @staticmethod
+    def spearman(matrix: Any) -> Tuple[Any, Any]:
+        """Spearman correlation: Pearson over per-column average ranks
+
+        Columns are ranked over their present values once, rather than
+        re-ranked for every pair, which approximates pairwise-complete
+        Spearman when values are missing.
+        """
+        return CorrelationProcessor.pearson(CorrelationProcessor.rank(matrix))
+
+    @staticmethod
+    def rank(matrix: Any) -> Any:
+        """Average ranks per column (ties share their mean rank), NaN kept as NaN"""
+        np = _numpy()
+
+        ranks = np.full(matrix.shape, np.nan)
+        for column in range(matrix.shape[1]):
+            values = matrix[:, column]
+            present = ~np.isnan(values)
+            if not present.any():
+                continue
+
+            unique, inverse, counts = np.unique(values[present], return_inverse=True, return_counts=True)
+            upper = np.cumsum(counts)
+            average = upper - (counts - 1) / 2
+            ranks[present, column] = average[inverse]
+        return ranks
+
+    @staticmethod
+    def correlate(frame: SessionFrame, method: str = "pearson") -> Dict[str, Any]:
+        """Full labelled matrix plus each outcome's factors ranked by strength"""
+        np = _numpy()
+
+        if method == "pearson":
+            correlation, counts = CorrelationProcessor.pearson(frame.matrix)
+        elif method == "spearman":
+            correlation, counts = CorrelationProcessor.spearman(frame.matrix)
+        else:
+            raise ValueError(f"Unsupported correlation method: {method}")
+
+        def value(i: int, j: int) -> Optional[float]:
+            r = correlation[i, j]
+            return None if np.isnan(r) else round(float(r), 3)
+
+        columns = frame.columns
+        factor_columns = [name for name in columns if name not in OUTCOMES]
+
+        outcomes = {}
+        for outcome in OUTCOMES:
+            j = columns.index(outcome)
+            factors = [
+                {"factor": name, "correlation": value(i, j), "observations": int(counts[i, j])}
+                for i, name in enumerate(columns) if name in factor_columns
+            ]
+            factors.sort(key=lambda item: -abs(item["correlation"]) if item["correlation"] is not None else 1)
+            outcomes[outcome] = factors
+
+        return {
+            "method": method,
+            "sessions": frame.rows,
+            "columns": columns,
+            "matrix": [[value(i, j) for j in range(len(columns))] for i in range(len(columns))],
+            "outcomes": outcomes
+        }
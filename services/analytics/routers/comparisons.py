@@ -0,0 +1,48 @@
+"""
+Comparisons Router
+How a user compares with everyone else
+"""
+
+from fastapi import APIRouter, HTTPException, Query
+from starlette.concurrency import run_in_threadpool
+from datetime import date
+from typing import Optional
+import logging
+
+from analytics.models.comparison_models import PercentileComparison, PeriodComparisonResponse
+from analytics.services.comparative_analyzer import comparative_analyzer, period_comparator, WeekNotReadyError
+
+logger = logging.getLogger("analytics.routers.comparisons")
+router = APIRouter()
+
+
+@router.get("/users/{user_id}/percentiles", response_model=PercentileComparison)
+async def get_user_percentiles(
+    user_id: str,
+    week: Optional[date] = Query(None, description="Any day in the week to compare; defaults to this week")
+):
+    """Percentiles for weekly focus minutes, completion rate and quality score"""
+    
+    try:
+        return await run_in_threadpool(comparative_analyzer.user_percentiles, user_id, week)
+    except WeekNotReadyError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "60"})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/users/{user_id}/periods", response_model=PeriodComparisonResponse)
+async def compare_periods(
+    user_id: str,
+    preset: str = Query("week_over_week", pattern="^(week_over_week|month_over_year|custom)$"),
+    start: Optional[date] = Query(None, description="Custom period start (inclusive)"),
+    end: Optional[date] = Query(None, description="Custom period end (inclusive)"),
+    compare_start: Optional[date] = Query(None, description="Start of the custom comparison period; "
+                                                            "defaults to the period just before")
+):
+    """Compare every user stat between two periods with deltas and percentage change"""
+    
+    try:
+        return await run_in_threadpool(period_comparator.compare, user_id, preset, start, end, compare_start)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
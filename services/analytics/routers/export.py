@@ -0,0 +1,93 @@
+"""
+Export Router
+Streaming downloads of session history
+"""
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional
+import logging
+import uuid
+
+from analytics.config.settings import get_settings
+from analytics.services.export_service import export_service, EXPORT_FORMATS
+
+logger = logging.getLogger("analytics.routers.export")
+router = APIRouter()
+settings = get_settings()
+
+
+@router.get("/sessions")
+def export_sessions(
+    export_format: str = Query("ndjson", alias="format", pattern="^(csv|ndjson|arrow|parquet)$"),
+    user_id: Optional[str] = Query(None, description="Export one user; all users when omitted"),
+    after_start_time: Optional[datetime] = Query(None, description="Resume after this start_time"),
+    after_id: Optional[int] = Query(None, description="Resume after this id at after_start_time"),
+    until: Optional[datetime] = Query(None, description="Only sessions started before this time"),
+    columns: Optional[List[str]] = Query(None),
+    gzip: bool = Query(False, description="Compress csv/ndjson downloads with gzip")
+):
+    """Stream sessions ordered by (start_time, id)
+    
+    To resume an interrupted download, pass the start_time and id of the
+    last row received as after_start_time and after_id.
+    """
+    
+    filters = {
+        "user_id": user_id,
+        "after_start_time": after_start_time,
+        "after_id": after_id,
+        "until": until,
+        "columns": columns
+    }
+    
+    try:
+        body = export_service.stream(export_format, compress=gzip, **filters)
+    except ImportError:
+        raise HTTPException(status_code=501, detail=f"{export_format} export requires pyarrow")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    filename = f"sessions.{export_format}" + (".gz" if gzip else "")
+    media_type = "application/gzip" if gzip else EXPORT_FORMATS[export_format]
+    
+    logger.info(f"Starting {filename} export for {user_id or 'all users'}")
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+@router.post("/sessions/partitioned")
+async def export_sessions_partitioned(
+    export_format: str = Query("parquet", alias="format", pattern="^(arrow|parquet)$"),
+    user_id: Optional[str] = Query(None, description="Export one user; all users when omitted"),
+    after_start_time: Optional[datetime] = Query(None),
+    until: Optional[datetime] = Query(None),
+    columns: Optional[List[str]] = Query(None)
+):
+    """Write a date-partitioned columnar export into the export directory
+    
+    Returns the manifest of files written, one per start_date.
+    """
+    
+    destination = Path(settings.export_directory) / str(uuid.uuid4())
+    
+    try:
+        return await run_in_threadpool(
+            export_service.export_partitioned,
+            destination,
+            export_format,
+            user_id=user_id,
+            after_start_time=after_start_time,
+            until=until,
+            columns=columns
+        )
+    except ImportError:
+        raise HTTPException(status_code=501, detail=f"{export_format} export requires pyarrow")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -0,0 +1,48 @@
+"""
+Metrics Router
+Cohort and global metrics across all users
+"""
+
+from fastapi import APIRouter, HTTPException, Query
+from starlette.concurrency import run_in_threadpool
+from datetime import datetime
+from typing import Optional
+import logging
+
+from analytics.models.metrics_models import CohortMetricsResponse
+from analytics.services.correlation_service import correlation_service
+from analytics.services.metrics_calculator import cohort_calculator
+
+logger = logging.getLogger("analytics.routers.metrics")
+router = APIRouter()
+
+
+@router.get("/cohorts", response_model=CohortMetricsResponse)
+async def get_cohort_metrics(
+    since: Optional[datetime] = Query(None, description="Only sessions started at or after this time")
+):
+    """Completion by session type, focus minutes per weekday and retention by signup week
+    
+    Users are sharded across worker processes and each shard's partial
+    metrics are merged, so a run scans every session once. Results are
+    cached per since for cohort_cache_seconds.
+    """
+    
+    return await run_in_threadpool(cohort_calculator.compute, since)
+
+
+@router.get("/users/{user_id}/correlations")
+async def get_factor_correlations(
+    user_id: str,
+    days: int = Query(90, ge=7, le=365),
+    method: str = Query("pearson", pattern="^(pearson|spearman)$")
+):
+    """Correlations of session factors with completion and productivity
+    
+    Cached per user until their sessions change or the day ends.
+    """
+    
+    try:
+        return await run_in_threadpool(correlation_service.user_correlations, user_id, days, method)
+    except ImportError:
+        raise HTTPException(status_code=501, detail="Correlations require numpy")
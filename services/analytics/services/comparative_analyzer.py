@@ -0,0 +1,457 @@
+"""
+Comparative Analyzer
+Where a user stands against all users, answered from per-week quantile sketches,
+and how a user's periods compare, answered from daily rollups
+"""
+
+from sqlalchemy import case, func, or_, select
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+import asyncio
+import logging
+import threading
+
+from analytics.config.settings import get_settings
+from analytics.database.connection import engine
+from analytics.database.tables import focus_sessions, user_data_version, OPEN_SESSION_STATUSES
+from focus_flow_shared.session_aggregator import KLLSketch, SessionRollup, merge_all
+from analytics.services.metrics_calculator import week_start
+
+logger = logging.getLogger("analytics.comparisons")
+settings = get_settings()
+
+# Per-user weekly metrics compared against the population
+COMPARISON_METRICS = ("weekly_focus_minutes", "completion_rate", "quality_score")
+
+# Period presets; custom takes explicit dates
+PERIOD_PRESETS = ("week_over_week", "month_over_year", "custom")
+
+# Scalar user stats compared between periods, matching the focus engine's calculate_user_stats
+PERIOD_METRICS = (
+    "total_sessions",
+    "completed_sessions",
+    "completion_rate",
+    "total_focus_time_minutes",
+    "completed_focus_time_minutes",
+    "average_planned_duration",
+    "average_actual_duration",
+    "average_productivity_score",
+    "total_interruptions",
+    "average_interruptions_per_session",
+    "current_streak_days",
+    "longest_streak_days"
+)
+
+PERIOD_DISTRIBUTIONS = ("focus_quality_distribution", "session_type_distribution")
+
+
+class WeekNotReadyError(Exception):
+    """The population sketches for a retained week have not been built yet"""
+    pass
+
+
+class ComparativeAnalyzer:
+    """Population percentiles from one KLL sketch per metric and week
+
+    Each week's sketches hold one value per user active that week. The
+    current week is rebuilt on each refresh, and a week is rebuilt one
+    last time once it has closed, after which it is final. Refreshes are
+    also scheduled for the week boundary, so the new week is available as
+    soon as it starts. Percentile queries read the sketches and the
+    requesting user's own week, so they never scan the population.
+
+    The quality score is the user's mean self-assessed productivity score
+    for the week, the per-session quality input stored with every session.
+    """
+
+    def __init__(self, weeks: int = settings.comparison_weeks, k: int = settings.comparison_sketch_k):
+        self.weeks = weeks
+        self.k = k
+        self._sketches: Dict[date, Dict[str, KLLSketch]] = {}
+        self._built_at: Dict[date, datetime] = {}
+        self._lock = threading.Lock()
+
+    def retained_weeks(self, today: Optional[date] = None) -> List[date]:
+        """The current week and the preceding closed weeks, oldest first"""
+        current = week_start(today or datetime.utcnow().date())
+        return [current - timedelta(weeks=offset) for offset in range(self.weeks - 1, -1, -1)]
+
+    def refresh(self, now: Optional[datetime] = None):
+        """Rebuild the current week, build closed weeks not yet final and drop expired weeks"""
+
+        now = now or datetime.utcnow()
+        weeks = self.retained_weeks(now.date())
+        current = weeks[-1]
+
+        # The new week first, so it is served as soon as possible after the boundary
+        self._build_week(current, now)
+        for week in weeks[:-1]:
+            with self._lock:
+                built_at = self._built_at.get(week)
+            if built_at is None or built_at < self._week_end(week):
+                self._build_week(week, now)
+
+        with self._lock:
+            for week in [week for week in self._sketches if week < weeks[0]]:
+                del self._sketches[week]
+                del self._built_at[week]
+
+    def user_percentiles(self, user_id: str, week: Optional[date] = None) -> Dict[str, Any]:
+        """The user's weekly metrics and their percentile among users active that week"""
+
+        week = week_start(week or datetime.utcnow().date())
+        if week not in self.retained_weeks():
+            raise ValueError(f"Comparisons are kept for the last {self.weeks} weeks only")
+
+        with self._lock:
+            sketches = self._sketches.get(week)
+            built_at = self._built_at.get(week)
+        if sketches is None:
+            raise WeekNotReadyError(f"Population data for the week of {week.isoformat()} is still being built")
+
+        with engine.connect() as connection:
+            row = connection.execute(
+                self._weekly_metrics_query(week).where(focus_sessions.c.user_id == user_id)
+            ).first()
+        values = self._metric_values(row) if row is not None else {
+            "weekly_focus_minutes": 0, "completion_rate": None, "quality_score": None
+        }
+
+        metrics = []
+        for metric in COMPARISON_METRICS:
+            sketch = sketches[metric]
+            value = values[metric]
+            percentile = round(sketch.rank(value) * 100, 1) if value is not None and sketch.count else None
+            median = sketch.quantile(0.5)
+            metrics.append({
+                "metric": metric,
+                "value": round(value, 3) if value is not None else None,
+                "percentile": percentile,
+                "population": sketch.count,
+                "population_median": round(median, 3) if median is not None else None
+            })
+
+        return {
+            "user_id": user_id,
+            "week_start": week,
+            "metrics": metrics,
+            "population_built_at": built_at
+        }
+
+    async def run_refresher(self, interval_seconds: float):
+        """Refresh sketches periodically until cancelled"""
+        while True:
+            try:
+                await asyncio.to_thread(self.refresh)
+            except Exception as e:
+                logger.error(f"Failed to refresh comparison sketches: {e}")
+            await asyncio.sleep(self.next_refresh_delay(interval_seconds))
+
+    def next_refresh_delay(self, interval_seconds: float, now: Optional[datetime] = None) -> float:
+        """Seconds until the next refresh: the interval, or less if the week ends sooner"""
+        now = now or datetime.utcnow()
+        until_week_end = (self._week_end(week_start(now.date())) - now).total_seconds()
+        return max(0.0, min(interval_seconds, until_week_end))
+
+    @staticmethod
+    def _week_end(week: date) -> datetime:
+        """The moment a week closes, which is the start of the next one"""
+        return datetime.combine(week + timedelta(weeks=1), datetime.min.time())
+
+    def _build_week(self, week: date, now: Optional[datetime] = None):
+        """Stream one row per active user for the week into fresh sketches"""
+
+        sketches = {metric: KLLSketch(k=self.k) for metric in COMPARISON_METRICS}
+
+        with engine.connect() as connection:
+            result = connection.execution_options(
+                stream_results=True,
+                yield_per=settings.export_chunk_size
+            ).execute(self._weekly_metrics_query(week))
+
+            for row in result:
+                for metric, value in self._metric_values(row).items():
+                    sketches[metric].add(value)
+
+        # Swapped in whole, so readers never see a half-built week
+        with self._lock:
+            self._sketches[week] = sketches
+            self._built_at[week] = now or datetime.utcnow()
+
+        logger.info(f"Built comparison sketches for the week of {week.isoformat()} "
+                    f"over {sketches['weekly_focus_minutes'].count} users")
+
+    @staticmethod
+    def _weekly_metrics_query(week: date) -> Any:
+        minutes = func.coalesce(focus_sessions.c.actual_duration, focus_sessions.c.planned_duration, 0)
+        return select(
+            focus_sessions.c.user_id,
+            func.sum(minutes).label("minutes"),
+            func.count(focus_sessions.c.id).label("sessions"),
+            func.sum(case((focus_sessions.c.status == "completed", 1), else_=0)).label("completed"),
+            func.avg(focus_sessions.c.productivity_score).label("quality")
+        ).where(
+            focus_sessions.c.start_date.between(week, week + timedelta(days=6)),
+            focus_sessions.c.status.notin_(OPEN_SESSION_STATUSES)
+        ).group_by(focus_sessions.c.user_id)
+
+    @staticmethod
+    def _metric_values(row: Any) -> Dict[str, Optional[float]]:
+        return {
+            "weekly_focus_minutes": row.minutes or 0,
+            "completion_rate": row.completed / row.sessions if row.sessions else None,
+            "quality_score": float(row.quality) if row.quality is not None else None
+        }
+
+
+
+def _days(start: date, end: date) -> Iterator[date]:
+    for offset in range((end - start).days + 1):
+        yield start + timedelta(days=offset)
+
+
+class PeriodComparator:
+    """Period-over-period user stats from per-day SessionRollup partials
+
+    A user's rollups are cached with their data version. Each comparison
+    only reads the days it has not seen yet, in one query for both periods,
+    and answers each period by merging its days' rollups. Once the days
+    are cached, changing the periods costs no session reads at all. When
+    the version moves only the days that changed are dropped and re-read:
+    days with sessions written since the last seen updated_at, and days
+    whose session count no longer matches their rollup after a delete.
+    """
+
+    def __init__(self, max_users: int = settings.rollup_cache_max_users,
+                 max_days: int = settings.max_comparison_days):
+        self.max_users = max_users
+        self.max_days = max_days
+        # user_id -> (data version, day -> rollup, days already read)
+        self._rollups: "OrderedDict[str, Tuple[Tuple, Dict[date, SessionRollup], Set[date]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def resolve_periods(self, preset: str, start: Optional[date] = None, end: Optional[date] = None,
+                        compare_start: Optional[date] = None,
+                        today: Optional[date] = None) -> Tuple[Tuple[date, date], Tuple[date, date]]:
+        """Current and previous (start, end) day ranges, both inclusive
+
+        Presets compare like for like: this week so far against the same
+        days last week, and this month so far against the same days of the
+        month a year earlier. A custom range is compared with the range of
+        the same length ending the day before it, or starting at compare_start.
+        """
+
+        today = today or datetime.utcnow().date()
+
+        if preset == "week_over_week":
+            current = (week_start(today), today)
+            previous = (current[0] - timedelta(weeks=1), today - timedelta(weeks=1))
+        elif preset == "month_over_year":
+            current = (today.replace(day=1), today)
+            last_year = current[0].replace(year=current[0].year - 1)
+            # Clamped for February 29th
+            month_end = (last_year.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+            previous = (last_year, min(last_year + (today - current[0]), month_end))
+        elif preset == "custom":
+            if start is None or end is None:
+                raise ValueError("Custom comparisons need start and end dates")
+            if end < start:
+                raise ValueError("end must not be before start")
+            current = (start, end)
+            length = end - start
+            previous_start = compare_start or start - length - timedelta(days=1)
+            previous = (previous_start, previous_start + length)
+        else:
+            raise ValueError(f"Unsupported comparison preset: {preset}")
+
+        if (current[1] - current[0]).days + 1 > self.max_days:
+            raise ValueError(f"Periods are limited to {self.max_days} days")
+        return current, previous
+
+    def compare(self, user_id: str, preset: str, start: Optional[date] = None,
+                end: Optional[date] = None, compare_start: Optional[date] = None) -> Dict[str, Any]:
+        """Both periods' stats with deltas and percentage changes"""
+
+        current, previous = self.resolve_periods(preset, start, end, compare_start)
+        rollups = self._load_rollups(user_id, [current, previous])
+
+        current_stats = self._period_stats(rollups, *current)
+        previous_stats = self._period_stats(rollups, *previous)
+
+        changes = {
+            metric: self._change(current_stats[metric], previous_stats[metric])
+            for metric in PERIOD_METRICS
+        }
+        distribution_changes = {
+            name: {
+                key: self._change(current_stats[name].get(key, 0), previous_stats[name].get(key, 0))
+                for key in sorted(set(current_stats[name]) | set(previous_stats[name]))
+            }
+            for name in PERIOD_DISTRIBUTIONS
+        }
+
+        return {
+            "user_id": user_id,
+            "preset": preset,
+            "current": {"start_date": current[0], "end_date": current[1], "stats": current_stats},
+            "previous": {"start_date": previous[0], "end_date": previous[1], "stats": previous_stats},
+            "changes": changes,
+            "distribution_changes": distribution_changes
+        }
+
+    def _load_rollups(self, user_id: str, periods: List[Tuple[date, date]]) -> Dict[date, SessionRollup]:
+        """The user's cached day rollups, extended with any requested days not read yet"""
+
+        with engine.connect() as connection:
+            version = user_data_version(connection, user_id)
+
+            with self._lock:
+                cached = self._rollups.get(user_id)
+
+            if cached is None:
+                days, seen = {}, set()
+            elif cached[0] != version:
+                days, seen = dict(cached[1]), set(cached[2])
+                for day in self._changed_days(connection, user_id, cached[0], days, seen):
+                    days.pop(day, None)
+                    seen.discard(day)
+            else:
+                _, days, seen = cached
+
+            missing = sorted({day for period in periods for day in _days(*period)} - seen)
+
+            if missing:
+                fresh: Dict[date, SessionRollup] = {}
+                runs = self._runs(missing)
+                result = connection.execution_options(
+                    stream_results=True,
+                    yield_per=settings.export_chunk_size
+                ).execute(
+                    select(
+                        focus_sessions.c.start_date,
+                        focus_sessions.c.session_type,
+                        focus_sessions.c.status,
+                        focus_sessions.c.planned_duration,
+                        focus_sessions.c.actual_duration,
+                        focus_sessions.c.productivity_score,
+                        focus_sessions.c.interruption_count,
+                        focus_sessions.c.focus_quality
+                    ).where(
+                        focus_sessions.c.user_id == user_id,
+                        or_(*(focus_sessions.c.start_date.between(first, last) for first, last in runs))
+                    )
+                )
+                for row in result:
+                    if row.start_date not in fresh:
+                        fresh[row.start_date] = SessionRollup()
+                    fresh[row.start_date].add(row)
+
+        with self._lock:
+            # Copy so readers of the previous entry are unaffected
+            days = {**days, **fresh} if missing else days
+            seen = seen | set(missing)
+            self._rollups[user_id] = (version, days, seen)
+            self._rollups.move_to_end(user_id)
+            while len(self._rollups) > self.max_users:
+                self._rollups.popitem(last=False)
+
+        return days
+
+    @staticmethod
+    def _changed_days(connection: Any, user_id: str, previous_version: Tuple,
+                      days: Dict[date, SessionRollup], seen: Set[date]) -> Set[date]:
+        """Cached days whose sessions changed since previous_version was read"""
+
+        if not seen:
+            return set()
+
+        last_updated_at = previous_version[3]
+        if last_updated_at is None:
+            return set(seen)
+
+        # Writes can commit out of timestamp order, so recheck a little before the last one seen
+        changed = set(connection.execute(
+            select(focus_sessions.c.start_date).distinct().where(
+                focus_sessions.c.user_id == user_id,
+                focus_sessions.c.updated_at >= last_updated_at - timedelta(seconds=settings.rollup_change_slack_seconds)
+            )
+        ).scalars())
+
+        # Deletes leave no row behind, but do leave the day's count short of its rollup
+        counts = dict(connection.execute(
+            select(focus_sessions.c.start_date, func.count(focus_sessions.c.id)).where(
+                focus_sessions.c.user_id == user_id,
+                focus_sessions.c.start_date.between(min(seen), max(seen))
+            ).group_by(focus_sessions.c.start_date)
+        ).all())
+        for day in seen:
+            cached_count = days[day].totals.total_sessions if day in days else 0
+            if counts.get(day, 0) != cached_count:
+                changed.add(day)
+
+        return changed & seen
+
+    @staticmethod
+    def _runs(days: List[date]) -> List[Tuple[date, date]]:
+        """Collapse sorted days into (first, last) runs of consecutive days"""
+        runs = []
+        for day in days:
+            if runs and day - runs[-1][1] == timedelta(days=1):
+                runs[-1] = (runs[-1][0], day)
+            else:
+                runs.append((day, day))
+        return runs
+
+    @staticmethod
+    def _period_stats(rollups: Dict[date, SessionRollup], start: date, end: date) -> Dict[str, Any]:
+        """The calculate_user_stats report for a range of days, merged from its rollups"""
+
+        period = list(_days(start, end))
+        merged = merge_all((rollups[day] for day in period if day in rollups), SessionRollup())
+        totals = merged.totals
+
+        completed_days = [day in rollups and rollups[day].totals.completed_sessions > 0 for day in period]
+
+        # Streaks as of the end of the period
+        current_streak = 0
+        for completed in reversed(completed_days):
+            if not completed:
+                break
+            current_streak += 1
+
+        longest_streak = run = 0
+        for completed in completed_days:
+            run = run + 1 if completed else 0
+            longest_streak = max(longest_streak, run)
+
+        return {
+            "total_sessions": totals.total_sessions,
+            "completed_sessions": totals.completed_sessions,
+            "completion_rate": round(totals.completion_rate, 3),
+            "total_focus_time_minutes": totals.total_minutes,
+            "completed_focus_time_minutes": totals.completed_minutes,
+            "average_planned_duration": round(totals.planned_duration.mean, 1),
+            "average_actual_duration": round(totals.actual_duration.mean, 1),
+            "average_productivity_score": round(totals.productivity.mean, 2),
+            "total_interruptions": totals.total_interruptions,
+            "average_interruptions_per_session": round(totals.average_interruptions, 2),
+            "focus_quality_distribution": dict(merged.focus_quality.counts),
+            "session_type_distribution": dict(merged.session_types.counts),
+            "current_streak_days": current_streak,
+            "longest_streak_days": longest_streak
+        }
+
+    @staticmethod
+    def _change(current: float, previous: float) -> Dict[str, Optional[float]]:
+        delta = current - previous
+        return {
+            "current": current,
+            "previous": previous,
+            "delta": round(delta, 3),
+            "percent_change": round(delta / previous * 100, 1) if previous else None
+        }
+
+
+comparative_analyzer = ComparativeAnalyzer()
+period_comparator = PeriodComparator()
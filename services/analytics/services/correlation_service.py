@@ -0,0 +1,80 @@
+"""
+Correlation Service
+Per-user factor correlations, cached until the user's sessions change or the day ends
+"""
+
+from sqlalchemy import select
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+import logging
+import threading
+
+from analytics.config.settings import get_settings
+from analytics.database.connection import engine
+from analytics.database.tables import focus_sessions, user_data_version, OPEN_SESSION_STATUSES
+from analytics.processors.correlation_processor import CorrelationProcessor, SessionFrame
+
+logger = logging.getLogger("analytics.correlations")
+settings = get_settings()
+
+
+class CorrelationService:
+    """Factor correlations per user, recomputed only when the user's data version moves
+
+    The window is whole days ending today and today is part of the cache
+    key, so sessions ageing out of the window are dropped at the next day
+    even when the user's data has not changed.
+    """
+
+    def __init__(self, max_users: int = settings.correlation_cache_max_users):
+        self.max_users = max_users
+        self._cache: "OrderedDict[Tuple[str, int, str, date], Tuple[Tuple, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def user_correlations(self, user_id: str, days: int = 90, method: str = "pearson",
+                          today: Optional[date] = None) -> Dict[str, Any]:
+        """Correlate hour, session type, planned duration, interruptions and playlist use
+        with completion and productivity over the user's finished sessions"""
+
+        today = today or datetime.utcnow().date()
+        since = datetime.combine(today - timedelta(days=days), datetime.min.time())
+        key = (user_id, days, method, today)
+        with engine.connect() as connection:
+            version = user_data_version(connection, user_id)
+
+            with self._lock:
+                cached = self._cache.get(key)
+                if cached is not None and cached[0] == version:
+                    self._cache.move_to_end(key)
+                    return cached[1]
+
+            rows = connection.execute(
+                select(
+                    focus_sessions.c.start_hour,
+                    focus_sessions.c.planned_duration,
+                    focus_sessions.c.interruption_count,
+                    focus_sessions.c.playlist_id,
+                    focus_sessions.c.session_type,
+                    focus_sessions.c.status,
+                    focus_sessions.c.productivity_score
+                ).where(
+                    focus_sessions.c.user_id == user_id,
+                    focus_sessions.c.start_time >= since,
+                    focus_sessions.c.status.notin_(OPEN_SESSION_STATUSES)
+                )
+            )
+            result = CorrelationProcessor.correlate(SessionFrame.from_rows(rows), method)
+
+        result = {"user_id": user_id, "period_days": days, "period_start": since.date(), **result}
+        with self._lock:
+            self._cache[key] = (version, result)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_users:
+                self._cache.popitem(last=False)
+
+        logger.debug(f"Computed {method} correlations for {user_id} over {result['sessions']} sessions")
+        return result
+
+
+correlation_service = CorrelationService()
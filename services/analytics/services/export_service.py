@@ -0,0 +1,340 @@
+"""
+Export Service
+Streams session history as CSV, NDJSON, Arrow or Parquet straight from a server-side cursor
+"""
+
+from sqlalchemy import select, tuple_
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+import csv
+import io
+import json
+import logging
+import uuid
+import zlib
+
+from analytics.config.settings import get_settings
+from analytics.database.connection import engine
+from analytics.database.tables import focus_sessions
+
+logger = logging.getLogger("analytics.export")
+settings = get_settings()
+
+# Columns included in exports, in output order; the wide insight columns are left out
+EXPORT_COLUMNS = [
+    "id",
+    "session_uuid",
+    "user_id",
+    "session_type",
+    "status",
+    "start_time",
+    "start_date",
+    "end_time",
+    "planned_duration",
+    "actual_duration",
+    "completion_reason",
+    "completion_rate",
+    "productivity_score",
+    "interruption_count",
+    "focus_quality",
+    "playlist_id"
+]
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet"
+}
+
+# Columnar formats are compressed internally, so gzip only applies to text formats
+COLUMNAR_FORMATS = ("arrow", "parquet")
+
+# Arrow type names for every exportable column; resolved lazily so pyarrow stays optional
+ARROW_TYPES = {
+    "id": "int64",
+    "session_uuid": "string",
+    "user_id": "string",
+    "session_type": "string",
+    "status": "string",
+    "start_time": "timestamp[us]",
+    "start_date": "date32",
+    "end_time": "timestamp[us]",
+    "planned_duration": "int32",
+    "actual_duration": "int32",
+    "completion_reason": "string",
+    "completion_rate": "float64",
+    "productivity_score": "float64",
+    "interruption_count": "int32",
+    "focus_quality": "string",
+    "playlist_id": "string"
+}
+
+
+class ExportService:
+    """Session history exports that never hold more than one chunk in memory
+
+    Rows are read in (start_time, id) order, so an interrupted export can be
+    resumed from the start_time and id of the last row received.
+    """
+
+    def __init__(self, chunk_size: int = settings.export_chunk_size):
+        self.chunk_size = chunk_size
+
+    def iter_row_chunks(self, user_id: Optional[str] = None,
+                        after_start_time: Optional[datetime] = None,
+                        after_id: Optional[int] = None,
+                        until: Optional[datetime] = None,
+                        columns: Optional[List[str]] = None) -> Iterator[List[Dict[str, Any]]]:
+        """Yield lists of row mappings, chunk_size rows at a time"""
+
+        selected = [focus_sessions.c[name] for name in (columns or EXPORT_COLUMNS)]
+        query = select(*selected)
+
+        if user_id is not None:
+            query = query.where(focus_sessions.c.user_id == user_id)
+        if after_start_time is not None:
+            if after_id is None:
+                query = query.where(focus_sessions.c.start_time > after_start_time)
+            else:
+                query = query.where(
+                    tuple_(focus_sessions.c.start_time, focus_sessions.c.id) > tuple_(after_start_time, after_id)
+                )
+        if until is not None:
+            query = query.where(focus_sessions.c.start_time < until)
+
+        query = query.order_by(focus_sessions.c.start_time, focus_sessions.c.id)
+
+        # A dedicated connection keeps the server-side cursor open across chunks
+        with engine.connect() as connection:
+            result = connection.execution_options(
+                stream_results=True,
+                yield_per=self.chunk_size
+            ).execute(query)
+
+            for partition in result.mappings().partitions():
+                yield partition
+
+    def stream_csv(self, **filters: Any) -> Iterator[bytes]:
+        """Encode rows as CSV, one encoded chunk per cursor chunk"""
+
+        columns = filters.get("columns") or EXPORT_COLUMNS
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+
+        writer.writerow(columns)
+        for chunk in self.iter_row_chunks(**filters):
+            for row in chunk:
+                writer.writerow([self._csv_value(row[name]) for name in columns])
+            yield self._drain(buffer)
+
+        # Header only, when nothing matched
+        tail = self._drain(buffer)
+        if tail:
+            yield tail
+
+    def stream_ndjson(self, **filters: Any) -> Iterator[bytes]:
+        """Encode rows as newline-delimited JSON, one encoded chunk per cursor chunk"""
+
+        for chunk in self.iter_row_chunks(**filters):
+            lines = [json.dumps(dict(row), default=self._json_default) for row in chunk]
+            yield ("\n".join(lines) + "\n").encode()
+
+    def stream_arrow(self, **filters: Any) -> Iterator[bytes]:
+        """Encode rows as an Arrow IPC stream, one record batch per cursor chunk"""
+
+        pa = self._pyarrow()
+        columns = filters.get("columns") or EXPORT_COLUMNS
+        schema = self._arrow_schema(columns)
+        sink = io.BytesIO()
+
+        with pa.ipc.new_stream(sink, schema) as writer:
+            for batch in self.iter_record_batches(schema, **filters):
+                writer.write_batch(batch)
+                yield self._drain_bytes(sink)
+
+        yield self._drain_bytes(sink)
+
+    def stream_parquet(self, **filters: Any) -> Iterator[bytes]:
+        """Encode rows as Parquet, one row group per cursor chunk"""
+
+        pa = self._pyarrow()
+        pq = self._parquet()
+        columns = filters.get("columns") or EXPORT_COLUMNS
+        schema = self._arrow_schema(columns)
+        sink = io.BytesIO()
+
+        with pq.ParquetWriter(sink, schema, compression=settings.export_parquet_compression) as writer:
+            for batch in self.iter_record_batches(schema, **filters):
+                writer.write_table(pa.Table.from_batches([batch], schema=schema))
+                yield self._drain_bytes(sink)
+
+        # The footer is written on close
+        yield self._drain_bytes(sink)
+
+    def iter_record_batches(self, schema: Any, **filters: Any) -> Iterator[Any]:
+        """Convert cursor chunks into Arrow record batches column by column"""
+
+        pa = self._pyarrow()
+        for chunk in self.iter_row_chunks(**filters):
+            yield self._record_batch(pa, schema, chunk)
+
+    def export_partitioned(self, destination: Path, export_format: str = "parquet",
+                           **filters: Any) -> Dict[str, Any]:
+        """Write one file per start_date under destination/start_date=YYYY-MM-DD/
+
+        Rows arrive in start_time order, so each date's rows are contiguous
+        and only one file is open at a time.
+        """
+
+        if export_format not in COLUMNAR_FORMATS:
+            raise ValueError(f"Partitioned exports support {list(COLUMNAR_FORMATS)}")
+        self._validate_columns(filters.get("columns"))
+
+        pa = self._pyarrow()
+        pq = self._parquet() if export_format == "parquet" else None
+
+        columns = filters.get("columns") or EXPORT_COLUMNS
+        schema = self._arrow_schema(columns)
+        query_columns = columns if "start_date" in columns else [*columns, "start_date"]
+
+        files: List[str] = []
+        rows = 0
+        current_date: Optional[date] = None
+        writer = None
+
+        try:
+            for chunk in self.iter_row_chunks(**{**filters, "columns": query_columns}):
+                start = 0
+                while start < len(chunk):
+                    partition_date = chunk[start]["start_date"]
+                    end = start
+                    while end < len(chunk) and chunk[end]["start_date"] == partition_date:
+                        end += 1
+
+                    if partition_date != current_date:
+                        if writer is not None:
+                            writer.close()
+                        path = destination / f"start_date={partition_date.isoformat()}" / f"part-0.{export_format}"
+                        path.parent.mkdir(parents=True, exist_ok=True)
+                        writer = (
+                            pq.ParquetWriter(str(path), schema, compression=settings.export_parquet_compression)
+                            if pq is not None else pa.ipc.new_file(str(path), schema)
+                        )
+                        files.append(str(path))
+                        current_date = partition_date
+
+                    batch = self._record_batch(pa, schema, chunk[start:end])
+                    if pq is not None:
+                        writer.write_table(pa.Table.from_batches([batch], schema=schema))
+                    else:
+                        writer.write_batch(batch)
+
+                    rows += end - start
+                    start = end
+        finally:
+            if writer is not None:
+                writer.close()
+
+        logger.info(f"Exported {rows} sessions into {len(files)} {export_format} partitions under {destination}")
+        return {"format": export_format, "rows": rows, "files": files}
+
+    def stream(self, export_format: str, compress: bool = False, **filters: Any) -> Iterator[bytes]:
+        """Stream an export in the requested format, optionally gzipped
+
+        Arguments are validated before the first byte is produced, since a
+        streaming response cannot turn into an error once it has started.
+        """
+
+        self._validate_columns(filters.get("columns"))
+
+        if export_format == "csv":
+            chunks = self.stream_csv(**filters)
+        elif export_format == "ndjson":
+            chunks = self.stream_ndjson(**filters)
+        elif export_format in COLUMNAR_FORMATS:
+            if compress:
+                raise ValueError(f"{export_format} exports are already compressed; gzip is not supported")
+            # Fail now rather than mid-stream when pyarrow is missing
+            self._pyarrow()
+            chunks = self.stream_arrow(**filters) if export_format == "arrow" else self.stream_parquet(**filters)
+        else:
+            raise ValueError(f"Unsupported export format: {export_format}")
+
+        return self.gzip_chunks(chunks) if compress else chunks
+
+    @staticmethod
+    def gzip_chunks(chunks: Iterable[bytes], level: int = settings.export_gzip_level) -> Iterator[bytes]:
+        """Compress a byte stream into a single gzip member as it is produced"""
+
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits 31 selects the gzip container
+        for chunk in chunks:
+            compressed = compressor.compress(chunk)
+            if compressed:
+                yield compressed
+        yield compressor.flush()
+
+    @staticmethod
+    def _validate_columns(columns: Optional[List[str]]):
+        unknown = set(columns or []) - set(EXPORT_COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown export columns: {sorted(unknown)}")
+
+    def _arrow_schema(self, columns: List[str]) -> Any:
+        pa = self._pyarrow()
+        return pa.schema([
+            pa.field(name, pa.type_for_alias(ARROW_TYPES[name])) for name in columns
+        ])
+
+    @staticmethod
+    def _record_batch(pa: Any, schema: Any, rows: List[Dict[str, Any]]) -> Any:
+        arrays = []
+        for field in schema:
+            values = [row[field.name] for row in rows]
+            if field.name == "session_uuid":
+                values = [str(value) if value is not None else None for value in values]
+            arrays.append(pa.array(values, type=field.type))
+        return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+    @staticmethod
+    def _pyarrow() -> Any:
+        import pyarrow
+        import pyarrow.ipc  # noqa: F401 - registers pyarrow.ipc
+        return pyarrow
+
+    @staticmethod
+    def _parquet() -> Any:
+        import pyarrow.parquet
+        return pyarrow.parquet
+
+    @staticmethod
+    def _drain_bytes(buffer: io.BytesIO) -> bytes:
+        data = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return data
+
+    @staticmethod
+    def _drain(buffer: io.StringIO) -> bytes:
+        data = buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+        return data
+
+    @staticmethod
+    def _csv_value(value: Any) -> Any:
+        if isinstance(value, (datetime, date)):
+            return value.isoformat()
+        return "" if value is None else value
+
+    @staticmethod
+    def _json_default(value: Any) -> Any:
+        if isinstance(value, (datetime, date)):
+            return value.isoformat()
+        if isinstance(value, uuid.UUID):
+            return str(value)
+        raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+export_service = ExportService()
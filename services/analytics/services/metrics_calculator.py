@@ -0,0 +1,392 @@
+"""
+Metrics Calculator
+Cohort and global session metrics computed across all users in worker processes
+"""
+
+from sqlalchemy import and_, create_engine, func, select, union, union_all
+from sqlalchemy.pool import NullPool
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+import multiprocessing
+import threading
+import time
+
+from analytics.config.settings import get_settings
+from analytics.database.connection import engine
+from analytics.database.tables import focus_sessions, users
+from focus_flow_shared.session_aggregator import Aggregate, SessionAggregate, merge_all
+
+logger = logging.getLogger("analytics.metrics")
+settings = get_settings()
+
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+# Bounds of one shard: user_ids in [lower, upper), None meaning unbounded
+ShardBounds = Tuple[Optional[str], Optional[str]]
+
+
+def week_start(day: date) -> date:
+    """Monday of the week containing day"""
+    return day - timedelta(days=day.weekday())
+
+
+class CohortPartial(Aggregate):
+    """Mergeable cohort metrics for a set of users
+
+    Session metrics are kept per session type and per weekday; retention
+    keeps, per signup week, how many users signed up and how many of them
+    were active in each week since.
+    """
+
+    def __init__(self, retention_weeks: int = settings.cohort_retention_weeks):
+        self.retention_weeks = retention_weeks
+        self.users = 0
+        self.by_type: Dict[str, SessionAggregate] = {}
+        self.by_weekday = [SessionAggregate() for _ in WEEKDAYS]
+        self.cohort_users: Dict[date, int] = {}
+        self.cohort_active: Dict[date, List[int]] = {}
+
+    def add(self, session: Any):
+        """Fold one session row into the per-type and per-weekday totals"""
+        session_type = session.session_type or "unknown"
+        if session_type not in self.by_type:
+            self.by_type[session_type] = SessionAggregate()
+
+        self.by_type[session_type].add(session)
+        self.by_weekday[session.start_date.weekday()].add(session)
+
+    def add_user(self, signup_week: date, active_weeks: set):
+        """Record one user's signup week and the weeks they had a session"""
+        self.users += 1
+        self.cohort_users[signup_week] = self.cohort_users.get(signup_week, 0) + 1
+
+        active = self.cohort_active.setdefault(signup_week, [0] * (self.retention_weeks + 1))
+        for week in active_weeks:
+            offset = (week - signup_week).days // 7
+            if 0 <= offset <= self.retention_weeks:
+                active[offset] += 1
+
+    def merge(self, other: "CohortPartial") -> "CohortPartial":
+        if other.retention_weeks != self.retention_weeks:
+            raise ValueError("Cannot merge cohort partials with different retention horizons")
+
+        self.users += other.users
+        for session_type, aggregate in other.by_type.items():
+            if session_type in self.by_type:
+                self.by_type[session_type].merge(aggregate)
+            else:
+                self.by_type[session_type] = aggregate.copy()
+
+        for mine, theirs in zip(self.by_weekday, other.by_weekday):
+            mine.merge(theirs)
+
+        for signup_week, count in other.cohort_users.items():
+            self.cohort_users[signup_week] = self.cohort_users.get(signup_week, 0) + count
+            active = self.cohort_active.setdefault(signup_week, [0] * (self.retention_weeks + 1))
+            for offset, active_users in enumerate(other.cohort_active[signup_week]):
+                active[offset] += active_users
+
+        return self
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "retention_weeks": self.retention_weeks,
+            "users": self.users,
+            "by_type": {name: aggregate.to_dict() for name, aggregate in self.by_type.items()},
+            "by_weekday": [aggregate.to_dict() for aggregate in self.by_weekday],
+            "cohorts": [
+                {"signup_week": week.isoformat(), "users": count, "active": self.cohort_active[week]}
+                for week, count in self.cohort_users.items()
+            ]
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "CohortPartial":
+        partial = cls(data["retention_weeks"])
+        partial.users = data["users"]
+        partial.by_type = {name: SessionAggregate.from_dict(value) for name, value in data["by_type"].items()}
+        partial.by_weekday = [SessionAggregate.from_dict(value) for value in data["by_weekday"]]
+        for cohort in data["cohorts"]:
+            signup_week = date.fromisoformat(cohort["signup_week"])
+            partial.cohort_users[signup_week] = cohort["users"]
+            partial.cohort_active[signup_week] = list(cohort["active"])
+        return partial
+
+
+# One engine per worker process; engines must not be shared across a fork or spawn
+_worker_engine = None
+
+
+def _shard_engine():
+    global _worker_engine
+    if _worker_engine is None:
+        _worker_engine = create_engine(get_settings().database_url, poolclass=NullPool)
+    return _worker_engine
+
+
+def _in_shard(column: Any, bounds: ShardBounds) -> List[Any]:
+    lower, upper = bounds
+    criteria = []
+    if lower is not None:
+        criteria.append(column >= lower)
+    if upper is not None:
+        criteria.append(column < upper)
+    return criteria
+
+
+def compute_shard(bounds: ShardBounds, since: Optional[datetime],
+                  retention_weeks: int, chunk_size: int) -> CohortPartial:
+    """Stream one user range in (user_id, start_time) order and fold it into a partial
+
+    Runs in a worker process. Cohorts are built from every signup in the
+    range, users rows and session-only users alike, with their sessions
+    outer-joined, so users who never started a session still count in
+    their cohort's size. A user's signup is their users.created_at, or
+    their first session ever when they have no users row (or it has no
+    created_at). With since set only later sessions count as activity.
+    Rows for a user arrive together, so only the current user's active
+    weeks are held in memory.
+    """
+
+    first_start = select(func.min(focus_sessions.c.start_time)).where(
+        focus_sessions.c.user_id == users.c.username
+    ).scalar_subquery()
+    has_users_row = select(users.c.id).where(users.c.username == focus_sessions.c.user_id).exists()
+    signups = union_all(
+        select(
+            users.c.username.label("user_id"),
+            func.coalesce(users.c.created_at, first_start).label("signed_up_at")
+        ).where(users.c.username.isnot(None), *_in_shard(users.c.username, bounds)),
+        select(
+            focus_sessions.c.user_id,
+            func.min(focus_sessions.c.start_time)
+        ).where(~has_users_row, *_in_shard(focus_sessions.c.user_id, bounds)).group_by(focus_sessions.c.user_id)
+    ).subquery()
+
+    joined = focus_sessions.c.user_id == signups.c.user_id
+    if since is not None:
+        joined = and_(joined, focus_sessions.c.start_time >= since)
+
+    query = select(
+        signups.c.user_id,
+        signups.c.signed_up_at,
+        focus_sessions.c.id.label("session_id"),
+        focus_sessions.c.session_type,
+        focus_sessions.c.status,
+        focus_sessions.c.start_date,
+        focus_sessions.c.planned_duration,
+        focus_sessions.c.actual_duration,
+        focus_sessions.c.productivity_score,
+        focus_sessions.c.interruption_count
+    ).select_from(
+        signups.outerjoin(focus_sessions, joined)
+    ).order_by(signups.c.user_id, focus_sessions.c.start_time)
+
+    partial = CohortPartial(retention_weeks)
+    current_user = None
+    signup_week = None
+    active_weeks: set = set()
+
+    with _shard_engine().connect() as connection:
+        result = connection.execution_options(stream_results=True, yield_per=chunk_size).execute(query)
+
+        for row in result:
+            if row.user_id != current_user:
+                # A users row without created_at or sessions has no signup week to count in
+                if signup_week is not None:
+                    partial.add_user(signup_week, active_weeks)
+                current_user = row.user_id
+                signup_week = week_start(row.signed_up_at.date()) if row.signed_up_at else None
+                active_weeks = set()
+
+            # The outer join yields one session-less row for users without sessions
+            if row.session_id is None:
+                continue
+
+            partial.add(row)
+            active_weeks.add(week_start(row.start_date))
+
+        if signup_week is not None:
+            partial.add_user(signup_week, active_weeks)
+
+    return partial
+
+
+class CohortMetricsCalculator:
+    """Cross-user metrics sharded by user_id range over a process pool
+
+    Each worker streams its shard with its own connection and returns a
+    CohortPartial; the partials are merged here, so no worker and no
+    request ever holds more than one user's rows. Merged partials are
+    cached per since for cache_seconds, and concurrent requests for the
+    same since share one run.
+    """
+
+    def __init__(self, workers: int = settings.cohort_workers, shards: int = settings.cohort_shards,
+                 retention_weeks: int = settings.cohort_retention_weeks,
+                 chunk_size: int = settings.export_chunk_size,
+                 cache_seconds: float = settings.cohort_cache_seconds,
+                 max_cached: int = settings.cohort_cache_max_entries):
+        self.workers = workers
+        self.shards = shards
+        self.retention_weeks = retention_weeks
+        self.chunk_size = chunk_size
+        self.cache_seconds = cache_seconds
+        self.max_cached = max_cached
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._partials: "OrderedDict[Optional[datetime], Tuple[float, CohortPartial]]" = OrderedDict()
+        self._computing: Dict[Optional[datetime], threading.Event] = {}
+
+    def shard_bounds(self) -> List[ShardBounds]:
+        """Split the distinct user_ids into ranges of roughly equal user counts
+
+        The split is computed in the database with ntile, so only one
+        boundary per shard is returned.
+        """
+
+        distinct_users = union(
+            select(users.c.username.label("user_id")).where(users.c.username.isnot(None)),
+            select(focus_sessions.c.user_id)
+        ).subquery()
+        ranked = select(
+            distinct_users.c.user_id,
+            func.ntile(self.shards).over(order_by=distinct_users.c.user_id).label("shard")
+        ).subquery()
+        query = select(func.min(ranked.c.user_id).label("lower")).group_by(ranked.c.shard).order_by("lower")
+
+        with engine.connect() as connection:
+            lowers = [row.lower for row in connection.execute(query)]
+
+        if not lowers:
+            return []
+
+        # The first shard is open below and the last open above
+        edges = [None, *lowers[1:], None]
+        return list(zip(edges[:-1], edges[1:]))
+
+    def compute_partial(self, since: Optional[datetime] = None) -> CohortPartial:
+        """Merged partial for since, from the cache while it is fresh
+
+        The first caller to miss runs the shards; others asking for the
+        same since wait for it instead of starting their own scan. The
+        returned partial is shared and must not be modified.
+        """
+
+        while True:
+            with self._lock:
+                cached = self._partials.get(since)
+                if cached is not None and time.monotonic() - cached[0] < self.cache_seconds:
+                    self._partials.move_to_end(since)
+                    return cached[1]
+
+                running = self._computing.get(since)
+                if running is None:
+                    running = self._computing[since] = threading.Event()
+                    break
+
+            # Another request is computing this partial; if it fails, one waiter takes over
+            running.wait()
+
+        try:
+            partial = self._compute_shards(since)
+            with self._lock:
+                self._partials[since] = (time.monotonic(), partial)
+                self._partials.move_to_end(since)
+                while len(self._partials) > self.max_cached:
+                    self._partials.popitem(last=False)
+        finally:
+            with self._lock:
+                del self._computing[since]
+            running.set()
+
+        return partial
+
+    def _compute_shards(self, since: Optional[datetime]) -> CohortPartial:
+        """Run every shard on the process pool and merge the results"""
+
+        bounds = self.shard_bounds()
+        executor = self._get_executor()
+
+        partials = executor.map(
+            compute_shard,
+            bounds,
+            [since] * len(bounds),
+            [self.retention_weeks] * len(bounds),
+            [self.chunk_size] * len(bounds)
+        )
+        merged = merge_all(partials, CohortPartial(self.retention_weeks))
+
+        logger.info(f"Computed cohort metrics for {merged.users} users over {len(bounds)} shards")
+        return merged
+
+    def compute(self, since: Optional[datetime] = None) -> Dict[str, Any]:
+        """Completion by session type, focus minutes per weekday and retention by signup week"""
+
+        partial = self.compute_partial(since)
+        this_week = week_start(datetime.utcnow().date())
+
+        completion_by_type = {
+            session_type: {
+                "total_sessions": aggregate.total_sessions,
+                "completed_sessions": aggregate.completed_sessions,
+                "completion_rate": round(aggregate.completion_rate, 3),
+                "average_productivity_score": round(aggregate.productivity.mean, 2),
+                "average_actual_duration": round(aggregate.actual_duration.mean, 1)
+            }
+            for session_type, aggregate in sorted(partial.by_type.items())
+        }
+
+        focus_by_weekday = [
+            {
+                "weekday": name,
+                "total_sessions": aggregate.total_sessions,
+                "total_focus_time_minutes": aggregate.total_minutes,
+                "completed_focus_time_minutes": aggregate.completed_minutes
+            }
+            for name, aggregate in zip(WEEKDAYS, partial.by_weekday)
+        ]
+
+        retention = []
+        for signup_week in sorted(partial.cohort_users):
+            cohort_size = partial.cohort_users[signup_week]
+            # Weeks that have not happened yet are left off rather than reported as churn
+            elapsed = min(self.retention_weeks, (this_week - signup_week).days // 7)
+            active = partial.cohort_active[signup_week][:elapsed + 1]
+            retention.append({
+                "signup_week": signup_week,
+                "users": cohort_size,
+                "retention": [round(count / cohort_size, 3) for count in active]
+            })
+
+        return {
+            "total_users": partial.users,
+            "total_sessions": sum(aggregate.total_sessions for aggregate in partial.by_type.values()),
+            "completion_by_session_type": completion_by_type,
+            "focus_minutes_by_weekday": focus_by_weekday,
+            "retention_by_signup_week": retention,
+            "since": since,
+            "computed_at": datetime.utcnow()
+        }
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # spawn, since forking a process with a live event loop and connection pool is unsafe
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._executor
+
+
+cohort_calculator = CohortMetricsCalculator()
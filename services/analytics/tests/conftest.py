@@ -0,0 +1,81 @@
+"""
+Analytics test fixtures
+Runs the service against a throwaway SQLite database holding the focus engine tables
+"""
+
+from datetime import datetime, timedelta
+import os
+import sys
+import tempfile
+
+import pytest
+
+SERVICES_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, SERVICES_DIR)
+
+_database_dir = tempfile.mkdtemp(prefix="analytics_tests_")
+os.environ.setdefault("ANALYTICS_DATABASE_URL", f"sqlite:///{_database_dir}/analytics.db")
+os.environ.setdefault("ANALYTICS_EXPORT_DIRECTORY", f"{_database_dir}/exports")
+os.environ.setdefault("ANALYTICS_DEBUG_MODE", "false")
+
+from sqlalchemy import insert  # noqa: E402
+
+from analytics.database.connection import engine  # noqa: E402
+from analytics.database.tables import focus_sessions, metadata, users  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def database():
+    """Fresh focus engine tables for every test
+
+    The focus engine owns these tables, so they are only ever created here.
+    """
+    metadata.drop_all(engine)
+    metadata.create_all(engine)
+    yield engine
+
+
+def session_row(user_id: str, start_time: datetime, **overrides):
+    """A completed focus_sessions row with the stored date and hour buckets filled in"""
+    actual_duration = overrides.pop("actual_duration", 45)
+    return {
+        "user_id": user_id,
+        "session_type": "deep_work",
+        "status": "completed",
+        "start_time": start_time,
+        "start_date": start_time.date(),
+        "start_hour": start_time.hour,
+        "end_time": start_time + timedelta(minutes=actual_duration),
+        "planned_duration": 50,
+        "actual_duration": actual_duration,
+        "completion_rate": actual_duration / 50,
+        "productivity_score": 7.0,
+        "interruption_count": 0,
+        "focus_quality": "good",
+        **overrides
+    }
+
+
+@pytest.fixture
+def add_sessions(database):
+    def add(rows):
+        with database.begin() as connection:
+            connection.execute(insert(focus_sessions), list(rows))
+    return add
+
+
+@pytest.fixture
+def add_users(database):
+    def add(rows):
+        with database.begin() as connection:
+            connection.execute(insert(users), list(rows))
+    return add
+
+
+@pytest.fixture
+async def client():
+    from httpx import AsyncClient
+    from analytics.main import app
+
+    async with AsyncClient(app=app, base_url="http://test") as http:
+        yield http
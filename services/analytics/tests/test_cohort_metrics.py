@@ -0,0 +1,161 @@
+"""
+Tests for sharded cohort metrics
+"""
+
+from datetime import datetime, timedelta
+import threading
+import time
+
+import pytest
+
+from analytics.services.metrics_calculator import CohortMetricsCalculator, CohortPartial, compute_shard, week_start
+from conftest import session_row
+
+NOW = datetime(2026, 3, 18, 10, 0)
+
+
+def seed(add_sessions):
+    add_sessions([
+        session_row("alice", NOW - timedelta(weeks=10)),
+        session_row("alice", NOW - timedelta(weeks=1)),
+        session_row("bob", NOW - timedelta(weeks=2), status="cancelled", actual_duration=10),
+        session_row("bob", NOW - timedelta(days=1)),
+        session_row("carol", NOW - timedelta(weeks=6))
+    ])
+
+
+def cohorts(partial: CohortPartial):
+    return {week: (count, partial.cohort_active[week]) for week, count in partial.cohort_users.items()}
+
+
+def test_signup_is_first_session_ever_when_since_is_set(add_sessions):
+    seed(add_sessions)
+
+    partial = compute_shard((None, None), NOW - timedelta(weeks=3), 12, 100)
+
+    alice_week = week_start((NOW - timedelta(weeks=10)).date())
+    bob_week = week_start((NOW - timedelta(weeks=2)).date())
+    carol_week = week_start((NOW - timedelta(weeks=6)).date())
+    assert partial.users == 3
+    assert cohorts(partial)[alice_week][0] == 1
+    assert cohorts(partial)[alice_week][1][9] == 1
+    assert cohorts(partial)[bob_week][0] == 1
+    # Carol had no sessions since, but she still signed up in her week
+    assert cohorts(partial)[carol_week] == (1, [0] * 13)
+    assert sum(aggregate.total_sessions for aggregate in partial.by_type.values()) == 3
+
+
+def test_users_created_at_takes_precedence(add_sessions, add_users):
+    seed(add_sessions)
+    signed_up = NOW - timedelta(weeks=11)
+    add_users([{"id": 1, "username": "alice", "created_at": signed_up, "is_active": True}])
+
+    for since in (None, NOW - timedelta(weeks=3)):
+        partial = compute_shard((None, None), since, 12, 100)
+        assert week_start(signed_up.date()) in partial.cohort_users
+        assert week_start((NOW - timedelta(weeks=10)).date()) not in partial.cohort_users
+
+
+def test_shards_merge_to_the_unsharded_result(add_sessions):
+    seed(add_sessions)
+
+    whole = compute_shard((None, None), None, 12, 2)
+    merged = compute_shard((None, "bob"), None, 12, 2).merge(compute_shard(("bob", None), None, 12, 2))
+
+    assert merged.users == whole.users == 3
+    assert cohorts(merged) == cohorts(whole)
+    for session_type, aggregate in whole.by_type.items():
+        assert merged.by_type[session_type].total_sessions == aggregate.total_sessions
+        assert merged.by_type[session_type].completed_minutes == aggregate.completed_minutes
+        assert merged.by_type[session_type].actual_duration.variance == pytest.approx(aggregate.actual_duration.variance)
+
+
+def test_partial_round_trips_through_dict(add_sessions):
+    seed(add_sessions)
+    partial = compute_shard((None, None), None, 12, 100)
+
+    assert CohortPartial.from_dict(partial.to_dict()).to_dict() == partial.to_dict()
+
+
+def test_users_without_sessions_count_in_their_cohort(add_sessions, add_users):
+    seed(add_sessions)
+    signed_up = NOW - timedelta(weeks=10)
+    add_users([
+        {"id": 1, "username": "alice", "created_at": signed_up, "is_active": True},
+        {"id": 2, "username": "dave", "created_at": signed_up, "is_active": True},
+        {"id": 3, "username": "erin", "created_at": None, "is_active": True}
+    ])
+
+    whole = compute_shard((None, None), None, 12, 2)
+    merged = compute_shard((None, "c"), None, 12, 2).merge(compute_shard(("c", None), None, 12, 2))
+
+    week = week_start(signed_up.date())
+    # Alice was active in her signup week, Dave never started a session; Erin has no signup date
+    assert whole.users == merged.users == 4
+    assert cohorts(whole)[week][0] == 2
+    assert cohorts(whole)[week][1][0] == 1
+    assert cohorts(merged) == cohorts(whole)
+
+
+def test_shard_bounds_cover_users_without_sessions(add_sessions, add_users):
+    seed(add_sessions)
+    add_users([{"id": 1, "username": "zed", "created_at": NOW, "is_active": True}])
+
+    bounds = CohortMetricsCalculator(shards=4).shard_bounds()
+
+    assert len(bounds) == 4
+    assert bounds[-1][0] == "zed"
+
+
+def test_concurrent_requests_share_one_cached_run(monkeypatch):
+    calculator = CohortMetricsCalculator(cache_seconds=60)
+    runs = []
+
+    def slow_run(since):
+        runs.append(since)
+        time.sleep(0.05)
+        return CohortPartial(12)
+
+    monkeypatch.setattr(calculator, "_compute_shards", slow_run)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(calculator.compute_partial())) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert runs == [None]
+    assert len({id(partial) for partial in results}) == 1
+    assert calculator.compute_partial() is results[0]
+
+    since = NOW - timedelta(weeks=3)
+    calculator.compute_partial(since)
+    assert runs == [None, since]
+
+
+def test_cached_partials_expire(monkeypatch):
+    calculator = CohortMetricsCalculator(cache_seconds=0)
+    runs = []
+    monkeypatch.setattr(calculator, "_compute_shards", lambda since: runs.append(since) or CohortPartial(12))
+
+    calculator.compute_partial()
+    calculator.compute_partial()
+
+    assert runs == [None, None]
+
+
+def test_a_failed_run_is_not_cached(monkeypatch):
+    calculator = CohortMetricsCalculator(cache_seconds=60)
+    outcomes = [RuntimeError("worker died"), CohortPartial(12)]
+
+    def run(since):
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    monkeypatch.setattr(calculator, "_compute_shards", run)
+
+    with pytest.raises(RuntimeError):
+        calculator.compute_partial()
+    assert calculator.compute_partial().retention_weeks == 12
@@ -0,0 +1,88 @@
+"""
+Tests for Arrow and Parquet session exports
+"""
+
+from datetime import datetime, timedelta
+from pathlib import Path
+import io
+
+import pytest
+
+from analytics.services.export_service import EXPORT_COLUMNS, ExportService
+from conftest import session_row
+
+pa = pytest.importorskip("pyarrow")
+pq = pytest.importorskip("pyarrow.parquet")
+import pyarrow.ipc  # noqa: E402
+
+EXPORT = "/api/v1/export/sessions"
+START = datetime(2026, 3, 2, 22)
+
+
+def seed(add_sessions, count: int = 6):
+    # Two-hourly sessions from 22:00 fall on two start dates
+    add_sessions(session_row("alice", START + timedelta(hours=2 * n)) for n in range(count))
+
+
+async def test_arrow_stream_reads_back_with_the_export_schema(client, add_sessions):
+    seed(add_sessions)
+
+    response = await client.get(EXPORT, params={"format": "arrow"})
+
+    assert response.headers["content-type"] == "application/vnd.apache.arrow.stream"
+    table = pa.ipc.open_stream(response.content).read_all()
+    assert table.schema.names == EXPORT_COLUMNS
+    assert str(table.schema.field("start_time").type) == "timestamp[us]"
+    assert str(table.schema.field("start_date").type) == "date32[day]"
+    assert table.num_rows == 6
+    assert table.column("start_time").to_pylist()[0] == START
+
+
+async def test_parquet_export_projects_the_requested_columns(client, add_sessions):
+    seed(add_sessions)
+
+    response = await client.get(EXPORT, params={"format": "parquet", "columns": ["id", "productivity_score"]})
+
+    table = pq.read_table(io.BytesIO(response.content))
+    assert table.schema.names == ["id", "productivity_score"]
+    assert table.num_rows == 6
+
+
+async def test_columnar_formats_reject_gzip(client):
+    response = await client.get(EXPORT, params={"format": "parquet", "gzip": "true"})
+
+    assert response.status_code == 400
+
+
+def test_arrow_stream_has_one_batch_per_chunk(add_sessions):
+    seed(add_sessions)
+
+    payload = b"".join(ExportService(chunk_size=4).stream("arrow"))
+
+    assert [batch.num_rows for batch in pa.ipc.open_stream(payload)] == [4, 2]
+
+
+def test_partitioned_export_writes_one_file_per_start_date(tmp_path, add_sessions):
+    seed(add_sessions)
+
+    manifest = ExportService(chunk_size=4).export_partitioned(tmp_path, "parquet", columns=["id", "start_time"])
+
+    assert manifest["rows"] == 6
+    assert [Path(path).relative_to(tmp_path).as_posix() for path in manifest["files"]] == [
+        "start_date=2026-03-02/part-0.parquet",
+        "start_date=2026-03-03/part-0.parquet"
+    ]
+    counts = [pq.read_table(path).num_rows for path in manifest["files"]]
+    assert counts == [1, 5]
+    assert pq.read_table(manifest["files"][0]).schema.names == ["id", "start_time"]
+
+
+async def test_partitioned_arrow_export_via_the_router(client, add_sessions):
+    seed(add_sessions)
+
+    response = await client.post(f"{EXPORT}/partitioned", params={"format": "arrow"})
+
+    manifest = response.json()
+    assert manifest["rows"] == 6
+    tables = [pa.ipc.open_file(path).read_all() for path in manifest["files"]]
+    assert sum(table.num_rows for table in tables) == 6
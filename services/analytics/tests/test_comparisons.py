@@ -0,0 +1,151 @@
+"""
+Tests for population percentiles and period-over-period comparisons
+"""
+
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy import delete, update
+
+from analytics.database.tables import focus_sessions
+from analytics.services.comparative_analyzer import ComparativeAnalyzer, PeriodComparator, WeekNotReadyError
+from analytics.services.metrics_calculator import week_start
+from conftest import session_row
+
+WEEK = date(2026, 3, 16)  # a Monday
+
+
+def population(analyzer: ComparativeAnalyzer, week: date) -> int:
+    return analyzer._sketches[week]["weekly_focus_minutes"].count
+
+
+def test_closed_week_is_rebuilt_once_after_it_closes(add_sessions):
+    analyzer = ComparativeAnalyzer(weeks=4, k=50)
+    add_sessions([session_row("alice", datetime(2026, 3, 18, 9))])
+    analyzer.refresh(datetime(2026, 3, 18, 12))
+    assert population(analyzer, WEEK) == 1
+
+    # A session recorded late in the week, after the last refresh
+    add_sessions([session_row("bob", datetime(2026, 3, 22, 23))])
+    analyzer.refresh(datetime(2026, 3, 23, 0, 0, 5))
+    assert population(analyzer, WEEK) == 2
+    assert population(analyzer, WEEK + timedelta(weeks=1)) == 0
+
+    # Final from then on
+    add_sessions([session_row("carol", datetime(2026, 3, 20, 9))])
+    analyzer.refresh(datetime(2026, 3, 25, 12))
+    assert population(analyzer, WEEK) == 2
+
+
+def test_refresh_wakes_up_at_the_week_boundary():
+    analyzer = ComparativeAnalyzer(weeks=4, k=50)
+
+    assert analyzer.next_refresh_delay(900, datetime(2026, 3, 22, 23, 59)) == 60
+    assert analyzer.next_refresh_delay(900, datetime(2026, 3, 18, 12)) == 900
+
+
+def test_expired_weeks_are_dropped(add_sessions):
+    analyzer = ComparativeAnalyzer(weeks=2, k=50)
+    analyzer.refresh(datetime(2026, 3, 18, 12))
+    analyzer.refresh(datetime(2026, 4, 1, 12))
+
+    assert sorted(analyzer._sketches) == [date(2026, 3, 23), date(2026, 3, 30)]
+
+
+def test_user_percentile_against_the_population(add_sessions):
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    week = week_start(today.date())
+    add_sessions(
+        session_row(f"user-{n}", datetime.combine(week, datetime.min.time()) + timedelta(hours=1),
+                    actual_duration=n + 1)
+        for n in range(50)
+    )
+    analyzer = ComparativeAnalyzer(weeks=2, k=200)
+
+    with pytest.raises(WeekNotReadyError):
+        analyzer.user_percentiles("user-39")
+
+    analyzer.refresh()
+    result = analyzer.user_percentiles("user-39")
+    minutes = next(metric for metric in result["metrics"] if metric["metric"] == "weekly_focus_minutes")
+
+    assert minutes["value"] == 40
+    assert minutes["percentile"] == 80.0
+    assert minutes["population"] == 50
+
+
+def rollup_reads(monkeypatch, comparator):
+    """Record the missing days each comparison reads from the database"""
+    reads = []
+    runs = comparator._runs
+
+    def recording(days):
+        reads.append(list(days))
+        return runs(days)
+
+    monkeypatch.setattr(comparator, "_runs", recording)
+    return reads
+
+
+def seed_periods(add_sessions):
+    add_sessions(
+        session_row("alice", datetime(2026, 3, day, 9), productivity_score=6.0, updated_at=datetime(2026, 3, day, 10))
+        for day in range(2, 16)
+    )
+
+
+def test_period_comparison_merges_day_rollups(add_sessions):
+    seed_periods(add_sessions)
+
+    result = PeriodComparator().compare("alice", "custom", date(2026, 3, 9), date(2026, 3, 15))
+
+    assert result["previous"]["start_date"] == date(2026, 3, 2)
+    assert result["current"]["stats"]["total_sessions"] == 7
+    assert result["changes"]["total_focus_time_minutes"]["delta"] == 0
+    assert result["current"]["stats"]["current_streak_days"] == 7
+
+
+def test_in_place_edit_rereads_only_its_day(add_sessions, database, monkeypatch):
+    seed_periods(add_sessions)
+    comparator = PeriodComparator()
+    reads = rollup_reads(monkeypatch, comparator)
+    comparator.compare("alice", "custom", date(2026, 3, 9), date(2026, 3, 15))
+
+    with database.begin() as connection:
+        connection.execute(
+            update(focus_sessions)
+            .where(focus_sessions.c.start_date == date(2026, 3, 12))
+            .values(productivity_score=10.0, updated_at=datetime(2026, 3, 16, 8))
+        )
+
+    result = comparator.compare("alice", "custom", date(2026, 3, 9), date(2026, 3, 15))
+
+    # The latest day is within the recheck slack of the last write seen, so it is read again too
+    assert reads[-1] == [date(2026, 3, 12), date(2026, 3, 15)]
+    assert result["current"]["stats"]["average_productivity_score"] == round((6 * 6 + 10) / 7, 2)
+
+
+def test_delete_rereads_only_its_day(add_sessions, database, monkeypatch):
+    seed_periods(add_sessions)
+    comparator = PeriodComparator()
+    reads = rollup_reads(monkeypatch, comparator)
+    comparator.compare("alice", "custom", date(2026, 3, 9), date(2026, 3, 15))
+
+    with database.begin() as connection:
+        connection.execute(delete(focus_sessions).where(focus_sessions.c.start_date == date(2026, 3, 4)))
+
+    result = comparator.compare("alice", "custom", date(2026, 3, 9), date(2026, 3, 15))
+
+    assert reads[-1] == [date(2026, 3, 4), date(2026, 3, 15)]
+    assert result["previous"]["stats"]["total_sessions"] == 6
+
+
+def test_unchanged_version_reads_nothing(add_sessions, monkeypatch):
+    seed_periods(add_sessions)
+    comparator = PeriodComparator()
+    reads = rollup_reads(monkeypatch, comparator)
+
+    comparator.compare("alice", "custom", date(2026, 3, 9), date(2026, 3, 15))
+    comparator.compare("alice", "custom", date(2026, 3, 10), date(2026, 3, 14))
+
+    assert len(reads) == 1
@@ -0,0 +1,64 @@
+"""
+Tests for cached per-user factor correlations
+"""
+
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from analytics.services.correlation_service import CorrelationService
+from conftest import session_row
+
+pytest.importorskip("numpy")
+
+TODAY = date(2026, 3, 18)
+
+
+def seed(add_sessions):
+    add_sessions(
+        session_row(
+            "alice",
+            datetime(2026, 3, 18, 8) - timedelta(days=day),
+            start_hour=8 + day % 10,
+            interruption_count=day % 4,
+            status="completed" if day % 4 < 2 else "cancelled",
+            productivity_score=9.0 - 2 * (day % 4)
+        )
+        for day in range(40)
+    )
+
+
+def factor(result, outcome: str, name: str):
+    return next(item for item in result["outcomes"][outcome] if item["factor"] == name)
+
+
+def test_interruptions_correlate_negatively_with_productivity(add_sessions):
+    seed(add_sessions)
+
+    result = CorrelationService().user_correlations("alice", 30, "pearson", today=TODAY)
+
+    assert result["period_start"] == date(2026, 2, 16)
+    assert factor(result, "productivity_score", "interruption_count")["correlation"] == pytest.approx(-1.0)
+
+
+def test_cache_is_reused_within_a_day_and_rolls_over_at_the_next(add_sessions):
+    seed(add_sessions)
+    service = CorrelationService()
+
+    first = service.user_correlations("alice", 30, today=TODAY)
+    assert service.user_correlations("alice", 30, today=TODAY) is first
+
+    # No new sessions, but the oldest day has left the window
+    next_day = service.user_correlations("alice", 30, today=TODAY + timedelta(days=1))
+    assert next_day is not first
+    assert next_day["sessions"] == first["sessions"] - 1
+
+
+def test_new_session_invalidates_the_cache(add_sessions):
+    seed(add_sessions)
+    service = CorrelationService()
+    first = service.user_correlations("alice", 30, today=TODAY)
+
+    add_sessions([session_row("alice", datetime(2026, 3, 18, 12), start_hour=12)])
+
+    assert service.user_correlations("alice", 30, today=TODAY)["sessions"] == first["sessions"] + 1
@@ -0,0 +1,87 @@
+"""
+Tests for streaming CSV and NDJSON session exports
+"""
+
+from datetime import datetime, timedelta
+import csv
+import gzip
+import io
+import json
+
+from analytics.services.export_service import EXPORT_COLUMNS, ExportService
+from conftest import session_row
+
+EXPORT = "/api/v1/export/sessions"
+START = datetime(2026, 3, 2, 9)
+
+
+def seed(add_sessions, count: int = 7):
+    add_sessions(
+        session_row("alice" if n % 2 == 0 else "bob", START + timedelta(hours=n), playlist_id=None)
+        for n in range(count)
+    )
+
+
+async def test_csv_has_a_header_and_one_row_per_session(client, add_sessions):
+    seed(add_sessions)
+
+    response = await client.get(EXPORT, params={"format": "csv"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    rows = list(csv.reader(io.StringIO(response.text)))
+    assert rows[0] == EXPORT_COLUMNS
+    assert len(rows) == 8
+    assert rows[1][EXPORT_COLUMNS.index("start_time")] == START.isoformat()
+    assert rows[1][EXPORT_COLUMNS.index("playlist_id")] == ""
+
+
+async def test_ndjson_filters_by_user_and_projects_columns(client, add_sessions):
+    seed(add_sessions)
+
+    response = await client.get(EXPORT, params={
+        "format": "ndjson", "user_id": "alice", "columns": ["id", "user_id", "start_date"]
+    })
+
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert [set(record) for record in records] == [{"id", "user_id", "start_date"}] * 4
+    assert {record["user_id"] for record in records} == {"alice"}
+    assert records[0]["start_date"] == START.date().isoformat()
+
+
+async def test_gzip_download_matches_the_plain_one(client, add_sessions):
+    seed(add_sessions)
+
+    plain = await client.get(EXPORT, params={"format": "csv"})
+    compressed = await client.get(EXPORT, params={"format": "csv", "gzip": "true"})
+
+    assert compressed.headers["content-type"] == "application/gzip"
+    assert compressed.headers["content-disposition"].endswith('sessions.csv.gz"')
+    assert gzip.decompress(compressed.content) == plain.content
+
+
+async def test_resuming_after_the_last_row_continues_without_gaps(client, add_sessions):
+    seed(add_sessions)
+    everything = [json.loads(line) for line in (await client.get(EXPORT)).text.splitlines()]
+    last = everything[2]
+
+    resumed = await client.get(EXPORT, params={"after_start_time": last["start_time"], "after_id": last["id"]})
+
+    assert [json.loads(line) for line in resumed.text.splitlines()] == everything[3:]
+
+
+async def test_unknown_columns_are_rejected_before_streaming(client):
+    response = await client.get(EXPORT, params={"format": "csv", "columns": ["id", "ai_insights"]})
+
+    assert response.status_code == 400
+    assert "ai_insights" in response.json()["detail"]
+
+
+def test_chunks_follow_the_cursor(add_sessions):
+    seed(add_sessions)
+    service = ExportService(chunk_size=3)
+
+    assert [len(chunk) for chunk in service.iter_row_chunks()] == [3, 3, 1]
+    # Header plus one encoded chunk per cursor chunk
+    assert len(list(service.stream_csv())) == 3
+    assert list(ExportService(chunk_size=3).stream_ndjson(user_id="nobody")) == []
@@ -0,0 +1,151 @@
+"""
+Async Engine Benchmark
+Throughput and p99 latency of session history reads under mixed HTTP + WebSocket load
+
+Compares the same history query issued through the synchronous Session
+inside an async handler (the old pattern, which blocks the event loop)
+against the AsyncSession path. All traffic runs on one event loop, as in a
+single worker, while WebSocket clients measure echo round trips.
+
+    python benchmarks/async_engine.py --users 50 --sessions-per-user 400 --seconds 10
+"""
+
+from datetime import datetime, timedelta
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.dirname(SERVICE_DIR), SERVICE_DIR]
+os.environ.setdefault("FOCUS_FLOW_DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+os.environ.setdefault("FOCUS_FLOW_DEBUG_MODE", "false")
+
+from fastapi import Depends  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import insert, select  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncSession  # noqa: E402
+
+from database.connection import Base, SessionLocal, engine  # noqa: E402
+from focus_engine.database.connection import get_async_db  # noqa: E402
+from focus_engine.main import app  # noqa: E402
+from focus_engine.models.session_models import FocusSession  # noqa: E402
+
+HISTORY_COLUMNS = (FocusSession.id, FocusSession.start_time, FocusSession.status, FocusSession.actual_duration)
+
+
+def history_query(user_id: str):
+    return (
+        select(*HISTORY_COLUMNS)
+        .where(FocusSession.user_id == user_id)
+        .order_by(FocusSession.start_time.desc())
+        .limit(200)
+    )
+
+
+@app.get("/bench/sync/{user_id}")
+async def sync_history(user_id: str):
+    db = SessionLocal()
+    try:
+        return {"rows": len(db.execute(history_query(user_id)).all())}
+    finally:
+        db.close()
+
+
+@app.get("/bench/async/{user_id}")
+async def async_history(user_id: str, db: AsyncSession = Depends(get_async_db)):
+    return {"rows": len((await db.execute(history_query(user_id))).all())}
+
+
+def seed(users: int, sessions_per_user: int):
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+
+    now = datetime.utcnow()
+    rows = []
+    for user in range(users):
+        for n in range(sessions_per_user):
+            start = now - timedelta(hours=n * 7 + random.random())
+            rows.append({
+                "user_id": f"user-{user}",
+                "session_type": "deep_work",
+                "status": "completed",
+                "planned_duration": 50,
+                "actual_duration": 45,
+                "start_time": start,
+                "end_time": start + timedelta(minutes=45),
+                "start_date": start.date(),
+                "start_hour": start.hour
+            })
+
+    with engine.begin() as connection:
+        connection.execute(insert(FocusSession.__table__), rows)
+
+
+def percentile(samples, fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] if ordered else 0.0
+
+
+def run_mode(client: TestClient, mode: str, users: int, seconds: float,
+             http_workers: int, websocket_clients: int):
+    deadline = time.perf_counter() + seconds
+    http_latencies, ws_latencies = [], []
+    lock = threading.Lock()
+
+    def http_worker():
+        local = []
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            client.get(f"/bench/{mode}/user-{random.randrange(users)}").raise_for_status()
+            local.append(time.perf_counter() - started)
+        with lock:
+            http_latencies.extend(local)
+
+    def websocket_worker(index: int):
+        local = []
+        with client.websocket_connect(f"/ws/session/bench-{index}") as websocket:
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                websocket.send_text('{"type": "tick"}')
+                websocket.receive_text()
+                local.append(time.perf_counter() - started)
+                time.sleep(0.01)
+        with lock:
+            ws_latencies.extend(local)
+
+    threads = [threading.Thread(target=http_worker) for _ in range(http_workers)]
+    threads += [threading.Thread(target=websocket_worker, args=(i,)) for i in range(websocket_clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    print(
+        f"{mode:>5}: {len(http_latencies) / seconds:8.1f} req/s  "
+        f"http p50 {percentile(http_latencies, 0.5) * 1000:7.2f} ms  "
+        f"http p99 {percentile(http_latencies, 0.99) * 1000:7.2f} ms  "
+        f"ws p99 {percentile(ws_latencies, 0.99) * 1000:7.2f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--sessions-per-user", type=int, default=400)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--http-workers", type=int, default=16)
+    parser.add_argument("--websocket-clients", type=int, default=8)
+    args = parser.parse_args()
+
+    seed(args.users, args.sessions_per_user)
+    with TestClient(app) as client:
+        for mode in ("sync", "async"):
+            run_mode(client, mode, args.users, args.seconds, args.http_workers, args.websocket_clients)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Session Projection Benchmark
+Memory allocated per 10k sessions read, full ORM entities versus column projection
+
+Seeds one user's sessions with the insight, recommendation and achievement
+columns filled in as the AI and gamification services leave them, then
+reads the window three ways under tracemalloc:
+
+  orm       db.query(FocusSession).all(), the old read path
+  records   SessionRecord projection held in a list
+  stream    SessionRecord projection folded into a SessionAggregate
+
+Peak traced memory is reported per 10k sessions alongside wall time.
+
+    python benchmarks/session_projection.py --sessions 50000
+"""
+
+from datetime import datetime, timedelta
+import argparse
+import gc
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.dirname(SERVICE_DIR), SERVICE_DIR]
+os.environ.setdefault("FOCUS_FLOW_DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+os.environ.setdefault("FOCUS_FLOW_DEBUG_MODE", "false")
+
+from sqlalchemy import insert  # noqa: E402
+
+from focus_flow_shared.session_aggregator import SessionAggregate  # noqa: E402
+
+from database.connection import Base, SessionLocal, engine  # noqa: E402
+from focus_engine.database.session_repository import SessionRepository  # noqa: E402
+from focus_engine.models.session_models import FocusSession  # noqa: E402
+
+USER_ID = "bench-user"
+INSIGHT = "Your focus dipped after the second interruption; consider muting notifications. " * 6
+
+
+def seed(sessions: int, batch_size: int = 10000):
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+
+    now = datetime.utcnow()
+    rows = []
+    with engine.begin() as connection:
+        for n in range(sessions):
+            start = now - timedelta(minutes=30 * (n + 1))
+            rows.append({
+                "user_id": USER_ID,
+                "session_type": "deep_work",
+                "status": "completed",
+                "planned_duration": 50,
+                "actual_duration": 45,
+                "productivity_score": 7.5,
+                "interruption_count": 2,
+                "interruption_types": ["notification", "colleague"],
+                "focus_quality": "medium",
+                "start_time": start,
+                "start_date": start.date(),
+                "start_hour": start.hour,
+                "end_time": start + timedelta(minutes=45),
+                "ai_insights": INSIGHT,
+                "optimal_time_suggestions": json.dumps({"hours": [9, 10, 14], "confidence": 0.8}),
+                "improvement_recommendations": [INSIGHT[:120], INSIGHT[120:240]],
+                "achievements_unlocked": [{"id": "streak_7", "title": "Week streak"}]
+            })
+            if len(rows) >= batch_size:
+                connection.execute(insert(FocusSession.__table__), rows)
+                rows = []
+        if rows:
+            connection.execute(insert(FocusSession.__table__), rows)
+
+
+def window():
+    now = datetime.utcnow()
+    return SessionRepository.user_window(USER_ID, now - timedelta(days=3650), now)
+
+
+def read_orm(db):
+    return db.query(FocusSession).filter(*window()).all()
+
+
+def read_records(db):
+    return list(SessionRepository.stream_records(db, *window()))
+
+
+def read_stream(db):
+    aggregate = SessionAggregate()
+    for record in SessionRepository.stream_records(db, *window()):
+        aggregate.add(record)
+    return aggregate
+
+
+def measure(read):
+    db = SessionLocal()
+    try:
+        gc.collect()
+        tracemalloc.start()
+        started = time.perf_counter()
+        result = read(db)
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del result
+        return peak, elapsed
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=50000)
+    args = parser.parse_args()
+
+    seed(args.sessions)
+    per_10k = 10000 / args.sessions
+
+    baseline = None
+    for name, read in (("orm", read_orm), ("records", read_records), ("stream", read_stream)):
+        peak, elapsed = measure(read)
+        baseline = baseline or peak
+        print(
+            f"{name:>8}: {peak * per_10k / 2 ** 20:8.2f} MiB per 10k sessions  "
+            f"({peak / baseline:5.1%} of orm)  {elapsed * per_10k * 1000:8.1f} ms per 10k"
+        )
+
+
+if __name__ == "__main__":
+    main()
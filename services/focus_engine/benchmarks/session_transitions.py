@@ -0,0 +1,90 @@
+"""
+Session Transition Benchmark
+Request latency of pause/resume under concurrent toggling
+
+Starts one session per user, then has several clients per session toggle
+it between paused and active as fast as they can. Every toggle is a
+conditional UPDATE, so racing clients see 409s rather than lost updates;
+the report shows latency for successful and rejected transitions.
+
+Point FOCUS_FLOW_DATABASE_URL at Postgres for representative numbers; the
+SQLite default serializes writers, so keep concurrency low there.
+
+    python benchmarks/session_transitions.py --sessions 20 --clients-per-session 4 --seconds 10
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.dirname(SERVICE_DIR), SERVICE_DIR]
+os.environ.setdefault("FOCUS_FLOW_DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+os.environ.setdefault("FOCUS_FLOW_DEBUG_MODE", "false")
+
+from httpx import AsyncClient  # noqa: E402
+
+from database.connection import Base, engine  # noqa: E402
+from focus_engine.main import app  # noqa: E402
+
+SESSIONS = "/api/v1/sessions/sessions"
+
+
+def percentile(samples, fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] if ordered else 0.0
+
+
+async def run(sessions: int, clients_per_session: int, seconds: float):
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+
+    latencies = {200: [], 409: []}
+
+    async with AsyncClient(app=app, base_url="http://bench") as client:
+        session_ids = []
+        for n in range(sessions):
+            response = await client.post(f"{SESSIONS}/", json={"user_id": f"user-{n}", "planned_duration": 50})
+            session_ids.append(response.json()["id"])
+
+        deadline = time.perf_counter() + seconds
+
+        async def toggler(session_id: int, offset: int):
+            action = ("pause", "resume")[offset % 2]
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                response = await client.post(f"{SESSIONS}/{session_id}/{action}")
+                latencies.setdefault(response.status_code, []).append(time.perf_counter() - started)
+                action = "resume" if action == "pause" else "pause"
+
+        await asyncio.gather(*(
+            toggler(session_id, offset)
+            for session_id in session_ids
+            for offset in range(clients_per_session)
+        ))
+
+    total = sum(len(samples) for samples in latencies.values())
+    print(f"{total / seconds:8.1f} transitions/s over {sessions} sessions x {clients_per_session} clients")
+    for status_code, samples in sorted(latencies.items()):
+        print(
+            f"  {status_code}: {len(samples):7d}  "
+            f"p50 {percentile(samples, 0.5) * 1000:7.2f} ms  "
+            f"p99 {percentile(samples, 0.99) * 1000:7.2f} ms"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--clients-per-session", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+
+    asyncio.run(run(args.sessions, args.clients_per_session, args.seconds))
+
+
+if __name__ == "__main__":
+    main()
@@ -20,6 +20,7 @@ class Settings(BaseSettings):
 
     # Redis settings
     redis_url: str = "redis://localhost:6379/0"
+    redis_socket_timeout_seconds: float = 2.0
 
     # Security settings
     secret_key: str = "focus-flow-secret-key-change-in-production"
@@ -34,6 +35,34 @@ class Settings(BaseSettings):
     session_timeout_minutes: int = 60
     default_session_duration: int = 50  # minutes
     default_break_duration: int = 10    # minutes
+    max_ingest_batch_size: int = 5000
+
+    # Notification settings
+    notification_scheduler_interval_seconds: int = 30
+    optimal_time_reminders_hour_utc: int = 0
+
+    # Cache settings
+    cache_invalidation_channel: str = "focus_engine:cache_invalidation"
+    preferences_cache_ttl_seconds: int = 300
+    preferences_cache_max_entries: int = 10000
+    template_cache_ttl_seconds: int = 300
+    template_cache_max_users: int = 10000
+    template_response_cache_ttl_seconds: int = 3600
+    template_response_cache_max_entries: int = 10000
+    recommendation_cache_ttl_seconds: int = 3600
+    recommendation_popularity_refresh_seconds: int = 900
+    template_usage_flush_seconds: int = 10
+    session_cache_ttl_seconds: int = 30
+    session_cache_max_entries: int = 10000
+    time_series_cache_ttl_seconds: int = 3600
+    time_series_cache_max_users: int = 10000
+
+    # Idempotency settings (the backend also elects the worker that runs nightly jobs;
+    # use "redis" whenever more than one worker is running)
+    idempotency_backend: str = "memory"  # "memory" or "redis"
+    idempotency_ttl_seconds: int = 86400
+    idempotency_max_entries: int = 10000
+    idempotency_claim_ttl_seconds: int = 30
 
     class Config:
         env_prefix = "FOCUS_FLOW_"
@@ -4,8 +4,12 @@ SQLAlchemy setup with connection pooling
 """
 
 from sqlalchemy import create_engine
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
+from typing import AsyncIterator
 from config.settings import get_settings
 import logging
 
@@ -22,8 +26,50 @@ engine = create_engine(
     echo=settings.debug_mode
 )
 
-# Create session factory
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Create session factory; objects stay usable after commit without a refresh round trip
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+
+# Drivers used by the asyncio engine for each backend
+ASYNC_DRIVERS = {
+    "postgresql": "asyncpg",
+    "sqlite": "aiosqlite"
+}
+
+def get_async_database_url(database_url: str) -> str:
+    """Map the configured database URL onto its asyncio driver"""
+    url = make_url(database_url)
+    driver = ASYNC_DRIVERS.get(url.get_backend_name())
+    if driver is None:
+        return database_url
+    return url.set(drivername=f"{url.get_backend_name()}+{driver}").render_as_string(hide_password=False)
+
+# Create asyncio engine so request handlers never block the event loop on queries
+async_database_url = get_async_database_url(settings.database_url)
+async_engine = create_async_engine(
+    async_database_url,
+    echo=settings.debug_mode,
+    **({} if async_database_url.startswith("sqlite") else {
+        "pool_size": 20,
+        "max_overflow": 10,
+        "pool_timeout": 30,
+        "pool_recycle": 3600
+    })
+)
+
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+# INSERT constructs supporting ON CONFLICT ... RETURNING, per backend
+UPSERT_INSERTS = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert
+}
+
+def get_upsert_insert(dialect_name: str):
+    """INSERT construct with on_conflict_do_nothing/do_update for a backend"""
+    insert = UPSERT_INSERTS.get(dialect_name)
+    if insert is None:
+        raise NotImplementedError(f"ON CONFLICT inserts are not supported on {dialect_name}")
+    return insert
 
 # Create declarative base
 Base = declarative_base()
@@ -35,3 +81,12 @@ def get_database() -> Session:
         yield db
     finally:
         db.close()
+
+def get_db() -> Session:
+    """Get database session dependency for synchronous (threadpool) routes"""
+    yield from get_database()
+
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    """Get asyncio database session dependency"""
+    async with AsyncSessionLocal() as db:
+        yield db
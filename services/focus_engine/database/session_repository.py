@@ -0,0 +1,143 @@
+"""
+Session Repository
+Column-projected session reads for analytics and scoring
+"""
+
+from sqlalchemy.orm import Session
+from sqlalchemy import case, func, update
+from datetime import date, datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from ..models.session_models import FocusSession
+
+
+class SessionRecord:
+    """Read-only view of the session columns analytics and scoring use
+
+    Built straight from result tuples, so reads skip ORM identity-map
+    bookkeeping and never load the Text/JSON insight columns.
+    """
+
+    __slots__ = (
+        "id",
+        "session_type",
+        "status",
+        "start_time",
+        "start_date",
+        "start_hour",
+        "planned_duration",
+        "actual_duration",
+        "productivity_score",
+        "interruption_count",
+        "focus_quality"
+    )
+
+    def __init__(self, id: int, session_type: Optional[str], status: str,
+                 start_time: datetime, start_date: date, start_hour: int,
+                 planned_duration: Optional[int],
+                 actual_duration: Optional[int], productivity_score: Optional[float],
+                 interruption_count: Optional[int], focus_quality: Optional[str]):
+        self.id = id
+        self.session_type = session_type
+        self.status = status
+        self.start_time = start_time
+        self.start_date = start_date
+        self.start_hour = start_hour
+        self.planned_duration = planned_duration
+        self.actual_duration = actual_duration
+        self.productivity_score = productivity_score
+        self.interruption_count = interruption_count
+        self.focus_quality = focus_quality
+
+
+# Selected in the same order as SessionRecord's constructor arguments
+SESSION_RECORD_COLUMNS = (
+    FocusSession.id,
+    FocusSession.session_type,
+    FocusSession.status,
+    FocusSession.start_time,
+    FocusSession.start_date,
+    FocusSession.start_hour,
+    FocusSession.planned_duration,
+    FocusSession.actual_duration,
+    FocusSession.productivity_score,
+    FocusSession.interruption_count,
+    FocusSession.focus_quality
+)
+
+
+class SessionRepository:
+    """Projection queries over focus sessions"""
+
+    @staticmethod
+    def user_window(user_id: str, start_time: datetime, end_time: datetime) -> List[Any]:
+        """Criteria for a user's sessions started within [start_time, end_time]"""
+        return [
+            FocusSession.user_id == user_id,
+            FocusSession.start_time >= start_time,
+            FocusSession.start_time <= end_time
+        ]
+
+    @staticmethod
+    def user_date_range(user_id: str, start_date: date, end_date: date) -> List[Any]:
+        """Criteria for a user's sessions started on days within [start_date, end_date]"""
+        return [
+            FocusSession.user_id == user_id,
+            FocusSession.start_date.between(start_date, end_date)
+        ]
+
+    @staticmethod
+    def stream_records(db: Session, *criteria: Any, order_by_start: bool = False,
+                       chunk_size: int = 5000) -> Iterator[SessionRecord]:
+        """Yield matching sessions from a server-side cursor, chunk_size rows at a time
+
+        Memory stays flat however long the window is, as long as callers
+        fold records into accumulators instead of keeping them.
+        """
+
+        query = db.query(*SESSION_RECORD_COLUMNS).filter(*criteria)
+        if order_by_start:
+            query = query.order_by(FocusSession.start_time)
+
+        for row in query.yield_per(chunk_size):
+            yield SessionRecord(*row)
+
+    @staticmethod
+    def type_completion_counts(db: Session, *criteria: Any) -> List[Tuple[Optional[str], int, int]]:
+        """(session_type, sessions, completed sessions) for matching sessions, one row per type"""
+
+        completed = func.sum(case((FocusSession.status == "completed", 1), else_=0))
+        return [
+            (session_type, total, completed_count or 0)
+            for session_type, total, completed_count in db.query(
+                FocusSession.session_type, func.count(), completed
+            ).filter(*criteria).group_by(FocusSession.session_type)
+        ]
+
+    @staticmethod
+    def completed_dates(db: Session, *criteria: Any) -> List[date]:
+        """Distinct start dates of matching completed sessions"""
+
+        return [
+            start_date for (start_date,) in db.query(FocusSession.start_date).filter(
+                *criteria, FocusSession.status == "completed"
+            ).distinct()
+        ]
+
+    @staticmethod
+    def update_focus_quality(db: Session, qualities: Dict[int, str], commit: bool = True):
+        """Write focus_quality for many sessions as one executemany UPDATE
+
+        With commit=False the caller commits, e.g. after writing several
+        chunks while a stream over the same sessions is still open.
+        """
+
+        if not qualities:
+            return
+
+        db.execute(
+            update(FocusSession),
+            [{"id": session_id, "focus_quality": quality} for session_id, quality in qualities.items()]
+        )
+        if commit:
+            db.commit()
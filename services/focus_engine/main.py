@@ -5,12 +5,17 @@ Main FastAPI application for focus session management
 
 from fastapi import FastAPI, Depends, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, suppress
+import asyncio
 import uvicorn
 from config.settings import get_settings
 from config.logging_config import setup_logging
 from .routers import health, sessions, websockets, analytics, templates
-from database.connection import engine
+from database.connection import engine, async_engine
+from .utils.cache import invalidation_bus
+from .utils.idempotency import idempotency_store
+from .services.template_service import template_service
+from .services.notification_service import notification_service, smart_reminder_service
 from sqlalchemy.orm import Session
 
 # Initialize settings and logging
@@ -21,7 +26,21 @@ logger = setup_logging()
 async def lifespan(app: FastAPI):
     """Application lifespan management"""
     logger.info("🚀 Focus Engine service starting up...")
+    invalidation_bus.start()
+    background_tasks = [
+        asyncio.create_task(template_service.run_usage_flusher(settings.template_usage_flush_seconds)),
+        asyncio.create_task(notification_service.run_scheduler(settings.notification_scheduler_interval_seconds)),
+        asyncio.create_task(smart_reminder_service.run_nightly_reminders(settings.optimal_time_reminders_hour_utc))
+    ]
     yield
+    for task in background_tasks:
+        task.cancel()
+    for task in background_tasks:
+        with suppress(asyncio.CancelledError):
+            await task
+    invalidation_bus.stop()
+    await idempotency_store.close()
+    await async_engine.dispose()
     logger.info("📴 Focus Engine service shutting down...")
 
 # Create FastAPI application
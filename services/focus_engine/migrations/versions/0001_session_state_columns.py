@@ -0,0 +1,70 @@
+"""Session state columns on focus_sessions
+
+Adds status and the transition columns the session service writes,
+backfills them for existing rows and only then makes the required ones
+NOT NULL. Legacy rows with an end_time are completed; rows without one
+cannot be resumed and become cancelled, which also keeps them out of the
+one-open-session-per-user index.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+OPEN_SESSION_FILTER = sa.text("status IN ('active', 'paused')")
+
+
+def _planned_end_expression(dialect: str) -> str:
+    """SQL for the planned end of each row"""
+    if dialect == "sqlite":
+        return "datetime(start_time, '+' || COALESCE(planned_duration, 0) || ' minutes')"
+    return "start_time + COALESCE(planned_duration, 0) * INTERVAL '1 minute'"
+
+
+def upgrade():
+    with op.batch_alter_table("focus_sessions") as batch:
+        batch.add_column(sa.Column("planned_end_time", sa.DateTime(), nullable=True))
+        batch.add_column(sa.Column("paused_at", sa.DateTime(), nullable=True))
+        batch.add_column(sa.Column("resumed_at", sa.DateTime(), nullable=True))
+        batch.add_column(sa.Column("status", sa.String(20), nullable=True))
+        batch.add_column(sa.Column("completion_reason", sa.String(50), nullable=True))
+        batch.add_column(sa.Column("interruption_count", sa.Integer(), nullable=True))
+
+    planned_end_time = _planned_end_expression(op.get_bind().dialect.name)
+    op.execute(f"""
+        UPDATE focus_sessions SET
+            status = CASE WHEN end_time IS NOT NULL THEN 'completed' ELSE 'cancelled' END,
+            planned_end_time = {planned_end_time},
+            interruption_count = COALESCE(interruptions, 0)
+    """)
+
+    with op.batch_alter_table("focus_sessions") as batch:
+        batch.alter_column("status", existing_type=sa.String(20), nullable=False)
+        batch.alter_column("interruption_count", existing_type=sa.Integer(), nullable=False)
+
+    op.create_index(
+        "uq_focus_sessions_user_open",
+        "focus_sessions",
+        ["user_id"],
+        unique=True,
+        postgresql_where=OPEN_SESSION_FILTER,
+        sqlite_where=OPEN_SESSION_FILTER
+    )
+
+
+def downgrade():
+    op.drop_index("uq_focus_sessions_user_open", table_name="focus_sessions")
+
+    with op.batch_alter_table("focus_sessions") as batch:
+        for column in ("interruption_count", "completion_reason", "status", "resumed_at",
+                       "paused_at", "planned_end_time"):
+            batch.drop_column(column)
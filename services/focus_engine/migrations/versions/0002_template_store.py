@@ -0,0 +1,83 @@
+"""Persistent template store
+
+Creates the tables behind custom templates, custom presets and template
+usage counters, with the user_id indexes the per-user template loads use.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "session_templates",
+        sa.Column("id", sa.String(64), primary_key=True),
+        sa.Column("user_id", sa.String(255), nullable=False),
+        sa.Column("name", sa.String(100), nullable=False),
+        sa.Column("description", sa.String(500)),
+        sa.Column("category", sa.String(50), nullable=False),
+        sa.Column("difficulty", sa.String(50), nullable=False),
+        sa.Column("session_type", sa.String(50), nullable=False),
+        sa.Column("duration_minutes", sa.Integer(), nullable=False),
+        sa.Column("break_duration_minutes", sa.Integer()),
+        sa.Column("allow_interruptions", sa.Boolean()),
+        sa.Column("auto_start_breaks", sa.Boolean()),
+        sa.Column("reminder_intervals", sa.JSON(), nullable=True),
+        sa.Column("focus_music_enabled", sa.Boolean()),
+        sa.Column("distraction_blocking", sa.Boolean()),
+        sa.Column("productivity_tracking", sa.Boolean()),
+        sa.Column("background_theme", sa.String(100), nullable=True),
+        sa.Column("notification_sound", sa.String(100), nullable=True),
+        sa.Column("completion_reward", sa.String(255), nullable=True),
+        sa.Column("tags", sa.JSON(), nullable=True),
+        sa.Column("is_favorite", sa.Boolean()),
+        sa.Column("created_at", sa.DateTime()),
+        sa.Column("updated_at", sa.DateTime())
+    )
+    op.create_index("ix_session_templates_user_id", "session_templates", ["user_id"])
+
+    op.create_table(
+        "productivity_presets",
+        sa.Column("id", sa.String(64), primary_key=True),
+        sa.Column("user_id", sa.String(255), nullable=False),
+        sa.Column("name", sa.String(100), nullable=False),
+        sa.Column("description", sa.String(500)),
+        sa.Column("templates", sa.JSON(), nullable=False),
+        sa.Column("daily_goal_sessions", sa.Integer(), nullable=False),
+        sa.Column("daily_goal_minutes", sa.Integer(), nullable=False),
+        sa.Column("weekly_goal_sessions", sa.Integer(), nullable=False),
+        sa.Column("weekly_goal_minutes", sa.Integer(), nullable=False),
+        sa.Column("suggested_start_times", sa.JSON(), nullable=True),
+        sa.Column("suggested_days", sa.JSON(), nullable=True),
+        sa.Column("includes_breaks", sa.Boolean()),
+        sa.Column("adaptive_difficulty", sa.Boolean()),
+        sa.Column("progress_tracking", sa.Boolean()),
+        sa.Column("created_at", sa.DateTime())
+    )
+    op.create_index("ix_productivity_presets_user_id", "productivity_presets", ["user_id"])
+
+    op.create_table(
+        "template_usage",
+        sa.Column("template_id", sa.String(64), primary_key=True),
+        sa.Column("usage_count", sa.Integer(), nullable=False),
+        sa.Column("completed_count", sa.Integer(), nullable=False),
+        sa.Column("updated_at", sa.DateTime())
+    )
+
+
+def downgrade():
+    op.drop_table("template_usage")
+    op.drop_index("ix_productivity_presets_user_id", table_name="productivity_presets")
+    op.drop_table("productivity_presets")
+    op.drop_index("ix_session_templates_user_id", table_name="session_templates")
+    op.drop_table("session_templates")
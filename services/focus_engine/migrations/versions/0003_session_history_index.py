@@ -0,0 +1,30 @@
+"""Keyset index for session history pages
+
+Serves a user's history newest first, (start_time, id) descending, so
+every page is a range scan however deep the cursor is.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        "ix_focus_sessions_user_start_id",
+        "focus_sessions",
+        ["user_id", sa.text("start_time DESC"), sa.text("id DESC")]
+    )
+
+
+def downgrade():
+    op.drop_index("ix_focus_sessions_user_start_id", table_name="focus_sessions")
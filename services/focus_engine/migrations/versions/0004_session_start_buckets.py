@@ -0,0 +1,49 @@
+"""Stored start date and hour buckets on focus_sessions
+
+Adds start_date and start_hour, derived from start_time, backfills them for
+existing rows and only then makes them NOT NULL, so date-range and hourly
+analytics filter and group on plain indexed columns.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def _backfill_expressions(dialect: str):
+    """SQL for the UTC start date and start hour of each row"""
+    if dialect == "sqlite":
+        return "date(start_time)", "CAST(strftime('%H', start_time) AS INTEGER)"
+    return "CAST(start_time AS DATE)", "EXTRACT(HOUR FROM start_time)"
+
+
+def upgrade():
+    with op.batch_alter_table("focus_sessions") as batch:
+        batch.add_column(sa.Column("start_date", sa.Date(), nullable=True))
+        batch.add_column(sa.Column("start_hour", sa.SmallInteger(), nullable=True))
+
+    start_date, start_hour = _backfill_expressions(op.get_bind().dialect.name)
+    op.execute(f"UPDATE focus_sessions SET start_date = {start_date}, start_hour = {start_hour}")
+
+    with op.batch_alter_table("focus_sessions") as batch:
+        batch.alter_column("start_date", existing_type=sa.Date(), nullable=False)
+        batch.alter_column("start_hour", existing_type=sa.SmallInteger(), nullable=False)
+
+    op.create_index("ix_focus_sessions_user_start_date", "focus_sessions", ["user_id", "start_date"])
+
+
+def downgrade():
+    op.drop_index("ix_focus_sessions_user_start_date", table_name="focus_sessions")
+
+    with op.batch_alter_table("focus_sessions") as batch:
+        batch.drop_column("start_hour")
+        batch.drop_column("start_date")
@@ -3,33 +3,68 @@ Focus Session Data Models
 SQLAlchemy models for focus sessions and related data
 """
 
-from sqlalchemy import Column, Integer, String, DateTime, Float, Boolean, JSON, Text
-from sqlalchemy.dialects.postgresql import UUID, ARRAY
+from sqlalchemy import Column, Integer, SmallInteger, String, Date, DateTime, Float, Boolean, JSON, Text, Index, Uuid, text
 from database.connection import Base
-from datetime import datetime
+from datetime import date, datetime
 from typing import Optional, List, Dict, Any
 import uuid
 from pydantic import BaseModel, Field, validator
 
+# Statuses of a session that has not finished yet; a user may have at most one
+OPEN_SESSION_STATUSES = ("active", "paused")
+OPEN_SESSION_INDEX = "uq_focus_sessions_user_open"
+
+
+def _start_date_default(context) -> date:
+    """UTC calendar date of the row's start_time"""
+    return context.get_current_parameters()["start_time"].date()
+
+
+def _start_hour_default(context) -> int:
+    """UTC hour of the row's start_time"""
+    return context.get_current_parameters()["start_time"].hour
+
+
 class FocusSession(Base):
     """Focus session database model"""
     __tablename__ = "focus_sessions"
+    __table_args__ = (
+        # One open session per user, enforced by the database
+        Index(
+            OPEN_SESSION_INDEX,
+            "user_id",
+            unique=True,
+            postgresql_where=text("status IN ('active', 'paused')"),
+            sqlite_where=text("status IN ('active', 'paused')")
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    session_uuid = Column(UUID(as_uuid=True), default=uuid.uuid4, unique=True, index=True)
+    session_uuid = Column(Uuid(as_uuid=True), default=uuid.uuid4, unique=True, index=True)
     user_id = Column(String(255), index=True)  # Future multi-user support
 
     # Session timing
     start_time = Column(DateTime, nullable=False, index=True)
+    # Derived from start_time on insert so date/hour buckets are plain indexed comparisons
+    start_date = Column(Date, nullable=False, default=_start_date_default)
+    start_hour = Column(SmallInteger, nullable=False, default=_start_hour_default)
     end_time = Column(DateTime, nullable=True)
     planned_duration = Column(Integer, default=50)  # minutes
     actual_duration = Column(Integer, nullable=True)
     break_duration = Column(Integer, default=10)
+    planned_end_time = Column(DateTime, nullable=True)
+    paused_at = Column(DateTime, nullable=True)
+    resumed_at = Column(DateTime, nullable=True)
+
+    # Session state
+    status = Column(String(20), nullable=False, default="active")  # "active", "paused", "completed", "cancelled"
+    completion_reason = Column(String(50), nullable=True)
 
     # Session quality metrics
     completion_rate = Column(Float, nullable=True)  # 0.0 to 1.0
     productivity_score = Column(Float, nullable=True)  # 0.0 to 10.0
     interruptions = Column(Integer, default=0)
+    interruption_count = Column(Integer, nullable=False, default=0)
     interruption_types = Column(JSON, nullable=True)
     focus_quality = Column(String(50), nullable=True)  # "high", "medium", "low"
 
@@ -54,12 +89,27 @@ class FocusSession(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+# Serves per-user history pages in keyset order: (start_time, id) descending
+Index(
+    "ix_focus_sessions_user_start_id",
+    FocusSession.user_id,
+    FocusSession.start_time.desc(),
+    FocusSession.id.desc()
+)
+
+# Serves date-range analytics without computing date(start_time) per row
+Index(
+    "ix_focus_sessions_user_start_date",
+    FocusSession.user_id,
+    FocusSession.start_date
+)
+
 class User(Base):
     """User model for future multi-user support"""
     __tablename__ = "users"
 
     id = Column(Integer, primary_key=True, index=True)
-    user_uuid = Column(UUID(as_uuid=True), default=uuid.uuid4, unique=True, index=True)
+    user_uuid = Column(Uuid(as_uuid=True), default=uuid.uuid4, unique=True, index=True)
     username = Column(String(255), unique=True, index=True)
     email = Column(String(255), unique=True, index=True, nullable=True)
 
@@ -137,7 +187,7 @@ class FocusSessionUpdate(BaseModel):
     
 class FocusSessionResponse(BaseModel):
     """Enhanced response model for focus session data"""
-    id: str
+    id: int
     user_id: str
     session_type: str
     planned_duration: int
@@ -165,3 +215,38 @@ class FocusSessionList(BaseModel):
     total: Optional[int] = None
     page: Optional[int] = None
     limit: Optional[int] = None
+    next_cursor: Optional[str] = None
+
+class SessionIngestRecord(BaseModel):
+    """A finished session recorded offline by a client"""
+    session_uuid: uuid.UUID = Field(..., description="Client-generated session identifier")
+    user_id: str
+    session_type: str = "pomodoro"
+    planned_duration: int
+    start_time: datetime
+    end_time: datetime
+    actual_duration: Optional[int] = None
+    status: str = "completed"
+    completion_reason: Optional[str] = None
+    completion_rate: Optional[float] = None
+    productivity_score: Optional[float] = None
+    interruption_count: int = 0
+
+class SessionIngestRequest(BaseModel):
+    """Batch of offline session records"""
+    sessions: List[SessionIngestRecord] = Field(..., min_length=1)
+
+class SessionIngestResult(BaseModel):
+    """Outcome for one record of an ingest batch"""
+    index: int
+    session_uuid: str
+    result: str  # "created", "duplicate", "invalid"
+    id: Optional[int] = None
+    errors: List[str] = []
+
+class SessionIngestResponse(BaseModel):
+    """Per-item results of an ingest batch"""
+    results: List[SessionIngestResult]
+    created: int
+    duplicates: int
+    invalid: int
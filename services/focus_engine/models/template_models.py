@@ -0,0 +1,86 @@
+"""
+Session Template Data Models
+SQLAlchemy models for custom templates, presets and template usage
+"""
+
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, JSON
+from database.connection import Base
+from datetime import datetime
+
+
+class StoredTemplate(Base):
+    """User-created session template"""
+    __tablename__ = "session_templates"
+
+    id = Column(String(64), primary_key=True)
+    user_id = Column(String(255), nullable=False, index=True)
+
+    name = Column(String(100), nullable=False)
+    description = Column(String(500), default="")
+    category = Column(String(50), nullable=False)
+    difficulty = Column(String(50), nullable=False)
+
+    # Session configuration
+    session_type = Column(String(50), nullable=False)
+    duration_minutes = Column(Integer, nullable=False)
+    break_duration_minutes = Column(Integer, default=5)
+
+    # Advanced settings
+    allow_interruptions = Column(Boolean, default=False)
+    auto_start_breaks = Column(Boolean, default=True)
+    reminder_intervals = Column(JSON, nullable=True)
+
+    # Productivity features
+    focus_music_enabled = Column(Boolean, default=False)
+    distraction_blocking = Column(Boolean, default=False)
+    productivity_tracking = Column(Boolean, default=True)
+
+    # Customizations
+    background_theme = Column(String(100), nullable=True)
+    notification_sound = Column(String(100), nullable=True)
+    completion_reward = Column(String(255), nullable=True)
+
+    # Metadata
+    tags = Column(JSON, nullable=True)
+    is_favorite = Column(Boolean, default=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class StoredPreset(Base):
+    """User-created productivity preset"""
+    __tablename__ = "productivity_presets"
+
+    id = Column(String(64), primary_key=True)
+    user_id = Column(String(255), nullable=False, index=True)
+
+    name = Column(String(100), nullable=False)
+    description = Column(String(500), default="")
+    templates = Column(JSON, nullable=False)  # Template IDs in sequence
+
+    # Goals
+    daily_goal_sessions = Column(Integer, nullable=False)
+    daily_goal_minutes = Column(Integer, nullable=False)
+    weekly_goal_sessions = Column(Integer, nullable=False)
+    weekly_goal_minutes = Column(Integer, nullable=False)
+
+    # Scheduling
+    suggested_start_times = Column(JSON, nullable=True)
+    suggested_days = Column(JSON, nullable=True)
+
+    # Features
+    includes_breaks = Column(Boolean, default=True)
+    adaptive_difficulty = Column(Boolean, default=False)
+    progress_tracking = Column(Boolean, default=True)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class TemplateUsage(Base):
+    """Usage counters for system and user templates"""
+    __tablename__ = "template_usage"
+
+    template_id = Column(String(64), primary_key=True)
+    usage_count = Column(Integer, nullable=False, default=0)
+    completed_count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -23,6 +23,11 @@ def get_daily_trends(user_id: str, days: int = Query(30, ge=1, le=365), db: Sess
     """Get daily productivity trends"""
     return SessionAnalytics.calculate_daily_trends(db, user_id, days)
 
+@router.get("/users/{user_id}/trends/rolling")
+def get_rolling_trends(user_id: str, db: Session = Depends(get_db)):
+    """Get rolling 7/30/90-day sums, means and EWMAs"""
+    return SessionAnalytics.calculate_rolling_trends(db, user_id)
+
 @router.get("/users/{user_id}/patterns/hourly")
 def get_hourly_patterns(user_id: str, days: int = Query(30, ge=1, le=365), db: Session = Depends(get_db)):
     """Get hourly productivity patterns"""
@@ -3,116 +3,236 @@ Sessions Router
 Endpoints for focus sessions management
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status, BackgroundTasks
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, Awaitable, Callable, Dict, List, Optional
 import logging
+import uuid
 
-from ..database.connection import get_db
+from ..config.settings import get_settings
+from ..database.connection import get_async_db
 from ..models.session_models import (
     FocusSession, 
     FocusSessionCreate, 
     FocusSessionResponse,
     FocusSessionUpdate,
-    FocusSessionList
+    FocusSessionList,
+    SessionIngestRequest,
+    SessionIngestResponse
 )
-from ..services.session_service import SessionService
+from ..services.session_service import SessionService, SessionConflictError, SessionNotFoundError
+from ..utils.idempotency import idempotency_store, IdempotencyKeyReusedError
+from ..utils.validators import SessionValidators
 
 logger = logging.getLogger("focus_engine.routers.sessions")
 router = APIRouter()
+settings = get_settings()
 
 @router.post("/sessions/", response_model=FocusSessionResponse, status_code=status.HTTP_201_CREATED)
-async def start_session(session: FocusSessionCreate, db: Session = Depends(get_db)):
+async def start_session(
+    session: FocusSessionCreate,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    db: AsyncSession = Depends(get_async_db)
+):
     """Start a new focus session"""
     
-    try:
-        db_session = await SessionService.start_session(
-            db=db,
-            user_id=session.user_id,
-            duration_minutes=session.planned_duration,
-            session_type=session.session_type
+    async def start():
+        try:
+            db_session = await SessionService.start_session(
+                db=db,
+                user_id=session.user_id,
+                duration_minutes=session.planned_duration,
+                session_type=session.session_type
+            )
+            return _session_payload(db_session)
+        except SessionConflictError as e:
+            logger.warning(f"Failed to start session: {str(e)}")
+            raise HTTPException(status_code=409, detail=str(e))
+        except ValueError as e:
+            logger.warning(f"Failed to start session: {str(e)}")
+            raise HTTPException(status_code=400, detail=str(e))
+    
+    return await _idempotent(response, "start_session", idempotency_key, session.model_dump_json(), start)
+
+@router.post("/sessions/batch", response_model=SessionIngestResponse)
+async def ingest_sessions(batch: SessionIngestRequest, db: AsyncSession = Depends(get_async_db)):
+    """Store a batch of finished sessions recorded offline"""
+    
+    if len(batch.sessions) > settings.max_ingest_batch_size:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch exceeds {settings.max_ingest_batch_size} sessions"
         )
-        return db_session
-    except ValueError as e:
-        logger.warning(f"Failed to start session: {str(e)}")
-        raise HTTPException(status_code=400, detail=str(e))
+    
+    return await SessionService.ingest_sessions(db=db, records=batch.sessions)
 
 @router.post("/sessions/{session_id}/pause", response_model=FocusSessionResponse)
-async def pause_session(session_id: str, db: Session = Depends(get_db)):
+async def pause_session(
+    session_id: int,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    db: AsyncSession = Depends(get_async_db)
+):
     """Pause an active session"""
     
-    try:
-        db_session = await SessionService.pause_session(db=db, session_id=session_id)
-        return db_session
-    except ValueError as e:
-        logger.warning(f"Failed to pause session: {str(e)}")
-        raise HTTPException(status_code=400, detail=str(e))
+    async def pause():
+        try:
+            db_session = await SessionService.pause_session(db=db, session_id=session_id)
+            return _session_payload(db_session)
+        except SessionNotFoundError as e:
+            raise HTTPException(status_code=404, detail=str(e))
+        except SessionConflictError as e:
+            logger.warning(f"Failed to pause session: {str(e)}")
+            raise HTTPException(status_code=409, detail=str(e))
+        except ValueError as e:
+            logger.warning(f"Failed to pause session: {str(e)}")
+            raise HTTPException(status_code=400, detail=str(e))
+    
+    return await _idempotent(response, f"pause_session:{session_id}", idempotency_key, "", pause)
 
 @router.post("/sessions/{session_id}/resume", response_model=FocusSessionResponse)
-async def resume_session(session_id: str, db: Session = Depends(get_db)):
+async def resume_session(
+    session_id: int,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    db: AsyncSession = Depends(get_async_db)
+):
     """Resume a paused session"""
     
-    try:
-        db_session = await SessionService.resume_session(db=db, session_id=session_id)
-        return db_session
-    except ValueError as e:
-        logger.warning(f"Failed to resume session: {str(e)}")
-        raise HTTPException(status_code=400, detail=str(e))
+    async def resume():
+        try:
+            db_session = await SessionService.resume_session(db=db, session_id=session_id)
+            return _session_payload(db_session)
+        except SessionNotFoundError as e:
+            raise HTTPException(status_code=404, detail=str(e))
+        except SessionConflictError as e:
+            logger.warning(f"Failed to resume session: {str(e)}")
+            raise HTTPException(status_code=409, detail=str(e))
+        except ValueError as e:
+            logger.warning(f"Failed to resume session: {str(e)}")
+            raise HTTPException(status_code=400, detail=str(e))
+    
+    return await _idempotent(response, f"resume_session:{session_id}", idempotency_key, "", resume)
 
 @router.post("/sessions/{session_id}/complete", response_model=FocusSessionResponse)
-async def complete_session(session_id: str, completion_reason: str = "completed", db: Session = Depends(get_db)):
+async def complete_session(
+    session_id: int,
+    response: Response,
+    completion_reason: str = "completed",
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    db: AsyncSession = Depends(get_async_db)
+):
     """Complete a session"""
     
-    try:
-        db_session = await SessionService.complete_session(
-            db=db, 
-            session_id=session_id,
-            completion_reason=completion_reason
-        )
-        return db_session
-    except ValueError as e:
-        logger.warning(f"Failed to complete session: {str(e)}")
-        raise HTTPException(status_code=400, detail=str(e))
+    async def complete():
+        try:
+            db_session = await SessionService.complete_session(
+                db=db, 
+                session_id=session_id,
+                completion_reason=completion_reason
+            )
+            return _session_payload(db_session)
+        except SessionNotFoundError as e:
+            raise HTTPException(status_code=404, detail=str(e))
+        except SessionConflictError as e:
+            logger.warning(f"Failed to complete session: {str(e)}")
+            raise HTTPException(status_code=409, detail=str(e))
+        except ValueError as e:
+            logger.warning(f"Failed to complete session: {str(e)}")
+            raise HTTPException(status_code=400, detail=str(e))
+    
+    return await _idempotent(
+        response, f"complete_session:{session_id}", idempotency_key, completion_reason, complete
+    )
 
 @router.get("/sessions/{session_id}", response_model=FocusSessionResponse)
-def get_session(session_id: str, db: Session = Depends(get_db)):
+async def get_session(session_id: int, db: AsyncSession = Depends(get_async_db)):
     """Get a specific focus session"""
     
-    db_session = db.query(FocusSession).filter(FocusSession.id == session_id).first()
-    if db_session is None:
+    session = await SessionService.get_session(db=db, session_id=session_id)
+    if session is None:
         logger.warning(f"Session with ID {session_id} not found")
         raise HTTPException(status_code=404, detail="Session not found")
     
-    return db_session
+    return session
+
+@router.get("/sessions/uuid/{session_uuid}", response_model=FocusSessionResponse)
+async def get_session_by_uuid(session_uuid: uuid.UUID, db: AsyncSession = Depends(get_async_db)):
+    """Get a specific focus session by its uuid"""
+    
+    session = await SessionService.get_session_by_uuid(db=db, session_uuid=session_uuid)
+    if session is None:
+        logger.warning(f"Session with UUID {session_uuid} not found")
+        raise HTTPException(status_code=404, detail="Session not found")
+    
+    return session
 
 @router.get("/sessions/user/{user_id}", response_model=FocusSessionList)
-def get_user_sessions(user_id: str, limit: int = 10, db: Session = Depends(get_db)):
-    """Get recent focus sessions for a user"""
+async def get_user_sessions(
+    user_id: str,
+    limit: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the previous page"),
+    session_status: Optional[str] = Query(None, alias="status"),
+    session_type: Optional[str] = None,
+    count: Optional[str] = Query(None, pattern="^(exact|approximate)$"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get a page of focus sessions for a user, newest first"""
+    
+    if session_status is not None and not SessionValidators.validate_session_status(session_status):
+        raise HTTPException(status_code=400, detail=f"Invalid status: {session_status}")
     
-    sessions = SessionService.get_user_sessions(db=db, user_id=user_id, limit=limit)
-    return {"sessions": sessions}
+    try:
+        return await SessionService.get_user_sessions_page(
+            db=db,
+            user_id=user_id,
+            limit=limit,
+            cursor=cursor,
+            status=session_status,
+            session_type=session_type,
+            count=count
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/sessions/user/{user_id}/active", response_model=FocusSessionResponse)
-def get_active_session(user_id: str, db: Session = Depends(get_db)):
+async def get_active_session(user_id: str, db: AsyncSession = Depends(get_async_db)):
     """Get a user's active session if any"""
     
-    session = SessionService.get_active_session(db=db, user_id=user_id)
+    session = await SessionService.get_active_session(db=db, user_id=user_id)
     if session is None:
         raise HTTPException(status_code=404, detail="No active session found")
     
     return session
 
 @router.delete("/sessions/{session_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_session(session_id: str, db: Session = Depends(get_db)):
+async def delete_session(session_id: int, db: AsyncSession = Depends(get_async_db)):
     """Delete a focus session"""
     
-    db_session = db.query(FocusSession).filter(FocusSession.id == session_id).first()
-    if db_session is None:
+    deleted = await SessionService.delete_session(db=db, session_id=session_id)
+    if not deleted:
         logger.warning(f"Session with ID {session_id} not found for deletion")
         raise HTTPException(status_code=404, detail="Session not found")
     
-    db.delete(db_session)
-    db.commit()
-    
     logger.info(f"Deleted session with ID: {session_id}")
     return None
+
+async def _idempotent(response: Response, scope: str, idempotency_key: Optional[str],
+                      fingerprint: str, handler: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+    """Run a mutation once per Idempotency-Key, replaying the stored response on retries"""
+    
+    if idempotency_key is None:
+        return await handler()
+    
+    try:
+        body, replayed = await idempotency_store.run(scope, idempotency_key, fingerprint, handler)
+    except IdempotencyKeyReusedError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    
+    if replayed:
+        response.headers["Idempotency-Replayed"] = "true"
+    return body
+
+def _session_payload(db_session: FocusSession) -> Dict[str, Any]:
+    return FocusSessionResponse.model_validate(db_session).model_dump(mode="json")
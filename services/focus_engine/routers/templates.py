@@ -3,15 +3,27 @@ Templates Router
 Endpoints for session templates and productivity presets
 """
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.orm import Session
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Callable, Hashable
 from pydantic import BaseModel, Field
+from functools import lru_cache
+import hashlib
+import json
 
+from ..config.settings import get_settings
 from ..database.connection import get_db
 from ..services.template_service import template_service, TemplateCategory, DifficultyLevel
+from ..utils.cache import TTLCache
 
 router = APIRouter()
+settings = get_settings()
+
+# Serialized template/preset responses keyed by view, tagged with the template version
+_response_cache = TTLCache(
+    maxsize=settings.template_response_cache_max_entries,
+    ttl_seconds=settings.template_response_cache_ttl_seconds
+)
 
 
 class TemplateCreateRequest(BaseModel):
@@ -58,6 +70,7 @@ class TemplateUpdateRequest(BaseModel):
 
 @router.get("/users/{user_id}/templates")
 def get_user_templates(
+    request: Request,
     user_id: str,
     category: Optional[str] = Query(None),
     difficulty: Optional[str] = Query(None),
@@ -80,12 +93,53 @@ def get_user_templates(
         except ValueError:
             raise HTTPException(status_code=400, detail=f"Invalid difficulty: {difficulty}")
     
-    templates = template_service.get_templates_for_user(
-        user_id, category_enum, difficulty_enum, include_system
+    def build():
+        templates = template_service.get_templates_for_user(
+            user_id, category_enum, difficulty_enum, include_system
+        )
+        return {
+            "templates": [_template_summary(t) for t in templates],
+            "total_count": len(templates)
+        }
+    
+    return _conditional_response(
+        request,
+        ("templates", user_id, category_enum, difficulty_enum, include_system),
+        template_service.get_template_version(user_id),
+        build
     )
+
+
+@router.get("/users/{user_id}/templates/search")
+def search_templates(
+    user_id: str,
+    q: str = Query(..., min_length=1, max_length=100),
+    include_system: bool = Query(True),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0)
+):
+    """Search templates by name, description, tags and session type (prefix match)"""
+    
+    templates, total = template_service.search_templates(
+        user_id, q, include_system=include_system, limit=limit, offset=offset
+    )
+    
+    return {
+        "templates": [_template_summary(t) for t in templates],
+        "total_count": total,
+        "limit": limit,
+        "offset": offset
+    }
+
+
+@router.get("/users/{user_id}/templates/recommendations")
+def get_template_recommendations(user_id: str, count: int = Query(5, ge=1, le=20), db: Session = Depends(get_db)):
+    """Get personalized template recommendations for a user"""
+    
+    templates = template_service.get_recommended_templates(user_id, db, count)
     
     return {
-        "templates": [
+        "recommendations": [
             {
                 "id": t.id,
                 "name": t.name,
@@ -94,54 +148,29 @@ def get_user_templates(
                 "difficulty": t.difficulty.value,
                 "session_type": t.session_type,
                 "duration_minutes": t.duration_minutes,
-                "break_duration_minutes": t.break_duration_minutes,
-                "is_favorite": t.is_favorite,
-                "is_system_template": t.is_system_template,
                 "usage_count": t.usage_count,
                 "average_completion_rate": t.average_completion_rate,
                 "tags": t.tags,
-                "created_at": t.created_at.isoformat() if t.created_at else None
+                "is_system_template": t.is_system_template
             } for t in templates
-        ],
-        "total_count": len(templates)
+        ]
     }
 
 
 @router.get("/users/{user_id}/templates/{template_id}")
-def get_template_details(user_id: str, template_id: str):
+def get_template_details(request: Request, user_id: str, template_id: str):
     """Get detailed information about a specific template"""
     
     template = template_service.get_template_by_id(template_id, user_id)
     if not template:
         raise HTTPException(status_code=404, detail="Template not found")
     
-    return {
-        "id": template.id,
-        "user_id": template.user_id,
-        "name": template.name,
-        "description": template.description,
-        "category": template.category.value,
-        "difficulty": template.difficulty.value,
-        "session_type": template.session_type,
-        "duration_minutes": template.duration_minutes,
-        "break_duration_minutes": template.break_duration_minutes,
-        "allow_interruptions": template.allow_interruptions,
-        "auto_start_breaks": template.auto_start_breaks,
-        "reminder_intervals": template.reminder_intervals,
-        "focus_music_enabled": template.focus_music_enabled,
-        "distraction_blocking": template.distraction_blocking,
-        "productivity_tracking": template.productivity_tracking,
-        "background_theme": template.background_theme,
-        "notification_sound": template.notification_sound,
-        "completion_reward": template.completion_reward,
-        "tags": template.tags,
-        "is_favorite": template.is_favorite,
-        "is_system_template": template.is_system_template,
-        "usage_count": template.usage_count,
-        "average_completion_rate": template.average_completion_rate,
-        "created_at": template.created_at.isoformat() if template.created_at else None,
-        "updated_at": template.updated_at.isoformat() if template.updated_at else None
-    }
+    return _conditional_response(
+        request,
+        ("template", user_id, template_id),
+        template_service.get_template_version(user_id),
+        lambda: _template_details(template)
+    )
 
 
 @router.post("/users/{user_id}/templates")
@@ -178,7 +207,11 @@ def update_template(user_id: str, template_id: str, updates: TemplateUpdateReque
     if not update_data:
         raise HTTPException(status_code=400, detail="No updates provided")
     
-    template = template_service.update_template(template_id, user_id, update_data)
+    try:
+        template = template_service.update_template(template_id, user_id, update_data)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
     if not template:
         raise HTTPException(status_code=404, detail="Template not found or not owned by user")
     
@@ -201,103 +234,74 @@ def delete_template(user_id: str, template_id: str):
     return {"message": "Template deleted successfully"}
 
 
-@router.get("/users/{user_id}/templates/recommendations")
-def get_template_recommendations(user_id: str, count: int = Query(5, ge=1, le=20), db: Session = Depends(get_db)):
-    """Get personalized template recommendations for a user"""
-    
-    templates = template_service.get_recommended_templates(user_id, db, count)
-    
-    return {
-        "recommendations": [
-            {
-                "id": t.id,
-                "name": t.name,
-                "description": t.description,
-                "category": t.category.value,
-                "difficulty": t.difficulty.value,
-                "session_type": t.session_type,
-                "duration_minutes": t.duration_minutes,
-                "usage_count": t.usage_count,
-                "average_completion_rate": t.average_completion_rate,
-                "tags": t.tags,
-                "is_system_template": t.is_system_template
-            } for t in templates
-        ]
-    }
-
-
 @router.get("/users/{user_id}/presets")
-def get_user_presets(user_id: str):
+def get_user_presets(request: Request, user_id: str):
     """Get productivity presets available to a user"""
     
-    presets = template_service.get_presets_for_user(user_id)
+    def build():
+        presets = template_service.get_presets_for_user(user_id)
+        return {
+            "presets": [
+                {
+                    "id": p.id,
+                    "name": p.name,
+                    "description": p.description,
+                    "templates": p.templates,
+                    "daily_goal_sessions": p.daily_goal_sessions,
+                    "daily_goal_minutes": p.daily_goal_minutes,
+                    "weekly_goal_sessions": p.weekly_goal_sessions,
+                    "weekly_goal_minutes": p.weekly_goal_minutes,
+                    "suggested_start_times": p.suggested_start_times,
+                    "suggested_days": p.suggested_days,
+                    "includes_breaks": p.includes_breaks,
+                    "adaptive_difficulty": p.adaptive_difficulty,
+                    "progress_tracking": p.progress_tracking
+                } for p in presets
+            ]
+        }
     
-    return {
-        "presets": [
-            {
-                "id": p.id,
-                "name": p.name,
-                "description": p.description,
-                "templates": p.templates,
-                "daily_goal_sessions": p.daily_goal_sessions,
-                "daily_goal_minutes": p.daily_goal_minutes,
-                "weekly_goal_sessions": p.weekly_goal_sessions,
-                "weekly_goal_minutes": p.weekly_goal_minutes,
-                "suggested_start_times": p.suggested_start_times,
-                "suggested_days": p.suggested_days,
-                "includes_breaks": p.includes_breaks,
-                "adaptive_difficulty": p.adaptive_difficulty,
-                "progress_tracking": p.progress_tracking
-            } for p in presets
-        ]
-    }
+    return _conditional_response(
+        request,
+        ("presets", user_id),
+        template_service.get_template_version(user_id),
+        build
+    )
 
 
 @router.get("/users/{user_id}/presets/{preset_id}")
-def get_preset_details(user_id: str, preset_id: str):
+def get_preset_details(request: Request, user_id: str, preset_id: str):
     """Get detailed information about a specific preset"""
     
     preset = template_service.get_preset_by_id(preset_id, user_id)
     if not preset:
         raise HTTPException(status_code=404, detail="Preset not found")
     
-    # Get template details for the preset
-    template_details = []
-    for template_id in preset.templates:
-        template = template_service.get_template_by_id(template_id)
-        if template:
-            template_details.append({
-                "id": template.id,
-                "name": template.name,
-                "duration_minutes": template.duration_minutes,
-                "session_type": template.session_type,
-                "description": template.description
-            })
-    
-    return {
-        "id": preset.id,
-        "name": preset.name,
-        "description": preset.description,
-        "templates": preset.templates,
-        "template_details": template_details,
-        "daily_goal_sessions": preset.daily_goal_sessions,
-        "daily_goal_minutes": preset.daily_goal_minutes,
-        "weekly_goal_sessions": preset.weekly_goal_sessions,
-        "weekly_goal_minutes": preset.weekly_goal_minutes,
-        "suggested_start_times": preset.suggested_start_times,
-        "suggested_days": preset.suggested_days,
-        "includes_breaks": preset.includes_breaks,
-        "adaptive_difficulty": preset.adaptive_difficulty,
-        "progress_tracking": preset.progress_tracking,
-        "created_at": preset.created_at.isoformat() if preset.created_at else None
-    }
+    return _conditional_response(
+        request,
+        ("preset", user_id, preset_id),
+        template_service.get_template_version(user_id),
+        lambda: _preset_details(preset, user_id)
+    )
 
 
 @router.get("/categories")
-def get_template_categories():
+def get_template_categories(request: Request):
     """Get available template categories"""
     
-    return {
+    return _static_response(request, *_categories_payload())
+
+
+@router.get("/difficulties")
+def get_difficulty_levels(request: Request):
+    """Get available difficulty levels"""
+    
+    return _static_response(request, *_difficulties_payload())
+
+
+@lru_cache(maxsize=None)
+def _categories_payload() -> tuple:
+    """Serialized category listing, built once per process"""
+    return _serialize({
         "categories": [
             {
                 "id": category.value,
@@ -305,14 +309,13 @@ def get_template_categories():
                 "description": _get_category_description(category)
             } for category in TemplateCategory
         ]
-    }
+    })
 
 
-@router.get("/difficulties")
-def get_difficulty_levels():
-    """Get available difficulty levels"""
-    
-    return {
+@lru_cache(maxsize=None)
+def _difficulties_payload() -> tuple:
+    """Serialized difficulty listing, built once per process"""
+    return _serialize({
         "difficulties": [
             {
                 "id": difficulty.value,
@@ -320,6 +323,65 @@ def get_difficulty_levels():
                 "description": _get_difficulty_description(difficulty)
             } for difficulty in DifficultyLevel
         ]
+    })
+
+
+def _serialize(payload: Dict[str, Any]) -> tuple:
+    """Serialize a payload to JSON bytes and a content-derived ETag"""
+    body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return body, f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Check an If-None-Match header against an ETag (weak comparison)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+def _static_response(request: Request, body: bytes, etag: str) -> Response:
+    """Serve a pre-serialized body, or 304 if the client already has it"""
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def _conditional_response(request: Request, cache_key: Hashable, version: Hashable,
+                          build: Callable[[], Dict[str, Any]]) -> Response:
+    """Serve a per-user view, re-serializing only when the template version moved"""
+    
+    cached = _response_cache.get(cache_key)
+    if cached is None or cached[0] != version:
+        cached = (version, *_serialize(build()))
+        _response_cache.set(cache_key, cached)
+    
+    _, body, etag = cached
+    return _static_response(request, body, etag)
+
+
+def _template_summary(t) -> Dict[str, Any]:
+    """Summary fields used in template listings"""
+    return {
+        "id": t.id,
+        "name": t.name,
+        "description": t.description,
+        "category": t.category.value,
+        "difficulty": t.difficulty.value,
+        "session_type": t.session_type,
+        "duration_minutes": t.duration_minutes,
+        "break_duration_minutes": t.break_duration_minutes,
+        "is_favorite": t.is_favorite,
+        "is_system_template": t.is_system_template,
+        "usage_count": t.usage_count,
+        "average_completion_rate": t.average_completion_rate,
+        "tags": t.tags,
+        "created_at": t.created_at.isoformat() if t.created_at else None
     }
 
 
@@ -346,3 +408,69 @@ def _get_difficulty_description(difficulty: DifficultyLevel) -> str:
         DifficultyLevel.EXPERT: "Intensive sessions for focus masters"
     }
     return descriptions.get(difficulty, "")
+
+
+def _template_details(template) -> Dict[str, Any]:
+    """All fields of a template"""
+    return {
+        "id": template.id,
+        "user_id": template.user_id,
+        "name": template.name,
+        "description": template.description,
+        "category": template.category.value,
+        "difficulty": template.difficulty.value,
+        "session_type": template.session_type,
+        "duration_minutes": template.duration_minutes,
+        "break_duration_minutes": template.break_duration_minutes,
+        "allow_interruptions": template.allow_interruptions,
+        "auto_start_breaks": template.auto_start_breaks,
+        "reminder_intervals": template.reminder_intervals,
+        "focus_music_enabled": template.focus_music_enabled,
+        "distraction_blocking": template.distraction_blocking,
+        "productivity_tracking": template.productivity_tracking,
+        "background_theme": template.background_theme,
+        "notification_sound": template.notification_sound,
+        "completion_reward": template.completion_reward,
+        "tags": template.tags,
+        "is_favorite": template.is_favorite,
+        "is_system_template": template.is_system_template,
+        "usage_count": template.usage_count,
+        "average_completion_rate": template.average_completion_rate,
+        "created_at": template.created_at.isoformat() if template.created_at else None,
+        "updated_at": template.updated_at.isoformat() if template.updated_at else None
+    }
+
+
+def _preset_details(preset, user_id: str) -> Dict[str, Any]:
+    """All fields of a preset with its templates resolved"""
+    
+    # Get template details for the preset
+    template_details = []
+    for template_id in preset.templates:
+        template = template_service.get_template_by_id(template_id, user_id)
+        if template:
+            template_details.append({
+                "id": template.id,
+                "name": template.name,
+                "duration_minutes": template.duration_minutes,
+                "session_type": template.session_type,
+                "description": template.description
+            })
+    
+    return {
+        "id": preset.id,
+        "name": preset.name,
+        "description": preset.description,
+        "templates": preset.templates,
+        "template_details": template_details,
+        "daily_goal_sessions": preset.daily_goal_sessions,
+        "daily_goal_minutes": preset.daily_goal_minutes,
+        "weekly_goal_sessions": preset.weekly_goal_sessions,
+        "weekly_goal_minutes": preset.weekly_goal_minutes,
+        "suggested_start_times": preset.suggested_start_times,
+        "suggested_days": preset.suggested_days,
+        "includes_breaks": preset.includes_breaks,
+        "adaptive_difficulty": preset.adaptive_difficulty,
+        "progress_tracking": preset.progress_tracking,
+        "created_at": preset.created_at.isoformat() if preset.created_at else None
+    }
@@ -4,17 +4,136 @@ Session statistics, productivity trends, and performance metrics
 """
 
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, extract
+from sqlalchemy import func, and_, extract, case
 from datetime import datetime, timedelta, date
-from typing import Dict, List, Optional, Any, Tuple
+from typing import Dict, List, Optional, Any, Set, Tuple
 from collections import defaultdict
-import statistics
 import logging
+import threading
 
-from ..models.session_models import FocusSession
+from focus_flow_shared.session_aggregator import SessionAggregate
+from focus_flow_shared.time_series_processor import UserTimeSeries, WINDOWS
+
+from ..config.settings import get_settings
+from ..database.session_repository import SessionRepository
+from ..models.session_models import FocusSession, OPEN_SESSION_STATUSES
+from ..utils.cache import TTLCache, invalidation_bus
 from ..utils.timer import TimerUtils
 
 logger = logging.getLogger("focus_engine.analytics")
+settings = get_settings()
+
+
+class AnalyticsVersions:
+    """Per-user counters bumped whenever a user's session data changes
+    
+    Caches of derived analytics store the version they were computed at and
+    are considered stale once it moves. Bumps are relayed to other workers
+    over the invalidation bus; only equality matters, so counters need not
+    agree across workers.
+    """
+    
+    NAMESPACE = "analytics_version"
+    
+    def __init__(self):
+        self._versions: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+        invalidation_bus.subscribe(self.NAMESPACE, self._increment)
+    
+    def get(self, user_id: str) -> int:
+        return self._versions.get(user_id, 0)
+    
+    def bump(self, user_id: str):
+        """Record a change to the user's sessions"""
+        self._increment(user_id)
+        invalidation_bus.publish(self.NAMESPACE, user_id)
+    
+    def _increment(self, user_id: str):
+        with self._lock:
+            self._versions[user_id] += 1
+
+
+analytics_versions = AnalyticsVersions()
+
+
+class TimeSeriesStore:
+    """Cached rolling series per user, kept current as sessions complete
+    
+    A series is built from the last 90 days of finished sessions on first
+    use and stored with the user's analytics version. Completions on this
+    worker are folded in O(1); any other change moves the version and the
+    series is rebuilt on next read.
+    """
+    
+    def __init__(self):
+        self._series = TTLCache(
+            maxsize=settings.time_series_cache_max_users,
+            ttl_seconds=settings.time_series_cache_ttl_seconds
+        )
+        self._lock = threading.Lock()
+    
+    def get(self, db: Session, user_id: str) -> UserTimeSeries:
+        """The user's series advanced to today"""
+        
+        today = datetime.utcnow().date()
+        version = analytics_versions.get(user_id)
+        
+        series = self.cached(user_id, version, today)
+        if series is not None:
+            return series
+        
+        window = SessionRepository.user_date_range(user_id, self.first_day(today), today)
+        series = UserTimeSeries.from_sessions(
+            SessionRepository.stream_records(
+                db, *window, FocusSession.status.notin_(OPEN_SESSION_STATUSES), order_by_start=True
+            ),
+            today
+        )
+        self.store(user_id, version, series)
+        return series
+    
+    def cached(self, user_id: str, version: int, today: date) -> Optional[UserTimeSeries]:
+        """The cached series advanced to today if it is still at version, else None"""
+        
+        cached = self._series.get(user_id)
+        if cached is None or cached[0] != version:
+            return None
+        
+        with self._lock:
+            cached[1].advance_to(today)
+        return cached[1]
+    
+    def store(self, user_id: str, version: int, series: UserTimeSeries):
+        """Cache a series built elsewhere from the user's sessions as of version"""
+        self._series.set(user_id, (version, series))
+    
+    @staticmethod
+    def first_day(today: date) -> date:
+        """Earliest start_date a series built on today covers"""
+        return today - timedelta(days=max(WINDOWS) - 1)
+    
+    def record(self, session: FocusSession, previous_version: int):
+        """Fold a just-finished session into the cached series
+        
+        Only applies when the cached series was current before this change
+        and no other change has landed since; otherwise the series is left
+        to be rebuilt.
+        """
+        
+        cached = self._series.get(session.user_id)
+        if cached is None or cached[0] != previous_version:
+            return
+        
+        version = analytics_versions.get(session.user_id)
+        if version != previous_version + 1:
+            return
+        
+        with self._lock:
+            cached[1].add_session(session)
+        self._series.set(session.user_id, (version, cached[1]))
+
+
+time_series_store = TimeSeriesStore()
 
 
 class SessionAnalytics:
@@ -29,70 +148,41 @@ class SessionAnalytics:
         end_date = datetime.utcnow()
         start_date = end_date - timedelta(days=days)
         
-        # Base query for user sessions in date range
-        sessions = db.query(FocusSession).filter(
-            and_(
-                FocusSession.user_id == user_id,
-                FocusSession.start_time >= start_date,
-                FocusSession.start_time <= end_date
-            )
-        ).all()
-        
-        if not sessions:
-            return SessionAnalytics._empty_stats()
-        
-        # Basic counts
-        total_sessions = len(sessions)
-        completed_sessions = [s for s in sessions if s.status == "completed"]
-        
-        # Duration statistics
-        total_minutes = sum(s.actual_duration or s.planned_duration for s in sessions)
-        completed_minutes = sum(s.actual_duration or s.planned_duration for s in completed_sessions)
-        
-        # Completion rate
-        completion_rate = len(completed_sessions) / total_sessions if total_sessions > 0 else 0
-        
-        # Average session duration
-        avg_planned_duration = statistics.mean([s.planned_duration for s in sessions]) if sessions else 0
-        avg_actual_duration = statistics.mean([
-            s.actual_duration for s in sessions if s.actual_duration is not None
-        ]) if any(s.actual_duration for s in sessions) else 0
-        
-        # Productivity score statistics
-        productivity_scores = [s.productivity_score for s in sessions if s.productivity_score is not None]
-        avg_productivity = statistics.mean(productivity_scores) if productivity_scores else 0
-        
-        # Focus quality distribution
+        # Stream the window once, folding every metric as rows arrive
+        totals = SessionAggregate()
         focus_quality_counts = defaultdict(int)
-        for session in sessions:
+        session_type_counts = defaultdict(int)
+        completed_dates = set()
+        
+        for session in SessionRepository.stream_records(
+            db, *SessionRepository.user_window(user_id, start_date, end_date)
+        ):
+            totals.add(session)
             if session.focus_quality:
                 focus_quality_counts[session.focus_quality] += 1
-        
-        # Session type distribution
-        session_type_counts = defaultdict(int)
-        for session in sessions:
             session_type_counts[session.session_type or "unknown"] += 1
+            if session.status == "completed":
+                completed_dates.add(session.start_date)
         
-        # Interruption statistics
-        total_interruptions = sum(s.interruption_count or 0 for s in sessions)
-        avg_interruptions = total_interruptions / total_sessions if total_sessions > 0 else 0
+        if not totals.total_sessions:
+            return SessionAnalytics._empty_stats()
         
         # Streak calculation
-        current_streak = SessionAnalytics._calculate_current_streak(sessions)
-        longest_streak = SessionAnalytics._calculate_longest_streak(sessions)
+        current_streak = SessionAnalytics._calculate_current_streak(completed_dates)
+        longest_streak = SessionAnalytics._calculate_longest_streak(completed_dates)
         
         return {
             "period_days": days,
-            "total_sessions": total_sessions,
-            "completed_sessions": len(completed_sessions),
-            "completion_rate": round(completion_rate, 3),
-            "total_focus_time_minutes": total_minutes,
-            "completed_focus_time_minutes": completed_minutes,
-            "average_planned_duration": round(avg_planned_duration, 1),
-            "average_actual_duration": round(avg_actual_duration, 1),
-            "average_productivity_score": round(avg_productivity, 2),
-            "total_interruptions": total_interruptions,
-            "average_interruptions_per_session": round(avg_interruptions, 2),
+            "total_sessions": totals.total_sessions,
+            "completed_sessions": totals.completed_sessions,
+            "completion_rate": round(totals.completion_rate, 3),
+            "total_focus_time_minutes": totals.total_minutes,
+            "completed_focus_time_minutes": totals.completed_minutes,
+            "average_planned_duration": round(totals.planned_duration.mean, 1),
+            "average_actual_duration": round(totals.actual_duration.mean, 1),
+            "average_productivity_score": round(totals.productivity.mean, 2),
+            "total_interruptions": totals.total_interruptions,
+            "average_interruptions_per_session": round(totals.average_interruptions, 2),
             "focus_quality_distribution": dict(focus_quality_counts),
             "session_type_distribution": dict(session_type_counts),
             "current_streak_days": current_streak,
@@ -111,42 +201,27 @@ class SessionAnalytics:
         end_date = datetime.utcnow().date()
         start_date = end_date - timedelta(days=days)
         
-        # Get sessions grouped by date
-        sessions = db.query(FocusSession).filter(
-            and_(
-                FocusSession.user_id == user_id,
-                func.date(FocusSession.start_time) >= start_date,
-                func.date(FocusSession.start_time) <= end_date
-            )
-        ).all()
-        
-        # Group sessions by date
-        daily_sessions = defaultdict(list)
-        for session in sessions:
-            session_date = session.start_time.date()
-            daily_sessions[session_date].append(session)
+        # Accumulate sessions by date
+        daily_stats = defaultdict(SessionAggregate)
+        for session in SessionRepository.stream_records(
+            db, *SessionRepository.user_date_range(user_id, start_date, end_date)
+        ):
+            daily_stats[session.start_date].add(session)
         
         # Calculate trends for each day
         trends = []
         for single_date in (start_date + timedelta(n) for n in range(days + 1)):
-            day_sessions = daily_sessions.get(single_date, [])
+            day = daily_stats.get(single_date)
             
-            if day_sessions:
-                completed = [s for s in day_sessions if s.status == "completed"]
-                total_time = sum(s.actual_duration or s.planned_duration for s in day_sessions)
-                avg_productivity = statistics.mean([
-                    s.productivity_score for s in day_sessions 
-                    if s.productivity_score is not None
-                ]) if any(s.productivity_score for s in day_sessions) else 0
-                
+            if day is not None:
                 trends.append({
                     "date": single_date.isoformat(),
-                    "total_sessions": len(day_sessions),
-                    "completed_sessions": len(completed),
-                    "completion_rate": len(completed) / len(day_sessions),
-                    "total_focus_time_minutes": total_time,
-                    "average_productivity_score": round(avg_productivity, 2),
-                    "total_interruptions": sum(s.interruption_count or 0 for s in day_sessions)
+                    "total_sessions": day.total_sessions,
+                    "completed_sessions": day.completed_sessions,
+                    "completion_rate": day.completion_rate,
+                    "total_focus_time_minutes": day.total_minutes,
+                    "average_productivity_score": round(day.productivity.mean, 2),
+                    "total_interruptions": day.total_interruptions
                 })
             else:
                 trends.append({
@@ -161,6 +236,22 @@ class SessionAnalytics:
         
         return trends
     
+    @staticmethod
+    def calculate_rolling_trends(db: Session, user_id: str) -> Dict[str, Any]:
+        """Rolling 7/30/90-day focus minutes, completion rate and productivity
+        
+        Served from the user's cached series rather than a scan of raw rows.
+        """
+        
+        series = time_series_store.get(db, user_id)
+        snapshot = series.snapshot()
+        snapshot["trends"] = {
+            "focus_minutes": series.trend("focus_minutes", tolerance=5),
+            "completion_rate": series.trend("completion_rate", tolerance=0.05),
+            "productivity": series.trend("productivity", tolerance=0.5)
+        }
+        return snapshot
+    
     @staticmethod
     def calculate_hourly_patterns(db: Session, user_id: str, 
                                 days: int = 30) -> Dict[str, Any]:
@@ -169,51 +260,23 @@ class SessionAnalytics:
         end_date = datetime.utcnow()
         start_date = end_date - timedelta(days=days)
         
-        sessions = db.query(FocusSession).filter(
-            and_(
-                FocusSession.user_id == user_id,
-                FocusSession.start_time >= start_date,
-                FocusSession.start_time <= end_date
-            )
-        ).all()
-        
-        # Group sessions by hour
-        hourly_data = defaultdict(lambda: {
-            "sessions": [],
-            "total_sessions": 0,
-            "completed_sessions": 0,
-            "total_time": 0,
-            "productivity_scores": []
-        })
-        
-        for session in sessions:
-            hour = session.start_time.hour
-            hourly_data[hour]["sessions"].append(session)
-            hourly_data[hour]["total_sessions"] += 1
-            
-            if session.status == "completed":
-                hourly_data[hour]["completed_sessions"] += 1
-            
-            hourly_data[hour]["total_time"] += session.actual_duration or session.planned_duration
-            
-            if session.productivity_score is not None:
-                hourly_data[hour]["productivity_scores"].append(session.productivity_score)
+        # Accumulate sessions by hour
+        hourly_data = [SessionAggregate() for _ in range(24)]
+        for session in SessionRepository.stream_records(
+            db, *SessionRepository.user_window(user_id, start_date, end_date)
+        ):
+            hourly_data[session.start_hour].add(session)
         
         # Calculate statistics for each hour
         hourly_stats = []
-        for hour in range(24):
-            data = hourly_data[hour]
-            
-            avg_productivity = statistics.mean(data["productivity_scores"]) if data["productivity_scores"] else 0
-            completion_rate = data["completed_sessions"] / data["total_sessions"] if data["total_sessions"] > 0 else 0
-            
+        for hour, data in enumerate(hourly_data):
             hourly_stats.append({
                 "hour": hour,
-                "total_sessions": data["total_sessions"],
-                "completed_sessions": data["completed_sessions"],
-                "completion_rate": round(completion_rate, 3),
-                "total_focus_time_minutes": data["total_time"],
-                "average_productivity_score": round(avg_productivity, 2)
+                "total_sessions": data.total_sessions,
+                "completed_sessions": data.completed_sessions,
+                "completion_rate": round(data.completion_rate, 3),
+                "total_focus_time_minutes": data.total_minutes,
+                "average_productivity_score": round(data.productivity.mean, 2)
             })
         
         # Find peak productivity hours
@@ -241,45 +304,65 @@ class SessionAnalytics:
         end_date = datetime.utcnow()
         start_date = end_date - timedelta(days=days)
         
-        sessions = db.query(FocusSession).filter(
+        # Accumulate by session type
+        type_data = defaultdict(SessionAggregate)
+        for session in SessionRepository.stream_records(
+            db, *SessionRepository.user_window(user_id, start_date, end_date)
+        ):
+            type_data[session.session_type or "unknown"].add(session)
+        
+        # Calculate statistics for each type
+        type_stats = {}
+        for session_type, data in type_data.items():
+            type_stats[session_type] = {
+                "total_sessions": data.total_sessions,
+                "completed_sessions": data.completed_sessions,
+                "completion_rate": data.completion_rate,
+                "average_productivity_score": round(data.productivity.mean, 2),
+                "average_planned_duration": round(data.planned_duration.mean, 1),
+                "average_actual_duration": round(data.actual_duration.mean, 1),
+                "total_interruptions": data.total_interruptions,
+                "average_interruptions": data.average_interruptions
+            }
+        
+        return type_stats
+    
+    @staticmethod
+    def calculate_recommendation_profile(db: Session, user_id: str,
+                                         days: int = 30) -> Dict[str, Any]:
+        """Inputs for template recommendations from one aggregate query
+        
+        Returns the average planned duration and completion rate per session
+        type, matching calculate_user_stats / calculate_session_type_performance.
+        """
+        
+        end_date = datetime.utcnow()
+        start_date = end_date - timedelta(days=days)
+        session_type = func.coalesce(FocusSession.session_type, "unknown")
+        
+        rows = db.query(
+            session_type,
+            func.count(FocusSession.id),
+            func.sum(case((FocusSession.status == "completed", 1), else_=0)),
+            func.sum(FocusSession.planned_duration)
+        ).filter(
             and_(
                 FocusSession.user_id == user_id,
                 FocusSession.start_time >= start_date,
                 FocusSession.start_time <= end_date
             )
-        ).all()
+        ).group_by(session_type).all()
         
-        # Group by session type
-        type_data = defaultdict(list)
-        for session in sessions:
-            session_type = session.session_type or "unknown"
-            type_data[session_type].append(session)
+        total_sessions = sum(total for _, total, _, _ in rows)
+        total_planned = sum(planned or 0 for _, _, _, planned in rows)
         
-        # Calculate statistics for each type
-        type_stats = {}
-        for session_type, type_sessions in type_data.items():
-            completed = [s for s in type_sessions if s.status == "completed"]
-            
-            productivity_scores = [s.productivity_score for s in type_sessions if s.productivity_score is not None]
-            avg_productivity = statistics.mean(productivity_scores) if productivity_scores else 0
-            
-            avg_duration = statistics.mean([s.planned_duration for s in type_sessions])
-            avg_actual = statistics.mean([
-                s.actual_duration for s in type_sessions if s.actual_duration is not None
-            ]) if any(s.actual_duration for s in type_sessions) else 0
-            
-            type_stats[session_type] = {
-                "total_sessions": len(type_sessions),
-                "completed_sessions": len(completed),
-                "completion_rate": len(completed) / len(type_sessions),
-                "average_productivity_score": round(avg_productivity, 2),
-                "average_planned_duration": round(avg_duration, 1),
-                "average_actual_duration": round(avg_actual, 1),
-                "total_interruptions": sum(s.interruption_count or 0 for s in type_sessions),
-                "average_interruptions": sum(s.interruption_count or 0 for s in type_sessions) / len(type_sessions)
+        return {
+            "average_planned_duration": round(total_planned / total_sessions, 1) if total_sessions else 30,
+            "type_completion_rates": {
+                type_name: (completed or 0) / total
+                for type_name, total, completed, _ in rows
             }
-        
-        return type_stats
+        }
     
     @staticmethod
     def _empty_stats() -> Dict[str, Any]:
@@ -302,40 +385,22 @@ class SessionAnalytics:
         }
     
     @staticmethod
-    def _calculate_current_streak(sessions: List[FocusSession]) -> int:
+    def _calculate_current_streak(completed_dates: Set[date]) -> int:
         """Calculate current consecutive days with completed sessions"""
-        if not sessions:
-            return 0
-        
-        # Sort sessions by date (most recent first)
-        sessions_by_date = defaultdict(list)
-        for session in sessions:
-            session_date = session.start_time.date()
-            if session.status == "completed":
-                sessions_by_date[session_date].append(session)
         
         # Check consecutive days from today backwards
         current_date = datetime.utcnow().date()
         streak = 0
         
-        while current_date in sessions_by_date:
+        while current_date in completed_dates:
             streak += 1
             current_date -= timedelta(days=1)
         
         return streak
     
     @staticmethod
-    def _calculate_longest_streak(sessions: List[FocusSession]) -> int:
+    def _calculate_longest_streak(completed_dates: Set[date]) -> int:
         """Calculate longest consecutive days streak"""
-        if not sessions:
-            return 0
-        
-        # Get unique dates with completed sessions
-        completed_dates = set()
-        for session in sessions:
-            if session.status == "completed":
-                completed_dates.add(session.start_time.date())
-        
         if not completed_dates:
             return 0
         
@@ -5,13 +5,18 @@ Algorithms to calculate session quality scores and focus metrics
 
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any, Tuple
+from typing import Dict, Iterable, List, Optional, Any, Tuple, Union
 from dataclasses import dataclass
+from collections import defaultdict
 import math
-import statistics
 import logging
 
-from ..models.session_models import FocusSession
+from focus_flow_shared.session_aggregator import Moments, SessionAggregate
+from focus_flow_shared.time_series_processor import UserTimeSeries
+
+from ..database.session_repository import SessionRecord, SessionRepository
+from ..models.session_models import FocusSession, OPEN_SESSION_STATUSES
+from ..services.analytics_service import analytics_versions, time_series_store
 from ..utils.timer import TimerUtils
 
 logger = logging.getLogger("focus_engine.focus_scoring")
@@ -29,6 +34,66 @@ class FocusQualityFactors:
     productivity_alignment: float  # 0.0 to 1.0 - self-assessment alignment
 
 
+class UserContextBuilder:
+    """Per-type completion and completed days, folded one session at a time"""
+    
+    def __init__(self):
+        self.type_totals = defaultdict(lambda: [0, 0])  # [total, completed]
+        self.completed_dates = set()
+        self.total_sessions = 0
+    
+    def add(self, session: SessionRecord):
+        self.total_sessions += 1
+        counts = self.type_totals[session.session_type or "unknown"]
+        counts[0] += 1
+        if session.status == "completed":
+            counts[1] += 1
+            self.completed_dates.add(session.start_date)
+    
+    def add_counts(self, session_type: Optional[str], total: int, completed: int):
+        """Fold pre-aggregated counts for one session type"""
+        self.total_sessions += total
+        counts = self.type_totals[session_type or "unknown"]
+        counts[0] += total
+        counts[1] += completed
+    
+    def build(self) -> Dict[str, Any]:
+        """User context for personalized scoring"""
+        
+        # Session type performance
+        type_performance = {}
+        for session_type, (total, completed) in self.type_totals.items():
+            type_performance[session_type] = {
+                "completion_rate": completed / total if total else 0,
+                "total_sessions": total
+            }
+        
+        # Current streak calculation
+        current_streak = 0
+        current_date = datetime.utcnow().date()
+        while current_date in self.completed_dates:
+            current_streak += 1
+            current_date -= timedelta(days=1)
+        
+        return {
+            "type_performance": type_performance,
+            "current_streak": current_streak,
+            "total_sessions": self.total_sessions
+        }
+
+
+class QualityScoreHistogram:
+    """Score moments and high/medium/low counts, folded one score at a time"""
+    
+    def __init__(self):
+        self.scores = Moments()
+        self.categories = {"high": 0, "medium": 0, "low": 0}
+    
+    def add(self, score: float, category: str):
+        self.scores.add(score)
+        self.categories[category] += 1
+
+
 class FocusQualityScorer:
     """Advanced focus quality scoring algorithms"""
     
@@ -51,11 +116,19 @@ class FocusQualityScorer:
     }
     
     @staticmethod
-    def calculate_session_quality_score(session: FocusSession, 
+    def calculate_session_quality_score(session: Union[FocusSession, SessionRecord], 
                                       user_context: Optional[Dict[str, Any]] = None) -> float:
         """Calculate quality score for a single session"""
         
         factors = FocusQualityScorer._analyze_quality_factors(session, user_context or {})
+        quality_score = FocusQualityScorer._weighted_score(factors)
+        
+        logger.debug(f"Session {session.id} quality score: {quality_score:.2f}")
+        return quality_score
+    
+    @staticmethod
+    def _weighted_score(factors: FocusQualityFactors) -> float:
+        """Combine quality factors into a 0-10 score"""
         
         # Calculate weighted score
         score = (
@@ -68,66 +141,37 @@ class FocusQualityScorer:
         )
         
         # Normalize to 0-10 scale
-        quality_score = min(10.0, max(0.0, score * 10))
-        
-        logger.debug(f"Session {session.id} quality score: {quality_score:.2f}")
-        return round(quality_score, 2)
+        return round(min(10.0, max(0.0, score * 10)), 2)
+    
+    # Changed focus_quality values written per UPDATE while the window streams
+    QUALITY_UPDATE_CHUNK = 5000
     
     @staticmethod
     def calculate_batch_quality_scores(db: Session, user_id: str, 
                                      days: int = 30) -> Dict[str, float]:
         """Calculate quality scores for all user sessions in a period"""
         
-        end_date = datetime.utcnow()
-        start_date = end_date - timedelta(days=days)
-        
-        sessions = db.query(FocusSession).filter(
-            FocusSession.user_id == user_id,
-            FocusSession.start_time >= start_date,
-            FocusSession.start_time <= end_date
-        ).order_by(FocusSession.start_time).all()
-        
-        if not sessions:
-            return {}
-        
-        # Get user context for personalized scoring
-        user_context = FocusQualityScorer._build_user_context(sessions)
-        
-        # Calculate scores for each session
-        session_scores = {}
-        for session in sessions:
-            score = FocusQualityScorer.calculate_session_quality_score(session, user_context)
-            session_scores[str(session.id)] = score
-            
-            # Update session with calculated quality
-            quality_category = FocusQualityScorer._categorize_quality(score)
-            if session.focus_quality != quality_category:
-                session.focus_quality = quality_category
-        
-        # Commit quality updates
-        db.commit()
-        
-        return session_scores
+        return FocusQualityScorer._score_window(db, user_id, days)[0]
     
     @staticmethod
     def get_quality_insights(db: Session, user_id: str, 
                            days: int = 30) -> Dict[str, Any]:
         """Get comprehensive quality insights and improvement suggestions"""
         
-        scores = FocusQualityScorer.calculate_batch_quality_scores(db, user_id, days)
+        _, histogram, factor_moments, series = FocusQualityScorer._score_window(
+            db, user_id, days, with_series=True, keep_scores=False
+        )
         
-        if not scores:
+        if not histogram.scores.count:
             return {"message": "No sessions found for analysis"}
         
-        score_values = list(scores.values())
-        
         # Statistical analysis
-        avg_quality = statistics.mean(score_values)
-        quality_trend = FocusQualityScorer._calculate_quality_trend(score_values)
-        quality_distribution = FocusQualityScorer._analyze_quality_distribution(score_values)
+        avg_quality = histogram.scores.mean
+        quality_trend = FocusQualityScorer._calculate_quality_trend(series)
+        quality_distribution = FocusQualityScorer._analyze_quality_distribution(histogram.categories)
         
         # Factor analysis
-        factor_analysis = FocusQualityScorer._analyze_quality_factors_batch(db, user_id, days)
+        factor_analysis = FocusQualityScorer._summarize_quality_factors(factor_moments)
         
         # Improvement recommendations
         recommendations = FocusQualityScorer._generate_quality_recommendations(factor_analysis)
@@ -138,11 +182,100 @@ class FocusQualityScorer:
             "quality_distribution": quality_distribution,
             "factor_analysis": factor_analysis,
             "recommendations": recommendations,
-            "total_sessions_analyzed": len(score_values)
+            "total_sessions_analyzed": histogram.scores.count
         }
     
     @staticmethod
-    def _analyze_quality_factors(session: FocusSession, 
+    def _score_window(db: Session, user_id: str, days: int, with_series: bool = False,
+                      keep_scores: bool = True) -> Tuple[Optional[Dict[str, float]], QualityScoreHistogram,
+                                                         Dict[str, Moments], Optional[UserTimeSeries]]:
+        """Score a user's sessions, analyze their factors and build their series in one stream
+        
+        The user context comes from grouped queries up front, so each
+        session is scored as it streams past and folded into a histogram;
+        per-session scores are only kept when keep_scores is set. When the
+        cached time series is stale the stream is widened to the series'
+        90 days and the finished sessions are folded into a new series on
+        the way, so no second pass over the same rows is needed.
+        """
+        
+        end_date = datetime.utcnow()
+        start_date = end_date - timedelta(days=days)
+        today = end_date.date()
+        
+        series = None
+        series_version = None
+        stream_from = start_date
+        if with_series:
+            series_version = analytics_versions.get(user_id)
+            series = time_series_store.cached(user_id, series_version, today)
+            if series is None:
+                series_first_day = time_series_store.first_day(today)
+                stream_from = min(start_date, datetime.combine(series_first_day, datetime.min.time()))
+        build_series = with_series and series is None
+        
+        user_context = FocusQualityScorer._load_user_context(
+            db, *SessionRepository.user_window(user_id, start_date, end_date)
+        )
+        histogram = QualityScoreHistogram()
+        session_scores = {} if keep_scores else None
+        factor_moments = {name: Moments() for name in ("completion", "interruptions", "consistency")}
+        quality_updates = {}
+        wrote_updates = False
+        
+        for session in SessionRepository.stream_records(
+            db, *SessionRepository.user_window(user_id, stream_from, end_date), order_by_start=True
+        ):
+            if build_series and session.start_date >= series_first_day and session.status not in OPEN_SESSION_STATUSES:
+                if series is None:
+                    series = UserTimeSeries(session.start_date)
+                series.add_session(session)
+            
+            if session.start_time < start_date:
+                continue
+            
+            FocusQualityScorer._add_factor_moments(factor_moments, session)
+            score = FocusQualityScorer._weighted_score(
+                FocusQualityScorer._analyze_quality_factors(session, user_context)
+            )
+            quality_category = FocusQualityScorer._categorize_quality(score)
+            histogram.add(score, quality_category)
+            if session_scores is not None:
+                session_scores[str(session.id)] = score
+            
+            # Update session with calculated quality, a chunk at a time
+            if session.focus_quality != quality_category:
+                quality_updates[session.id] = quality_category
+                if len(quality_updates) >= FocusQualityScorer.QUALITY_UPDATE_CHUNK:
+                    SessionRepository.update_focus_quality(db, quality_updates, commit=False)
+                    quality_updates = {}
+                    wrote_updates = True
+        
+        if build_series:
+            if series is None:
+                series = UserTimeSeries(today)
+            series.advance_to(today)
+            time_series_store.store(user_id, series_version, series)
+        
+        # Commit quality updates
+        if quality_updates or wrote_updates:
+            SessionRepository.update_focus_quality(db, quality_updates, commit=False)
+            db.commit()
+        
+        return session_scores, histogram, factor_moments, series
+    
+    @staticmethod
+    def _load_user_context(db: Session, *criteria: Any) -> Dict[str, Any]:
+        """User context for the scoring window from grouped counts, without reading its rows"""
+        
+        context = UserContextBuilder()
+        for session_type, total, completed in SessionRepository.type_completion_counts(db, *criteria):
+            context.add_counts(session_type, total, completed)
+        context.completed_dates.update(SessionRepository.completed_dates(db, *criteria))
+        return context.build()
+    
+    @staticmethod
+    def _analyze_quality_factors(session: Union[FocusSession, SessionRecord], 
                                user_context: Dict[str, Any]) -> FocusQualityFactors:
         """Analyze individual factors contributing to session quality"""
         
@@ -164,7 +297,7 @@ class FocusQualityScorer:
         interruption_penalty = min(1.0, interruption_count / max_interruptions)
         
         # Time of day bonus
-        session_hour = session.start_time.hour
+        session_hour = session.start_hour
         session_type = session.session_type or "pomodoro"
         optimal_hours = FocusQualityScorer.OPTIMAL_HOURS.get(session_type, [9, 10, 11, 14, 15])
         
@@ -175,24 +308,7 @@ class FocusQualityScorer:
         else:
             time_of_day_bonus = 0.0
         
-        # Session type multiplier based on historical performance
-        type_performance = user_context.get("type_performance", {}).get(session_type, {})
-        if type_performance:
-            avg_completion = type_performance.get("completion_rate", 0.7)
-            session_type_multiplier = 0.8 + (avg_completion * 0.4)  # 0.8 to 1.2 range
-        else:
-            session_type_multiplier = 1.0
-        
-        # Streak bonus
-        current_streak = user_context.get("current_streak", 0)
-        if current_streak >= 7:
-            streak_bonus = 0.15
-        elif current_streak >= 3:
-            streak_bonus = 0.10
-        elif current_streak >= 1:
-            streak_bonus = 0.05
-        else:
-            streak_bonus = 0.0
+        session_type_multiplier, streak_bonus = FocusQualityScorer._context_factors(session_type, user_context)
         
         # Productivity alignment
         if session.productivity_score is not None:
@@ -213,43 +329,38 @@ class FocusQualityScorer:
         )
     
     @staticmethod
-    def _build_user_context(sessions: List[FocusSession]) -> Dict[str, Any]:
-        """Build user context for personalized scoring"""
+    def _context_factors(session_type: str, user_context: Dict[str, Any]) -> Tuple[float, float]:
+        """Session type multiplier and streak bonus, the factors that depend on the user context"""
         
-        # Session type performance
-        from collections import defaultdict
-        type_data = defaultdict(list)
+        # Session type multiplier based on historical performance
+        type_performance = user_context.get("type_performance", {}).get(session_type, {})
+        if type_performance:
+            avg_completion = type_performance.get("completion_rate", 0.7)
+            session_type_multiplier = 0.8 + (avg_completion * 0.4)  # 0.8 to 1.2 range
+        else:
+            session_type_multiplier = 1.0
         
-        for session in sessions:
-            session_type = session.session_type or "unknown"
-            type_data[session_type].append(session)
+        # Streak bonus
+        current_streak = user_context.get("current_streak", 0)
+        if current_streak >= 7:
+            streak_bonus = 0.15
+        elif current_streak >= 3:
+            streak_bonus = 0.10
+        elif current_streak >= 1:
+            streak_bonus = 0.05
+        else:
+            streak_bonus = 0.0
         
-        type_performance = {}
-        for session_type, type_sessions in type_data.items():
-            completed = sum(1 for s in type_sessions if s.status == "completed")
-            completion_rate = completed / len(type_sessions) if type_sessions else 0
-            type_performance[session_type] = {
-                "completion_rate": completion_rate,
-                "total_sessions": len(type_sessions)
-            }
+        return session_type_multiplier, streak_bonus
+    
+    @staticmethod
+    def _build_user_context(sessions: Iterable[SessionRecord]) -> Dict[str, Any]:
+        """Build user context for personalized scoring in a single pass"""
         
-        # Current streak calculation
-        completed_dates = set()
+        context = UserContextBuilder()
         for session in sessions:
-            if session.status == "completed":
-                completed_dates.add(session.start_time.date())
-        
-        current_streak = 0
-        current_date = datetime.utcnow().date()
-        while current_date in completed_dates:
-            current_streak += 1
-            current_date -= timedelta(days=1)
-        
-        return {
-            "type_performance": type_performance,
-            "current_streak": current_streak,
-            "total_sessions": len(sessions)
-        }
+            context.add(session)
+        return context.build()
     
     @staticmethod
     def _categorize_quality(score: float) -> str:
@@ -262,39 +373,23 @@ class FocusQualityScorer:
             return "low"
     
     @staticmethod
-    def _calculate_quality_trend(scores: List[float]) -> str:
-        """Calculate if quality is improving, declining, or stable"""
-        if len(scores) < 5:
-            return "insufficient_data"
-        
-        # Use linear regression slope to determine trend
-        n = len(scores)
-        x = list(range(n))
-        
-        # Calculate slope
-        sum_x = sum(x)
-        sum_y = sum(scores)
-        sum_xy = sum(x[i] * scores[i] for i in range(n))
-        sum_x2 = sum(x[i] ** 2 for i in range(n))
-        
-        slope = (n * sum_xy - sum_x * sum_y) / (n * sum_x2 - sum_x ** 2)
-        
-        if slope > 0.1:
-            return "improving"
-        elif slope < -0.1:
-            return "declining"
-        else:
-            return "stable"
+    def _calculate_quality_trend(series: UserTimeSeries) -> str:
+        """Calculate if quality is improving, declining, or stable
+        
+        Compares the 7-day and 30-day EWMAs of daily completion rate, the
+        most heavily weighted quality factor, from the precomputed series.
+        """
+        return series.trend("completion_rate", tolerance=0.05)
     
     @staticmethod
-    def _analyze_quality_distribution(scores: List[float]) -> Dict[str, Any]:
-        """Analyze distribution of quality scores"""
+    def _analyze_quality_distribution(categories: Dict[str, int]) -> Dict[str, Any]:
+        """Analyze distribution of quality scores from their high/medium/low counts"""
         
-        high_quality = sum(1 for s in scores if s >= 8.0)
-        medium_quality = sum(1 for s in scores if 5.0 <= s < 8.0)
-        low_quality = sum(1 for s in scores if s < 5.0)
+        high_quality = categories["high"]
+        medium_quality = categories["medium"]
+        low_quality = categories["low"]
         
-        total = len(scores)
+        total = high_quality + medium_quality + low_quality
         
         return {
             "high_quality_sessions": high_quality,
@@ -306,37 +401,27 @@ class FocusQualityScorer:
         }
     
     @staticmethod
-    def _analyze_quality_factors_batch(db: Session, user_id: str, days: int) -> Dict[str, Any]:
+    def _add_factor_moments(moments: Dict[str, Moments], session: SessionRecord):
+        """Fold one session into the factor analysis accumulators"""
+        moments["completion"].add(1.0 if session.status == "completed" else 0.0)
+        moments["interruptions"].add(session.interruption_count or 0)
+        if session.actual_duration and session.planned_duration:
+            consistency = 1.0 - abs(1.0 - (session.actual_duration / session.planned_duration))
+            moments["consistency"].add(max(0.0, consistency))
+    
+    @staticmethod
+    def _summarize_quality_factors(moments: Dict[str, Moments]) -> Dict[str, Any]:
         """Analyze quality factors across multiple sessions"""
         
-        end_date = datetime.utcnow()
-        start_date = end_date - timedelta(days=days)
-        
-        sessions = db.query(FocusSession).filter(
-            FocusSession.user_id == user_id,
-            FocusSession.start_time >= start_date,
-            FocusSession.start_time <= end_date
-        ).all()
-        
-        if not sessions:
+        if not moments["completion"].count:
             return {}
         
-        # Aggregate factor analysis
-        completion_rates = [1.0 if s.status == "completed" else 0.0 for s in sessions]
-        interruption_counts = [s.interruption_count or 0 for s in sessions]
-        
-        duration_consistencies = []
-        for s in sessions:
-            if s.actual_duration and s.planned_duration:
-                consistency = 1.0 - abs(1.0 - (s.actual_duration / s.planned_duration))
-                duration_consistencies.append(max(0.0, consistency))
-        
         return {
-            "average_completion_rate": statistics.mean(completion_rates),
-            "average_interruptions": statistics.mean(interruption_counts),
-            "average_duration_consistency": statistics.mean(duration_consistencies) if duration_consistencies else 0,
-            "consistency_std_dev": statistics.stdev(duration_consistencies) if len(duration_consistencies) > 1 else 0,
-            "total_sessions": len(sessions)
+            "average_completion_rate": moments["completion"].mean,
+            "average_interruptions": moments["interruptions"].mean,
+            "average_duration_consistency": moments["consistency"].mean,
+            "consistency_std_dev": moments["consistency"].stdev,
+            "total_sessions": moments["completion"].count
         }
     
     @staticmethod
@@ -370,55 +455,46 @@ class PersonalizedScoring:
         end_date = datetime.utcnow()
         start_date = end_date - timedelta(days=days)
         
-        sessions = db.query(FocusSession).filter(
-            FocusSession.user_id == user_id,
-            FocusSession.start_time >= start_date,
-            FocusSession.start_time <= end_date
-        ).all()
+        hourly_performance = defaultdict(Moments)
+        type_data = defaultdict(SessionAggregate)
+        type_productivity = defaultdict(Moments)
+        total_sessions = 0
         
-        if not sessions:
+        for session in SessionRepository.stream_records(
+            db, *SessionRepository.user_window(user_id, start_date, end_date)
+        ):
+            total_sessions += 1
+            session_type = session.session_type or "unknown"
+            type_data[session_type].add(session)
+            # Unscored and zero-scored sessions are left out of productivity averages
+            if session.productivity_score:
+                hourly_performance[session.start_hour].add(session.productivity_score)
+                type_productivity[session_type].add(session.productivity_score)
+        
+        if not total_sessions:
             return {}
         
         # Personal optimal hours analysis
-        hourly_performance = defaultdict(list)
-        for session in sessions:
-            if session.productivity_score:
-                hour = session.start_time.hour
-                hourly_performance[hour].append(session.productivity_score)
-        
         personal_optimal_hours = []
         for hour, scores in hourly_performance.items():
-            if len(scores) >= 3:  # Minimum sessions for reliability
-                avg_score = statistics.mean(scores)
-                if avg_score >= 7.0:
+            if scores.count >= 3:  # Minimum sessions for reliability
+                if scores.mean >= 7.0:
                     personal_optimal_hours.append(hour)
         
         # Personal session type preferences
         type_performance = {}
-        from collections import defaultdict
-        type_data = defaultdict(list)
-        
-        for session in sessions:
-            session_type = session.session_type or "unknown"
-            type_data[session_type].append(session)
-        
-        for session_type, type_sessions in type_data.items():
-            if len(type_sessions) >= 5:  # Minimum for reliability
-                completed = sum(1 for s in type_sessions if s.status == "completed")
-                avg_productivity = statistics.mean([
-                    s.productivity_score for s in type_sessions if s.productivity_score
-                ]) if any(s.productivity_score for s in type_sessions) else 0
-                
+        for session_type, data in type_data.items():
+            if data.total_sessions >= 5:  # Minimum for reliability
                 type_performance[session_type] = {
-                    "completion_rate": completed / len(type_sessions),
-                    "average_productivity": avg_productivity,
-                    "total_sessions": len(type_sessions)
+                    "completion_rate": data.completion_rate,
+                    "average_productivity": type_productivity[session_type].mean,
+                    "total_sessions": data.total_sessions
                 }
         
         return {
             "personal_optimal_hours": sorted(personal_optimal_hours),
             "session_type_performance": type_performance,
             "analysis_period_days": days,
-            "total_sessions": len(sessions),
-            "profile_reliability": "high" if len(sessions) >= 50 else "medium" if len(sessions) >= 20 else "low"
+            "total_sessions": total_sessions,
+            "profile_reliability": "high" if total_sessions >= 50 else "medium" if total_sessions >= 20 else "low"
         }
@@ -4,18 +4,36 @@ Session reminders, break alerts, achievement notifications, and productivity mil
 """
 
 from sqlalchemy.orm import Session
+from sqlalchemy import func, and_, update
 from datetime import datetime, timedelta, time
-from typing import Dict, List, Optional, Any, Union
+from typing import Dict, List, Optional, Any, Union, Iterable, Tuple
 from enum import Enum
 from dataclasses import dataclass, asdict
+from collections import defaultdict
+import heapq
 import asyncio
 import logging
+import uuid
 from abc import ABC, abstractmethod
 
-from ..models.session_models import FocusSession
+from ..config.settings import get_settings
+from ..database.connection import SessionLocal
+from ..models.session_models import FocusSession, User
 from ..routers.websockets import broadcast_session_update
+from ..utils.cache import TTLCache, invalidation_bus
+from ..utils.idempotency import idempotency_store
 
 logger = logging.getLogger("focus_engine.notifications")
+settings = get_settings()
+
+DEFAULT_NOTIFICATION_PREFERENCES: Dict[str, Any] = {
+    "channels": ["websocket"],
+    "disabled_types": [],
+    "quiet_hours": {"start": "22:00", "end": "08:00"},
+    "break_reminders": True,
+    "session_reminders": True,
+    "achievement_notifications": True
+}
 
 
 class NotificationType(Enum):
@@ -119,14 +137,24 @@ class PushChannel(NotificationChannel):
 class NotificationService:
     """Core notification management service"""
     
-    def __init__(self):
+    PREFERENCES_CACHE_NAMESPACE = "notification_preferences"
+    
+    def __init__(self, session_factory=SessionLocal):
+        self.session_factory = session_factory
         self.channels = {
             "websocket": WebSocketChannel(),
             "email": EmailChannel(),
             "push": PushChannel()
         }
-        self.pending_notifications: List[NotificationMessage] = []
-        self.user_preferences: Dict[str, Dict[str, Any]] = {}
+        # Scheduled notifications bucketed by target minute, with a min-heap of bucket keys
+        self.scheduled_buckets: Dict[datetime, List[NotificationMessage]] = {}
+        self._bucket_heap: List[datetime] = []
+        
+        # Read-through cache over User.notification_preferences
+        self.preferences_cache = TTLCache(
+            maxsize=settings.preferences_cache_max_entries,
+            ttl_seconds=settings.preferences_cache_ttl_seconds
+        )
     
     async def create_notification(self, 
                                 user_id: str,
@@ -138,7 +166,6 @@ class NotificationService:
                                 scheduled_time: Optional[datetime] = None) -> NotificationMessage:
         """Create a new notification"""
         
-        import uuid
         notification = NotificationMessage(
             id=str(uuid.uuid4()),
             user_id=user_id,
@@ -155,7 +182,7 @@ class NotificationService:
             await self._send_notification(notification)
         else:
             # Store for later sending
-            self.pending_notifications.append(notification)
+            self.schedule_notifications([notification])
             logger.info(f"Scheduled notification {notification.id} for {scheduled_time}")
         
         return notification
@@ -164,7 +191,9 @@ class NotificationService:
         """Send notification through appropriate channels"""
         
         # Check user preferences
-        user_prefs = self.user_preferences.get(notification.user_id, {})
+        user_prefs = self.preferences_cache.get(notification.user_id)
+        if user_prefs is None:
+            user_prefs = await asyncio.to_thread(self.get_user_preferences, notification.user_id)
         enabled_channels = user_prefs.get("channels", ["websocket"])
         
         # Check if this notification type is enabled
@@ -188,34 +217,137 @@ class NotificationService:
         
         return success
     
+    @staticmethod
+    def _bucket_key(scheduled_time: datetime) -> datetime:
+        """Truncate a scheduled time to its minute bucket"""
+        return scheduled_time.replace(second=0, microsecond=0)
+    
+    def schedule_notifications(self, notifications: Iterable[NotificationMessage]) -> int:
+        """Enqueue scheduled notifications in bulk, bucketed by target minute"""
+        
+        buckets: Dict[datetime, List[NotificationMessage]] = defaultdict(list)
+        for notification in notifications:
+            buckets[self._bucket_key(notification.scheduled_time)].append(notification)
+        
+        return self.schedule_buckets(buckets)
+    
+    def schedule_buckets(self, buckets: Dict[datetime, List[NotificationMessage]]) -> int:
+        """Merge pre-bucketed notifications into the scheduler"""
+        
+        scheduled = 0
+        for minute, notifications in buckets.items():
+            minute = self._bucket_key(minute)
+            if minute not in self.scheduled_buckets:
+                self.scheduled_buckets[minute] = []
+                heapq.heappush(self._bucket_heap, minute)
+            self.scheduled_buckets[minute].extend(notifications)
+            scheduled += len(notifications)
+        
+        return scheduled
+    
+    @property
+    def pending_count(self) -> int:
+        """Number of notifications waiting to be sent"""
+        return sum(len(bucket) for bucket in self.scheduled_buckets.values())
+    
     async def process_scheduled_notifications(self):
-        """Process and send scheduled notifications"""
+        """Process and send scheduled notifications (minute resolution)"""
         current_time = datetime.utcnow()
         
-        to_send = [
-            notif for notif in self.pending_notifications 
-            if notif.scheduled_time and notif.scheduled_time <= current_time
-        ]
-        
-        for notification in to_send:
-            await self._send_notification(notification)
-            self.pending_notifications.remove(notification)
+        while self._bucket_heap and self._bucket_heap[0] <= current_time:
+            minute = heapq.heappop(self._bucket_heap)
+            to_send = self.scheduled_buckets.pop(minute, [])
+            
+            # Warm preferences for the whole bucket so sends are cache hits
+            await asyncio.to_thread(
+                self.prefetch_user_preferences, {n.user_id for n in to_send}
+            )
+            
+            await asyncio.gather(
+                *(self._send_notification(notification) for notification in to_send)
+            )
     
-    def set_user_preferences(self, user_id: str, preferences: Dict[str, Any]):
-        """Set notification preferences for a user"""
-        self.user_preferences[user_id] = preferences
+    async def run_scheduler(self, interval_seconds: float):
+        """Send due scheduled notifications periodically until cancelled"""
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                await self.process_scheduled_notifications()
+            except Exception as e:
+                logger.error(f"Failed to process scheduled notifications: {e}")
+    
+    def set_user_preferences(self, user_id: str, preferences: Dict[str, Any]) -> bool:
+        """Set notification preferences for an existing user (write-through)
+        
+        Unknown users are not created here: a users row stands for a signup,
+        and its created_at is the signup date cohort analytics relies on.
+        Returns False when the user does not exist.
+        """
+        
+        db = self.session_factory()
+        try:
+            updated = db.execute(
+                update(User)
+                .where(User.username == user_id)
+                .values(notification_preferences=preferences)
+            ).rowcount
+            db.commit()
+        finally:
+            db.close()
+        
+        if not updated:
+            return False
+        
+        self.preferences_cache.set(user_id, self._with_defaults(preferences))
+        invalidation_bus.publish(self.PREFERENCES_CACHE_NAMESPACE, user_id)
         logger.info(f"Updated notification preferences for user {user_id}")
+        return True
     
     def get_user_preferences(self, user_id: str) -> Dict[str, Any]:
         """Get notification preferences for a user"""
-        return self.user_preferences.get(user_id, {
-            "channels": ["websocket"],
-            "disabled_types": [],
-            "quiet_hours": {"start": "22:00", "end": "08:00"},
-            "break_reminders": True,
-            "session_reminders": True,
-            "achievement_notifications": True
-        })
+        
+        preferences = self.preferences_cache.get(user_id)
+        if preferences is not None:
+            return preferences
+        
+        db = self.session_factory()
+        try:
+            stored = db.query(User.notification_preferences).filter(
+                User.username == user_id
+            ).scalar()
+        finally:
+            db.close()
+        
+        preferences = self._with_defaults(stored)
+        self.preferences_cache.set(user_id, preferences)
+        return preferences
+    
+    def prefetch_user_preferences(self, user_ids: Iterable[str], chunk_size: int = 1000) -> int:
+        """Load preferences for all uncached users in one query"""
+        
+        missing = [u for u in user_ids if u not in self.preferences_cache]
+        if not missing:
+            return 0
+        
+        stored: Dict[str, Any] = {}
+        db = self.session_factory()
+        try:
+            for i in range(0, len(missing), chunk_size):
+                stored.update(db.query(User.username, User.notification_preferences).filter(
+                    User.username.in_(missing[i:i + chunk_size])
+                ).all())
+        finally:
+            db.close()
+        
+        for user_id in missing:
+            self.preferences_cache.set(user_id, self._with_defaults(stored.get(user_id)))
+        
+        return len(missing)
+    
+    @staticmethod
+    def _with_defaults(preferences: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Overlay stored preferences on the defaults"""
+        return {**DEFAULT_NOTIFICATION_PREFERENCES, **(preferences or {})}
 
 
 class SessionReminderService:
@@ -361,6 +493,13 @@ class AchievementNotificationService:
 class SmartReminderService:
     """Intelligent reminder service based on user patterns"""
     
+    # Minutes before an optimal hour to send the reminder
+    REMINDER_LEAD_MINUTES = 10
+    
+    # Claim key scope for the nightly run, held long enough to cover that night
+    NIGHTLY_REMINDERS_SCOPE = "focus:nightly_reminders"
+    NIGHTLY_CLAIM_TTL_SECONDS = 2 * 86400
+    
     def __init__(self, notification_service: NotificationService):
         self.notification_service = notification_service
     
@@ -375,33 +514,167 @@ class SmartReminderService:
         hourly_patterns = SessionAnalytics.calculate_hourly_patterns(db, user_id, 30)
         
         if hourly_patterns["peak_productivity_hours"]:
-            current_hour = datetime.utcnow().hour
+            now = datetime.utcnow()
             best_hours = [h["hour"] for h in hourly_patterns["peak_productivity_hours"][:3]]
             
-            # Find next optimal hour
-            next_optimal = None
-            for hour in best_hours:
-                if hour > current_hour:
-                    next_optimal = hour
-                    break
+            next_optimal = self._next_optimal_hour(best_hours, now.hour)
             
             if next_optimal:
-                optimal_time = datetime.utcnow().replace(
+                optimal_time = now.replace(
                     hour=next_optimal, minute=0, second=0, microsecond=0
                 )
+                reminder_time = optimal_time - timedelta(minutes=self.REMINDER_LEAD_MINUTES)
                 
-                if optimal_time > datetime.utcnow():
-                    reminder_time = optimal_time - timedelta(minutes=10)
-                    
-                    return await self.notification_service.create_notification(
-                        user_id=user_id,
-                        type=NotificationType.OPTIMAL_TIME_SUGGESTION,
-                        title="Optimal Focus Time",
-                        message=f"Based on your patterns, {next_optimal}:00 is one of your most productive hours. Ready to start a session?",
-                        priority=NotificationPriority.MEDIUM,
-                        data={"optimal_hour": next_optimal, "pattern_based": True},
-                        scheduled_time=reminder_time
-                    )
+                return await self.notification_service.create_notification(
+                    user_id=user_id,
+                    type=NotificationType.OPTIMAL_TIME_SUGGESTION,
+                    title="Optimal Focus Time",
+                    message=self._optimal_time_message(next_optimal),
+                    priority=NotificationPriority.MEDIUM,
+                    data={"optimal_hour": next_optimal, "pattern_based": True},
+                    scheduled_time=reminder_time
+                )
+    
+    async def schedule_optimal_time_reminders(self,
+                                            db: Optional[Session] = None,
+                                            days: int = 30,
+                                            top_hours: int = 3,
+                                            chunk_size: int = 10000) -> Dict[str, Any]:
+        """Nightly job: schedule optimal-time reminders for every user at once
+        
+        Peak hours for all users come from a single query grouped by
+        (user_id, hour), streamed in chunks. Reminders are bucketed by
+        target minute and enqueued into the scheduler in one call. The
+        query and bucketing run in a worker thread, on a session of their
+        own unless one is passed in, so the event loop is never blocked.
+        """
+        
+        now = datetime.utcnow()
+        buckets, users_seen = await asyncio.to_thread(
+            self._optimal_time_buckets, db, now, days, top_hours, chunk_size
+        )
+        scheduled = self.notification_service.schedule_buckets(buckets)
+        
+        logger.info(
+            f"Scheduled {scheduled} optimal-time reminders for {users_seen} users "
+            f"across {len(buckets)} minute buckets"
+        )
+        
+        return {
+            "users_analyzed": users_seen,
+            "reminders_scheduled": scheduled,
+            "buckets": {minute.isoformat(): len(items) for minute, items in sorted(buckets.items())}
+        }
+    
+    async def run_nightly_reminders(self, hour_utc: int):
+        """Run schedule_optimal_time_reminders once a day at hour_utc until cancelled"""
+        while True:
+            now = datetime.utcnow()
+            next_run = now.replace(hour=hour_utc, minute=0, second=0, microsecond=0)
+            if next_run <= now:
+                next_run += timedelta(days=1)
+            await asyncio.sleep((next_run - now).total_seconds())
+            
+            # Every worker runs this loop; one of them claims each night's run
+            if not await idempotency_store.claim_once(
+                self.NIGHTLY_REMINDERS_SCOPE, next_run.date().isoformat(), self.NIGHTLY_CLAIM_TTL_SECONDS
+            ):
+                logger.info(f"Optimal-time reminders for {next_run.date()} are handled by another worker")
+                continue
+            
+            try:
+                await self.schedule_optimal_time_reminders()
+            except Exception as e:
+                logger.error(f"Failed to schedule optimal-time reminders: {e}")
+    
+    def _optimal_time_buckets(self, db: Optional[Session], now: datetime, days: int,
+                              top_hours: int, chunk_size: int) -> Tuple[Dict[datetime, List[NotificationMessage]], int]:
+        """Reminders for every user bucketed by target minute, and the number of users seen"""
+        
+        if db is None:
+            db = self.notification_service.session_factory()
+            try:
+                return self._optimal_time_buckets(db, now, days, top_hours, chunk_size)
+            finally:
+                db.close()
+        
+        start_date = now - timedelta(days=days)
+        hour = FocusSession.start_hour
+        
+        rows = db.query(
+            FocusSession.user_id,
+            hour.label("hour"),
+            func.avg(FocusSession.productivity_score).label("avg_productivity")
+        ).filter(
+            and_(
+                FocusSession.start_time >= start_date,
+                FocusSession.start_time <= now
+            )
+        ).group_by(
+            FocusSession.user_id, hour
+        ).order_by(
+            FocusSession.user_id
+        ).yield_per(chunk_size)
+        
+        buckets: Dict[datetime, List[NotificationMessage]] = defaultdict(list)
+        users_seen = 0
+        
+        for user_id, user_hours in self._group_hours_by_user(rows):
+            users_seen += 1
+            
+            # Same ranking as calculate_hourly_patterns: best average productivity first
+            user_hours.sort(key=lambda h: (-round(h[1] or 0, 2), h[0]))
+            best_hours = [h for h, _ in user_hours[:top_hours]]
+            
+            next_optimal = self._next_optimal_hour(best_hours, now.hour)
+            if not next_optimal:
+                continue
+            
+            optimal_time = now.replace(hour=next_optimal, minute=0, second=0, microsecond=0)
+            reminder_time = optimal_time - timedelta(minutes=self.REMINDER_LEAD_MINUTES)
+            
+            buckets[reminder_time].append(NotificationMessage(
+                id=str(uuid.uuid4()),
+                user_id=user_id,
+                type=NotificationType.OPTIMAL_TIME_SUGGESTION,
+                priority=NotificationPriority.MEDIUM,
+                title="Optimal Focus Time",
+                message=self._optimal_time_message(next_optimal),
+                data={"optimal_hour": next_optimal, "pattern_based": True},
+                scheduled_time=reminder_time,
+                created_at=now
+            ))
+        
+        return buckets, users_seen
+    
+    @staticmethod
+    def _group_hours_by_user(rows: Iterable[Tuple[str, Any, Optional[float]]]):
+        """Collapse (user_id, hour, avg) rows ordered by user into per-user hour lists"""
+        current_user = None
+        user_hours: List[Tuple[int, Optional[float]]] = []
+        
+        for user_id, hour, avg_productivity in rows:
+            if user_id != current_user:
+                if user_hours:
+                    yield current_user, user_hours
+                current_user = user_id
+                user_hours = []
+            user_hours.append((int(hour), avg_productivity))
+        
+        if user_hours:
+            yield current_user, user_hours
+    
+    @staticmethod
+    def _next_optimal_hour(best_hours: List[int], current_hour: int) -> Optional[int]:
+        """First of the user's best hours that is still ahead today"""
+        for hour in best_hours:
+            if hour > current_hour:
+                return hour
+        return None
+    
+    @staticmethod
+    def _optimal_time_message(hour: int) -> str:
+        return f"Based on your patterns, {hour}:00 is one of your most productive hours. Ready to start a session?"
     
     async def generate_weekly_summary(self,
                                     db: Session,
@@ -432,6 +705,9 @@ class SmartReminderService:
 
 # Global notification service instance
 notification_service = NotificationService()
+invalidation_bus.subscribe(
+    NotificationService.PREFERENCES_CACHE_NAMESPACE, notification_service.preferences_cache.invalidate
+)
 session_reminder_service = SessionReminderService(notification_service)
 achievement_service = AchievementNotificationService(notification_service)
 smart_reminder_service = SmartReminderService(notification_service)
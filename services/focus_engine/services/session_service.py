@@ -4,32 +4,78 @@ Business logic for focus sessions
 """
 
 from datetime import datetime, timedelta
-from sqlalchemy.orm import Session
-from typing import Optional, List
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update, func, tuple_, text, Select
+from sqlalchemy.exc import IntegrityError
+from pydantic import ValidationError
+from typing import Optional, List, Dict, Any, Callable, Tuple
+import base64
+import binascii
+import json
 import logging
+import uuid
 
-from ..models.session_models import FocusSession
+from ..config.settings import get_settings
+from ..database.connection import get_upsert_insert
+from ..models.session_models import (
+    FocusSession,
+    FocusSessionResponse,
+    SessionIngestRecord,
+    OPEN_SESSION_STATUSES,
+    OPEN_SESSION_INDEX
+)
 from ..routers.websockets import broadcast_session_update
+from ..services.analytics_service import analytics_versions, time_series_store
+from ..utils.cache import TTLCache, invalidation_bus
+from ..utils.validators import SessionValidators, BusinessRuleValidators, validate_session_creation_data
 
 logger = logging.getLogger("focus_engine.session_service")
+settings = get_settings()
+
+SESSION_CACHE_NAMESPACE = "sessions"
+
+# Serialized sessions by id, kept current by every write in this service
+session_cache = TTLCache(
+    maxsize=settings.session_cache_max_entries,
+    ttl_seconds=settings.session_cache_ttl_seconds
+)
+
+# session_uuid -> id; both are immutable so entries never go stale
+session_uuid_index = TTLCache(
+    maxsize=settings.session_cache_max_entries,
+    ttl_seconds=settings.session_cache_ttl_seconds
+)
+
+invalidation_bus.subscribe(SESSION_CACHE_NAMESPACE, lambda key: session_cache.invalidate(int(key)))
+
+
+class SessionNotFoundError(ValueError):
+    """Raised when a session does not exist"""
+
+
+class SessionConflictError(ValueError):
+    """Raised when a session is not in a state that allows the requested transition"""
+
+
+def _constraint_name(error: IntegrityError) -> Optional[str]:
+    """Name of the violated constraint when the driver reports it (psycopg, asyncpg)"""
+    
+    for cause in (error.orig, getattr(error.orig, "__cause__", None)):
+        diag = getattr(cause, "diag", None)
+        name = getattr(diag, "constraint_name", None) or getattr(cause, "constraint_name", None)
+        if name:
+            return name
+    return None
+
 
 class SessionService:
     """Business logic for focus sessions"""
 
     @staticmethod
-    async def start_session(db: Session, user_id: str, duration_minutes: int, 
+    async def start_session(db: AsyncSession, user_id: str, duration_minutes: int, 
                            session_type: str = "pomodoro") -> FocusSession:
         """Start a new focus session"""
         
-        # Check if user has an active session
-        active_session = db.query(FocusSession).filter(
-            FocusSession.user_id == user_id,
-            FocusSession.status == "active"
-        ).first()
-        
-        if active_session:
-            raise ValueError("User already has an active session")
-        
         # Calculate end time
         start_time = datetime.utcnow()
         end_time = start_time + timedelta(minutes=duration_minutes)
@@ -44,9 +90,19 @@ class SessionService:
             status="active"
         )
         
+        # The partial unique index on open sessions rejects a second start
         db.add(session)
-        db.commit()
-        db.refresh(session)
+        try:
+            await db.commit()
+        except IntegrityError as e:
+            await db.rollback()
+            # Drivers that report the violated constraint let other failures through;
+            # otherwise the open-session index is the only constraint this insert can hit
+            if _constraint_name(e) in (None, OPEN_SESSION_INDEX):
+                raise SessionConflictError("User already has an active session")
+            raise
+        analytics_versions.bump(user_id)
+        SessionService._cache_session(session)
         
         # Broadcast session start
         await broadcast_session_update(str(session.id), {
@@ -64,29 +120,21 @@ class SessionService:
         return session
     
     @staticmethod
-    async def pause_session(db: Session, session_id: str) -> FocusSession:
+    async def pause_session(db: AsyncSession, session_id: int) -> FocusSession:
         """Pause an active session"""
         
-        session = db.query(FocusSession).filter(
-            FocusSession.id == session_id
-        ).first()
-        
-        if not session:
-            raise ValueError("Session not found")
-        
-        if session.status != "active":
-            raise ValueError("Session is not active")
-        
-        session.status = "paused"
-        session.paused_at = datetime.utcnow()
-        
-        db.commit()
-        db.refresh(session)
+        now = datetime.utcnow()
+        session = await SessionService._transition(
+            db, session_id,
+            from_statuses=["active"],
+            values={"status": "paused", "paused_at": now},
+            conflict_message="Session is not active"
+        )
         
         # Broadcast session pause
-        await broadcast_session_update(session_id, {
+        await broadcast_session_update(str(session_id), {
             "event": "session_paused",
-            "session_id": session_id,
+            "session_id": str(session_id),
             "paused_at": session.paused_at.isoformat()
         })
         
@@ -94,34 +142,29 @@ class SessionService:
         return session
     
     @staticmethod
-    async def resume_session(db: Session, session_id: str) -> FocusSession:
+    async def resume_session(db: AsyncSession, session_id: int) -> FocusSession:
         """Resume a paused session"""
         
-        session = db.query(FocusSession).filter(
-            FocusSession.id == session_id
-        ).first()
-        
-        if not session:
-            raise ValueError("Session not found")
-        
-        if session.status != "paused":
-            raise ValueError("Session is not paused")
+        now = datetime.utcnow()
         
-        # Calculate new end time accounting for pause duration
-        if session.paused_at:
-            pause_duration = datetime.utcnow() - session.paused_at
-            session.planned_end_time += pause_duration
+        def push_back_planned_end(session: FocusSession) -> Dict[str, Any]:
+            # Push the planned end back by the time spent paused
+            if session.paused_at is None or session.planned_end_time is None:
+                return {}
+            return {"planned_end_time": session.planned_end_time + (now - session.paused_at)}
         
-        session.status = "active"
-        session.resumed_at = datetime.utcnow()
-        
-        db.commit()
-        db.refresh(session)
+        session = await SessionService._transition(
+            db, session_id,
+            from_statuses=["paused"],
+            values={"status": "active", "resumed_at": now},
+            conflict_message="Session is not paused",
+            derive=push_back_planned_end
+        )
         
         # Broadcast session resume
-        await broadcast_session_update(session_id, {
+        await broadcast_session_update(str(session_id), {
             "event": "session_resumed",
-            "session_id": session_id,
+            "session_id": str(session_id),
             "resumed_at": session.resumed_at.isoformat(),
             "new_end_time": session.planned_end_time.isoformat()
         })
@@ -130,37 +173,35 @@ class SessionService:
         return session
     
     @staticmethod
-    async def complete_session(db: Session, session_id: str, 
+    async def complete_session(db: AsyncSession, session_id: int, 
                              completion_reason: str = "completed") -> FocusSession:
         """Complete a session"""
         
-        session = db.query(FocusSession).filter(
-            FocusSession.id == session_id
-        ).first()
-        
-        if not session:
-            raise ValueError("Session not found")
-        
-        if session.status not in ["active", "paused"]:
-            raise ValueError("Session is already completed or canceled")
-        
-        session.status = "completed"
-        session.end_time = datetime.utcnow()
-        session.completion_reason = completion_reason
-        
-        # Calculate actual duration
-        if session.start_time:
-            session.actual_duration = int(
-                (session.end_time - session.start_time).total_seconds() / 60
-            )
-        
-        db.commit()
-        db.refresh(session)
+        now = datetime.utcnow()
+        
+        def actual_duration(session: FocusSession) -> Dict[str, Any]:
+            # Whole minutes between start and completion
+            return {"actual_duration": int((now - session.start_time).total_seconds() // 60)}
+        
+        session = await SessionService._transition(
+            db, session_id,
+            from_statuses=list(OPEN_SESSION_STATUSES),
+            values={
+                "status": "completed",
+                "end_time": now,
+                "completion_reason": completion_reason
+            },
+            conflict_message="Session is already completed or canceled",
+            derive=actual_duration
+        )
+        previous_version = analytics_versions.get(session.user_id)
+        analytics_versions.bump(session.user_id)
+        time_series_store.record(session, previous_version)
         
         # Broadcast session completion
-        await broadcast_session_update(session_id, {
+        await broadcast_session_update(str(session_id), {
             "event": "session_completed",
-            "session_id": session_id,
+            "session_id": str(session_id),
             "completion_reason": completion_reason,
             "actual_duration": session.actual_duration
         })
@@ -169,21 +210,349 @@ class SessionService:
         return session
     
     @staticmethod
-    def get_user_sessions(db: Session, user_id: str, 
-                         limit: int = 10) -> List[FocusSession]:
+    async def ingest_sessions(db: AsyncSession, records: List[SessionIngestRecord],
+                        chunk_size: int = 2000) -> Dict[str, Any]:
+        """Store finished sessions recorded offline, skipping ones already stored
+        
+        Records are validated up front, deduplicated by session_uuid within
+        the batch, and written with multi-row INSERT ... ON CONFLICT DO
+        NOTHING RETURNING so duplicates of stored sessions are detected by
+        the database in the same statement. Chunks keep each statement under
+        the bind parameter limit; all chunks commit together.
+        """
+        
+        results: List[Dict[str, Any]] = []
+        rows: List[Dict[str, Any]] = []
+        row_results: Dict[str, Dict[str, Any]] = {}
+        
+        for index, record in enumerate(records):
+            key = str(record.session_uuid)
+            result = {"index": index, "session_uuid": key, "result": "invalid", "id": None, "errors": []}
+            results.append(result)
+            
+            errors = SessionService._validate_ingest_record(record)
+            if errors:
+                result["errors"] = errors
+                continue
+            if key in row_results:
+                result["result"] = "duplicate"
+                continue
+            
+            actual_duration = record.actual_duration
+            if actual_duration is None:
+                actual_duration = int((record.end_time - record.start_time).total_seconds() // 60)
+            
+            row_results[key] = result
+            rows.append({
+                "session_uuid": record.session_uuid,
+                "user_id": record.user_id,
+                "session_type": record.session_type,
+                "planned_duration": record.planned_duration,
+                "actual_duration": actual_duration,
+                "start_time": record.start_time,
+                "start_date": record.start_time.date(),
+                "start_hour": record.start_time.hour,
+                "end_time": record.end_time,
+                "planned_end_time": record.start_time + timedelta(minutes=record.planned_duration),
+                "status": record.status,
+                "completion_reason": record.completion_reason,
+                "completion_rate": record.completion_rate,
+                "productivity_score": record.productivity_score,
+                "interruption_count": record.interruption_count
+            })
+        
+        # ON CONFLICT ... RETURNING is available on both Postgres and SQLite (3.35+)
+        insert = get_upsert_insert(db.get_bind().dialect.name)
+        inserted = []
+        for start in range(0, len(rows), chunk_size):
+            statement = insert(FocusSession).values(rows[start:start + chunk_size])
+            inserted.extend((await db.execute(
+                statement.on_conflict_do_nothing(
+                    index_elements=[FocusSession.session_uuid]
+                ).returning(FocusSession.id, FocusSession.session_uuid)
+            )).all())
+        await db.commit()
+        
+        for session_id, session_uuid in inserted:
+            result = row_results.pop(str(session_uuid))
+            result["result"] = "created"
+            result["id"] = session_id
+        
+        # Whatever the database skipped was already stored
+        for result in row_results.values():
+            result["result"] = "duplicate"
+        
+        users = {row["user_id"] for row in rows}
+        for user_id in users:
+            analytics_versions.bump(user_id)
+        
+        created = len(inserted)
+        invalid = sum(1 for result in results if result["result"] == "invalid")
+        
+        logger.info(f"Ingested {created} of {len(records)} offline sessions for {len(users)} users")
+        return {
+            "results": results,
+            "created": created,
+            "duplicates": len(records) - created - invalid,
+            "invalid": invalid
+        }
+    
+    @staticmethod
+    def _validate_ingest_record(record: SessionIngestRecord) -> List[str]:
+        errors = validate_session_creation_data(record.user_id, record.session_type, record.planned_duration)
+        
+        if not SessionValidators.validate_session_status(record.status) or record.status in OPEN_SESSION_STATUSES:
+            errors.append("Only completed or cancelled sessions can be ingested")
+        if record.end_time <= record.start_time:
+            errors.append("end_time must be after start_time")
+        if record.actual_duration is not None and record.actual_duration < 0:
+            errors.append("actual_duration must not be negative")
+        if record.completion_reason is not None and not BusinessRuleValidators.validate_completion_reason(record.completion_reason):
+            errors.append(f"Invalid completion reason: {record.completion_reason}")
+        if record.completion_rate is not None and not 0.0 <= record.completion_rate <= 1.0:
+            errors.append("completion_rate must be between 0.0 and 1.0")
+        if record.productivity_score is not None and not 0.0 <= record.productivity_score <= 10.0:
+            errors.append("productivity_score must be between 0.0 and 10.0")
+        if record.interruption_count < 0:
+            errors.append("interruption_count must not be negative")
+        
+        return errors
+    
+    @staticmethod
+    async def _transition(db: AsyncSession, session_id: int, from_statuses: List[str],
+                    values: Dict[str, Any], conflict_message: str,
+                    derive: Optional[Callable[[FocusSession], Dict[str, Any]]] = None) -> FocusSession:
+        """Apply a state transition with a conditional UPDATE ... RETURNING
+        
+        The status precondition is checked by the database in the same
+        statement, so concurrent transitions cannot both succeed. Values that
+        depend on the stored row (durations, shifted end times) are computed
+        in Python by `derive` from the returned row and written by primary
+        key in the same transaction, which keeps the SQL portable across
+        backends.
+        """
+        
+        session = (await db.execute(
+            update(FocusSession)
+            .where(
+                FocusSession.id == session_id,
+                FocusSession.status.in_(from_statuses)
+            )
+            .values(**values)
+            .returning(FocusSession)
+            .execution_options(synchronize_session=False)
+        )).scalar_one_or_none()
+        
+        if session is None:
+            await db.rollback()
+            
+            # Only the failure path pays for telling "missing" from "wrong state"
+            exists = await db.scalar(select(FocusSession.id).where(FocusSession.id == session_id))
+            if exists is None:
+                raise SessionNotFoundError("Session not found")
+            raise SessionConflictError(conflict_message)
+        
+        derived = derive(session) if derive is not None else {}
+        if derived:
+            await db.execute(
+                update(FocusSession)
+                .where(FocusSession.id == session_id)
+                .values(**derived)
+                .execution_options(synchronize_session=False)
+            )
+            for name, value in derived.items():
+                setattr(session, name, value)
+        
+        await db.commit()
+        SessionService._cache_session(session)
+        return session
+    
+    @staticmethod
+    async def get_session(db: AsyncSession, session_id: int) -> Optional[Dict[str, Any]]:
+        """Get a serialized session, served from the session cache when hot"""
+        
+        payload = session_cache.get(session_id)
+        if payload is not None:
+            return payload
+        
+        session = await db.get(FocusSession, session_id)
+        if session is None:
+            return None
+        return SessionService._cache_session(session, publish=False)
+    
+    @staticmethod
+    async def get_session_by_uuid(db: AsyncSession, session_uuid: uuid.UUID) -> Optional[Dict[str, Any]]:
+        """Get a serialized session by its public uuid"""
+        
+        session_id = session_uuid_index.get(session_uuid)
+        if session_id is not None:
+            payload = session_cache.get(session_id)
+            if payload is not None:
+                return payload
+        
+        session = await db.scalar(
+            select(FocusSession).where(FocusSession.session_uuid == session_uuid)
+        )
+        if session is None:
+            return None
+        return SessionService._cache_session(session, publish=False)
+    
+    @staticmethod
+    async def delete_session(db: AsyncSession, session_id: int) -> bool:
+        """Delete a session and drop it from every worker's cache"""
+        
+        session = await db.get(FocusSession, session_id)
+        if session is None:
+            return False
+        
+        user_id = session.user_id
+        await db.delete(session)
+        await db.commit()
+        
+        session_cache.invalidate(session_id)
+        session_uuid_index.invalidate(session.session_uuid)
+        invalidation_bus.publish(SESSION_CACHE_NAMESPACE, str(session_id))
+        analytics_versions.bump(user_id)
+        return True
+    
+    @staticmethod
+    def _cache_session(session: FocusSession, publish: bool = True) -> Optional[Dict[str, Any]]:
+        """Write a session through to the cache; writes also evict other workers' copies
+        
+        The cache is only written once the session has serialized. On the
+        write path (publish=True) the change is already committed, so a
+        serialization failure evicts the cached copy instead of failing
+        the request.
+        """
+        
+        try:
+            payload = FocusSessionResponse.model_validate(session).model_dump(mode="json")
+        except ValidationError as e:
+            if not publish:
+                raise
+            logger.error(f"Could not cache session {session.id}: {e}")
+            session_cache.invalidate(session.id)
+            invalidation_bus.publish(SESSION_CACHE_NAMESPACE, str(session.id))
+            return None
+        
+        session_cache.set(session.id, payload)
+        session_uuid_index.set(session.session_uuid, session.id)
+        if publish:
+            invalidation_bus.publish(SESSION_CACHE_NAMESPACE, str(session.id))
+        return payload
+    
+    @staticmethod
+    async def get_user_sessions(db: AsyncSession, user_id: str, 
+                               limit: int = 10) -> List[FocusSession]:
         """Get recent sessions for a user"""
         
-        return db.query(FocusSession).filter(
-            FocusSession.user_id == user_id
-        ).order_by(
-            FocusSession.start_time.desc()
-        ).limit(limit).all()
+        result = await db.scalars(
+            select(FocusSession).where(
+                FocusSession.user_id == user_id
+            ).order_by(
+                FocusSession.start_time.desc()
+            ).limit(limit)
+        )
+        return list(result)
+    
+    @staticmethod
+    async def get_user_sessions_page(db: AsyncSession, user_id: str, limit: int = 10,
+                                     cursor: Optional[str] = None,
+                                     status: Optional[str] = None,
+                                     session_type: Optional[str] = None,
+                                     count: Optional[str] = None) -> Dict[str, Any]:
+        """Get one page of a user's session history, newest first
+        
+        Pages are addressed by an opaque cursor holding the (start_time, id)
+        of the last row served, so every page is a range scan on the
+        (user_id, start_time DESC, id DESC) index no matter how deep it is.
+        """
+        
+        query = select(FocusSession).where(FocusSession.user_id == user_id)
+        if status is not None:
+            query = query.where(FocusSession.status == status)
+        if session_type is not None:
+            query = query.where(FocusSession.session_type == session_type)
+        
+        page_query = query
+        if cursor is not None:
+            start_time, session_id = SessionService._decode_cursor(cursor)
+            page_query = page_query.where(
+                tuple_(FocusSession.start_time, FocusSession.id) < tuple_(start_time, session_id)
+            )
+        
+        # One extra row tells us whether another page exists
+        sessions = list(await db.scalars(
+            page_query.order_by(
+                FocusSession.start_time.desc(),
+                FocusSession.id.desc()
+            ).limit(limit + 1)
+        ))
+        
+        next_cursor = None
+        if len(sessions) > limit:
+            sessions = sessions[:limit]
+            last = sessions[-1]
+            next_cursor = SessionService._encode_cursor(last.start_time, last.id)
+        
+        total = None
+        if count == "exact":
+            total = await SessionService._count(db, query)
+        elif count == "approximate":
+            total = await SessionService._estimate_count(db, query)
+        
+        return {
+            "sessions": sessions,
+            "total": total,
+            "limit": limit,
+            "next_cursor": next_cursor
+        }
+    
+    @staticmethod
+    def _encode_cursor(start_time: datetime, session_id: int) -> str:
+        payload = json.dumps([start_time.isoformat(), session_id], separators=(",", ":"))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+    
+    @staticmethod
+    def _decode_cursor(cursor: str) -> Tuple[datetime, int]:
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            start_time, session_id = json.loads(base64.urlsafe_b64decode(padded))
+            return datetime.fromisoformat(start_time), int(session_id)
+        except (binascii.Error, UnicodeDecodeError, TypeError, ValueError) as e:
+            raise ValueError("Invalid pagination cursor") from e
+    
+    @staticmethod
+    async def _count(db: AsyncSession, query: Select) -> int:
+        return await db.scalar(
+            select(func.count()).select_from(query.with_only_columns(FocusSession.id).subquery())
+        )
+    
+    @staticmethod
+    async def _estimate_count(db: AsyncSession, query: Select) -> int:
+        """Planner row estimate for a query, falling back to COUNT(*) off Postgres"""
+        
+        dialect = db.get_bind().dialect
+        if dialect.name != "postgresql":
+            return await SessionService._count(db, query)
+        
+        statement = query.with_only_columns(FocusSession.id).compile(
+            dialect=dialect,
+            compile_kwargs={"literal_binds": True}
+        )
+        plan = await db.scalar(text(f"EXPLAIN (FORMAT JSON) {statement}"))
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
     
     @staticmethod
-    def get_active_session(db: Session, user_id: str) -> Optional[FocusSession]:
+    async def get_active_session(db: AsyncSession, user_id: str) -> Optional[FocusSession]:
         """Get user's currently active session if any"""
         
-        return db.query(FocusSession).filter(
-            FocusSession.user_id == user_id,
-            FocusSession.status.in_(["active", "paused"])
-        ).first()
+        # Matches the partial unique index predicate, so this is a single index probe
+        return await db.scalar(
+            select(FocusSession).where(
+                FocusSession.user_id == user_id,
+                FocusSession.status.in_(OPEN_SESSION_STATUSES)
+            )
+        )
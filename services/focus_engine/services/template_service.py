@@ -5,15 +5,28 @@ Customizable session templates, productivity presets, and user configurations
 
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any, Union
-from dataclasses import dataclass, asdict
+from typing import Dict, List, Optional, Any, Tuple, Union
+from dataclasses import dataclass, asdict, replace
 from enum import Enum
+import asyncio
+import heapq
+import itertools
 import json
 import logging
+import threading
+import time
+import uuid
 
+from ..config.settings import get_settings
+from ..database.connection import SessionLocal, get_upsert_insert
 from ..models.session_models import FocusSession
+from ..models.template_models import StoredTemplate, StoredPreset, TemplateUsage
+from ..services.analytics_service import SessionAnalytics, analytics_versions
+from ..utils.cache import TTLCache, invalidation_bus
+from ..utils.search_index import InvertedIndex
 
 logger = logging.getLogger("focus_engine.templates")
+settings = get_settings()
 
 
 class TemplateCategory(Enum):
@@ -113,13 +126,18 @@ class ProductivityPreset:
             self.created_at = datetime.utcnow()
 
 
+# Fixed timestamp for the built-in catalog, so serialized system templates
+# (and the ETags derived from them) are identical on every worker
+SYSTEM_CATALOG_DATE = datetime(2024, 1, 1)
+
+
 class SystemTemplates:
     """Predefined system templates for common use cases"""
     
     @staticmethod
     def get_all_system_templates() -> List[SessionTemplate]:
         """Get all predefined system templates"""
-        return [
+        templates = [
             # Pomodoro variants
             SessionTemplate(
                 id="pomodoro_classic",
@@ -262,11 +280,14 @@ class SystemTemplates:
                 is_system_template=True
             )
         ]
+        for template in templates:
+            template.created_at = template.updated_at = SYSTEM_CATALOG_DATE
+        return templates
     
     @staticmethod
     def get_productivity_presets() -> List[ProductivityPreset]:
         """Get predefined productivity presets"""
-        return [
+        presets = [
             ProductivityPreset(
                 id="beginner_routine",
                 name="Beginner's Routine",
@@ -334,16 +355,225 @@ class SystemTemplates:
                 adaptive_difficulty=True
             )
         ]
+        for preset in presets:
+            preset.created_at = SYSTEM_CATALOG_DATE
+        return presets
+
+
+# Distinguishes successive loads of a user's index within this process
+_index_generations = itertools.count()
+
+
+def _search_texts(template: SessionTemplate) -> List[str]:
+    """Fields of a template that are searchable"""
+    return [template.name, template.description, template.session_type, *template.tags]
+
+
+class UserTemplateIndex:
+    """In-memory indexes over one user's custom templates and presets"""
+    
+    def __init__(self, templates: List[SessionTemplate], presets: List[ProductivityPreset]):
+        self.templates_by_id: Dict[str, SessionTemplate] = {t.id: t for t in templates}
+        self.presets_by_id: Dict[str, ProductivityPreset] = {p.id: p for p in presets}
+        self.generation = next(_index_generations)
+        self.version = 0
+        
+        # Sorted listings memoized per (category, difficulty, include_system, system_version)
+        self.listings: Dict[tuple, List[SessionTemplate]] = {}
+        self._search_index: Optional[InvertedIndex] = None
+        self._lock = threading.Lock()
+    
+    @property
+    def search_index(self) -> InvertedIndex:
+        """Inverted index over the user's templates, built on first search"""
+        if self._search_index is None:
+            # Built under the lock so a concurrent put/remove is not lost
+            with self._lock:
+                if self._search_index is None:
+                    search_index = InvertedIndex()
+                    for template in list(self.templates_by_id.values()):
+                        search_index.add(template.id, _search_texts(template))
+                    self._search_index = search_index
+        return self._search_index
+    
+    def put_template(self, template: SessionTemplate):
+        """Add or replace a template in every index"""
+        with self._lock:
+            self.templates_by_id[template.id] = template
+            if self._search_index is not None:
+                self._search_index.add(template.id, _search_texts(template))
+    
+    def remove_template(self, template_id: str):
+        """Remove a template from every index"""
+        with self._lock:
+            self.templates_by_id.pop(template_id, None)
+            if self._search_index is not None:
+                self._search_index.remove(template_id)
+    
+    def touch(self):
+        """Record a change to this user's templates"""
+        self.version += 1
+        self.listings.clear()
 
 
 class TemplateService:
-    """Service for managing session templates and presets"""
+    """Service for managing session templates and presets
+    
+    Custom templates, presets and usage counters are persisted; reads are
+    served from in-memory indexes (system templates at startup, user
+    templates loaded per user on first access) with listings kept in
+    precomputed sort order.
+    """
     
-    def __init__(self):
-        self.user_templates: Dict[str, List[SessionTemplate]] = {}
-        self.user_presets: Dict[str, List[ProductivityPreset]] = {}
+    TEMPLATE_CACHE_NAMESPACE = "templates"
+    
+    # Number of ranked recommendations cached per user
+    RECOMMENDATION_CACHE_DEPTH = 20
+    
+    def __init__(self, session_factory=SessionLocal):
+        self.session_factory = session_factory
         self.system_templates = SystemTemplates.get_all_system_templates()
         self.system_presets = SystemTemplates.get_productivity_presets()
+        self._system_templates_by_id = {t.id: t for t in self.system_templates}
+        self._system_presets_by_id = {p.id: p for p in self.system_presets}
+        self._system_search_index = InvertedIndex()
+        for template in self.system_templates:
+            self._system_search_index.add(template.id, _search_texts(template))
+        
+        # Bumped whenever system template ordering can change (usage counts)
+        self.system_version = 0
+        # Bumped whenever flush_usage rewrites counters in place, so cached
+        # responses (and their ETags) stop serving the old counts
+        self.usage_generation = 0
+        self._system_listings: Dict[tuple, List[SessionTemplate]] = {}
+        self._system_usage_loaded_at: Optional[float] = None
+        self._system_usage_seen: Dict[str, tuple] = {}
+        self._lock = threading.RLock()
+        
+        # Buffered usage per (template_id, owner user_id): [uses, completed]
+        self._pending_usage: Dict[tuple, List[int]] = {}
+        self._usage_lock = threading.Lock()
+        
+        self._user_indexes = TTLCache(
+            maxsize=settings.template_cache_max_users,
+            ttl_seconds=settings.template_cache_ttl_seconds
+        )
+        self._recommendations = TTLCache(
+            maxsize=settings.template_cache_max_users,
+            ttl_seconds=settings.recommendation_cache_ttl_seconds
+        )
+        invalidation_bus.subscribe(self.TEMPLATE_CACHE_NAMESPACE, self._on_remote_invalidation)
+    
+    def _get_user_index(self, user_id: str) -> UserTemplateIndex:
+        """Get a user's template index, loading it from the database on a miss"""
+        
+        index = self._user_indexes.get(user_id)
+        if index is not None:
+            return index
+        
+        db = self.session_factory()
+        try:
+            template_rows = db.query(StoredTemplate, TemplateUsage).outerjoin(
+                TemplateUsage, TemplateUsage.template_id == StoredTemplate.id
+            ).filter(StoredTemplate.user_id == user_id).all()
+            
+            preset_rows = db.query(StoredPreset).filter(
+                StoredPreset.user_id == user_id
+            ).all()
+        finally:
+            db.close()
+        
+        index = UserTemplateIndex(
+            [self._template_from_row(row, usage) for row, usage in template_rows],
+            [self._preset_from_row(row) for row in preset_rows]
+        )
+        self._user_indexes.set(user_id, index)
+        return index
+    
+    def _ensure_system_usage(self):
+        """Refresh system template usage counters from the database when stale"""
+        
+        now = time.monotonic()
+        loaded_at = self._system_usage_loaded_at
+        if loaded_at is not None and now - loaded_at < settings.template_cache_ttl_seconds:
+            return
+        
+        with self._lock:
+            if self._system_usage_loaded_at is not None and now - self._system_usage_loaded_at < settings.template_cache_ttl_seconds:
+                return
+            
+            try:
+                db = self.session_factory()
+                try:
+                    usage_rows = db.query(TemplateUsage).filter(
+                        TemplateUsage.template_id.in_(list(self._system_templates_by_id))
+                    ).all()
+                finally:
+                    db.close()
+            except Exception as e:
+                logger.error(f"Failed to load system template usage: {e}")
+                usage_rows = []
+            
+            # Compare against the counters the current listings were built from;
+            # flushes update the templates in place but leave ordering to this reload
+            changed = False
+            for usage in usage_rows:
+                counters = (usage.usage_count, usage.completed_count)
+                if self._system_usage_seen.get(usage.template_id) != counters:
+                    self._system_usage_seen[usage.template_id] = counters
+                    changed = True
+                self._apply_usage(self._system_templates_by_id[usage.template_id], usage)
+            
+            self._system_usage_loaded_at = now
+            # Only a real change in counters moves listing order and ETags
+            if changed:
+                self._bump_system_version()
+    
+    def _bump_system_version(self):
+        with self._lock:
+            self.system_version += 1
+            self._system_listings.clear()
+    
+    def _invalidate_user(self, user_id: str, index: Optional[UserTemplateIndex] = None):
+        """Mark a user's templates as changed here and on other workers"""
+        if index is not None:
+            index.touch()
+        invalidation_bus.publish(self.TEMPLATE_CACHE_NAMESPACE, user_id)
+    
+    def _on_remote_invalidation(self, user_id: str):
+        self._user_indexes.invalidate(user_id)
+    
+    @staticmethod
+    def _sort_key(template: SessionTemplate) -> tuple:
+        return (template.is_favorite, template.usage_count, template.name)
+    
+    @staticmethod
+    def _matches(template: SessionTemplate,
+                 category: Optional[TemplateCategory],
+                 difficulty: Optional[DifficultyLevel]) -> bool:
+        return ((category is None or template.category == category) and
+                (difficulty is None or template.difficulty == difficulty))
+    
+    def _system_listing(self, category: Optional[TemplateCategory],
+                        difficulty: Optional[DifficultyLevel]) -> List[SessionTemplate]:
+        """System templates matching the filters, in listing order"""
+        
+        key = (category, difficulty)
+        listing = self._system_listings.get(key)
+        if listing is None:
+            listing = sorted(
+                (t for t in self.system_templates if self._matches(t, category, difficulty)),
+                key=self._sort_key, reverse=True
+            )
+            self._system_listings[key] = listing
+        return listing
+    
+    def get_template_version(self, user_id: str) -> tuple:
+        """Local version of everything a user's template and preset views depend on"""
+        
+        self._ensure_system_usage()
+        index = self._get_user_index(user_id)
+        return (self.system_version, self.usage_generation, index.generation, index.version)
     
     def get_templates_for_user(self, user_id: str, 
                               category: Optional[TemplateCategory] = None,
@@ -351,49 +581,78 @@ class TemplateService:
                               include_system: bool = True) -> List[SessionTemplate]:
         """Get templates available to a user"""
         
-        templates = []
-        
-        # Add system templates
-        if include_system:
-            templates.extend(self.system_templates)
-        
-        # Add user's custom templates
-        user_templates = self.user_templates.get(user_id, [])
-        templates.extend(user_templates)
+        self._ensure_system_usage()
+        index = self._get_user_index(user_id)
+        system_version = self.system_version
         
-        # Filter by criteria
-        if category:
-            templates = [t for t in templates if t.category == category]
-        
-        if difficulty:
-            templates = [t for t in templates if t.difficulty == difficulty]
+        key = (category, difficulty, include_system, system_version)
+        listing = index.listings.get(key)
+        if listing is not None:
+            return list(listing)
         
         # Sort by usage and favorites
-        templates.sort(key=lambda t: (t.is_favorite, t.usage_count, t.name), reverse=True)
+        user_listing = sorted(
+            (t for t in index.templates_by_id.values() if self._matches(t, category, difficulty)),
+            key=self._sort_key, reverse=True
+        )
         
-        return templates
+        if include_system:
+            listing = list(heapq.merge(
+                self._system_listing(category, difficulty), user_listing,
+                key=self._sort_key, reverse=True
+            ))
+        else:
+            listing = user_listing
+        
+        index.listings[key] = listing
+        return list(listing)
     
     def get_template_by_id(self, template_id: str, user_id: Optional[str] = None) -> Optional[SessionTemplate]:
         """Get a specific template by ID"""
         
-        # Check system templates
-        for template in self.system_templates:
-            if template.id == template_id:
-                return template
+        template = self._system_templates_by_id.get(template_id)
+        if template is not None:
+            return template
         
-        # Check user templates
         if user_id:
-            user_templates = self.user_templates.get(user_id, [])
-            for template in user_templates:
-                if template.id == template_id:
-                    return template
+            return self._get_user_index(user_id).templates_by_id.get(template_id)
         
         return None
     
+    def search_templates(self, user_id: str, query: str,
+                         include_system: bool = True,
+                         limit: int = 20,
+                         offset: int = 0) -> Tuple[List[SessionTemplate], int]:
+        """Search templates by name, description, tags and session type
+        
+        Every query term must match a token prefix. Results are ranked like
+        listings (favorites, then usage) and returned with the total count.
+        """
+        
+        self._ensure_system_usage()
+        index = self._get_user_index(user_id)
+        
+        # A template deleted since the search ran is skipped rather than raising
+        matches = [
+            template for template in map(index.templates_by_id.get, index.search_index.search(query))
+            if template is not None
+        ]
+        if include_system:
+            matches.extend(
+                self._system_templates_by_id[i] for i in self._system_search_index.search(query)
+            )
+        
+        total = len(matches)
+        if offset + limit < total:
+            page = heapq.nlargest(offset + limit, matches, key=self._sort_key)[offset:]
+        else:
+            page = sorted(matches, key=self._sort_key, reverse=True)[offset:offset + limit]
+        
+        return page, total
+    
     def create_custom_template(self, user_id: str, template_data: Dict[str, Any]) -> SessionTemplate:
         """Create a new custom template for a user"""
         
-        import uuid
         template_id = str(uuid.uuid4())
         
         template = SessionTemplate(
@@ -419,9 +678,16 @@ class TemplateService:
         )
         
         # Store template
-        if user_id not in self.user_templates:
-            self.user_templates[user_id] = []
-        self.user_templates[user_id].append(template)
+        db = self.session_factory()
+        try:
+            db.add(StoredTemplate(**self._template_to_row_values(template)))
+            db.commit()
+        finally:
+            db.close()
+        
+        index = self._get_user_index(user_id)
+        index.put_template(template)
+        self._invalidate_user(user_id, index)
         
         logger.info(f"Created custom template {template_id} for user {user_id}")
         return template
@@ -430,77 +696,207 @@ class TemplateService:
                        updates: Dict[str, Any]) -> Optional[SessionTemplate]:
         """Update an existing template"""
         
-        template = self.get_template_by_id(template_id, user_id)
+        index = self._get_user_index(user_id)
+        template = index.templates_by_id.get(template_id)
         if not template or template.user_id != user_id:
             return None  # Can only update own templates
         
+        # Normalize enum fields
+        updates = dict(updates)
+        if "category" in updates:
+            updates["category"] = TemplateCategory(updates["category"])
+        if "difficulty" in updates:
+            updates["difficulty"] = DifficultyLevel(updates["difficulty"])
+        
         # Update fields
-        for field, value in updates.items():
-            if hasattr(template, field):
-                setattr(template, field, value)
+        updated = replace(template, **{
+            field: value for field, value in updates.items()
+            if field in self._UPDATABLE_FIELDS
+        })
+        updated.updated_at = datetime.utcnow()
+        
+        db = self.session_factory()
+        try:
+            db.query(StoredTemplate).filter(
+                StoredTemplate.id == template_id,
+                StoredTemplate.user_id == user_id
+            ).update(self._template_to_row_values(updated), synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
         
-        template.updated_at = datetime.utcnow()
+        index.put_template(updated)
+        self._invalidate_user(user_id, index)
         
         logger.info(f"Updated template {template_id} for user {user_id}")
-        return template
+        return updated
     
     def delete_template(self, template_id: str, user_id: str) -> bool:
         """Delete a user's custom template"""
         
-        user_templates = self.user_templates.get(user_id, [])
+        index = self._get_user_index(user_id)
+        if template_id not in index.templates_by_id:
+            return False
+        
+        # Unflushed usage would otherwise recreate the usage row on the next flush
+        with self._usage_lock:
+            self._pending_usage.pop((template_id, user_id), None)
+        
+        db = self.session_factory()
+        try:
+            deleted = db.query(StoredTemplate).filter(
+                StoredTemplate.id == template_id,
+                StoredTemplate.user_id == user_id
+            ).delete(synchronize_session=False)
+            db.query(TemplateUsage).filter(
+                TemplateUsage.template_id == template_id
+            ).delete(synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
         
-        for i, template in enumerate(user_templates):
-            if template.id == template_id and template.user_id == user_id:
-                del user_templates[i]
-                logger.info(f"Deleted template {template_id} for user {user_id}")
-                return True
+        index.remove_template(template_id)
+        self._invalidate_user(user_id, index)
         
-        return False
+        if deleted:
+            logger.info(f"Deleted template {template_id} for user {user_id}")
+        return bool(deleted)
     
     def track_template_usage(self, template_id: str, user_id: Optional[str], 
                            completed: bool = True):
-        """Track usage statistics for a template"""
+        """Track usage statistics for a template
+        
+        Usage is buffered in memory and persisted by flush_usage, so this
+        never touches the database or the shared template objects.
+        """
         
         template = self.get_template_by_id(template_id, user_id)
         if template:
-            template.usage_count += 1
-            
-            # Update completion rate
-            if completed:
-                # Simple running average update
-                old_rate = template.average_completion_rate
-                new_rate = (old_rate * (template.usage_count - 1) + 1.0) / template.usage_count
-                template.average_completion_rate = new_rate
-            else:
-                # Session not completed
-                old_rate = template.average_completion_rate
-                new_rate = (old_rate * (template.usage_count - 1) + 0.0) / template.usage_count
-                template.average_completion_rate = new_rate
+            with self._usage_lock:
+                pending = self._pending_usage.setdefault((template_id, template.user_id), [0, 0])
+                pending[0] += 1
+                pending[1] += 1 if completed else 0
+    
+    def flush_usage(self) -> int:
+        """Persist buffered usage as atomic increments in one statement
+        
+        Counters are upserted with usage_count = usage_count + n and
+        completed_count = completed_count + c; the average completion rate
+        is derived from those sums, so concurrent flushes from several
+        workers never lose updates. The persisted totals are copied onto the
+        in-memory templates and the usage generation is bumped so cached
+        responses are re-serialized; listing order is left to the next
+        usage reload, and other workers pick the counters up when they
+        reload.
+        """
+        
+        with self._usage_lock:
+            pending, self._pending_usage = self._pending_usage, {}
+        
+        if not pending:
+            return 0
+        
+        db = self.session_factory()
+        try:
+            insert_stmt = get_upsert_insert(db.get_bind().dialect.name)(TemplateUsage).values([
+                {"template_id": template_id, "usage_count": uses, "completed_count": completed}
+                for (template_id, _), (uses, completed) in pending.items()
+            ])
+            totals = {
+                row.template_id: row for row in db.execute(
+                    insert_stmt.on_conflict_do_update(
+                        index_elements=[TemplateUsage.template_id],
+                        set_={
+                            "usage_count": TemplateUsage.usage_count + insert_stmt.excluded.usage_count,
+                            "completed_count": TemplateUsage.completed_count + insert_stmt.excluded.completed_count,
+                            "updated_at": datetime.utcnow()
+                        }
+                    ).returning(
+                        TemplateUsage.template_id,
+                        TemplateUsage.usage_count,
+                        TemplateUsage.completed_count
+                    )
+                )
+            }
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Failed to flush template usage, will retry: {e}")
+            self._requeue_usage(pending)
+            return 0
+        finally:
+            db.close()
+        
+        # Refresh in-memory counters in place from the persisted totals
+        for template_id, owner_id in pending:
+            template = self.get_template_by_id(template_id, owner_id)
+            if template is not None and template_id in totals:
+                self._apply_usage(template, totals[template_id])
+        with self._lock:
+            self.usage_generation += 1
+        
+        logger.debug(f"Flushed usage for {len(pending)} templates")
+        return len(pending)
+    
+    def _requeue_usage(self, pending: Dict[tuple, List[int]]):
+        """Merge unflushed usage back into the buffer"""
+        with self._usage_lock:
+            for key, (uses, completed) in pending.items():
+                current = self._pending_usage.setdefault(key, [0, 0])
+                current[0] += uses
+                current[1] += completed
+    
+    async def run_usage_flusher(self, interval_seconds: float):
+        """Flush buffered usage periodically until cancelled"""
+        try:
+            while True:
+                await asyncio.sleep(interval_seconds)
+                await asyncio.to_thread(self.flush_usage)
+        finally:
+            await asyncio.to_thread(self.flush_usage)
+    
+    @staticmethod
+    def _apply_usage(template: SessionTemplate, usage):
+        """Copy persisted usage counters onto a template"""
+        template.usage_count = usage.usage_count
+        template.average_completion_rate = (
+            usage.completed_count / usage.usage_count if usage.usage_count else 0.0
+        )
     
     def get_recommended_templates(self, user_id: str, 
                                 db: Session,
                                 count: int = 5) -> List[SessionTemplate]:
-        """Get personalized template recommendations"""
+        """Get personalized template recommendations
         
-        # Analyze user's session history
-        from ..services.analytics_service import SessionAnalytics
+        Rankings are cached per user and reused until the user's analytics
+        or own templates change. System template popularity moves with
+        every usage flush, so instead of invalidating on it the cached
+        ranking is re-scored from the cached profile once it is older than
+        recommendation_popularity_refresh_seconds.
+        """
         
         try:
-            user_stats = SessionAnalytics.calculate_user_stats(db, user_id, 30)
-            type_performance = SessionAnalytics.calculate_session_type_performance(db, user_id, 30)
+            index = self._get_user_index(user_id)
+            version = (analytics_versions.get(user_id), index.generation, index.version)
             
-            # Get all available templates
-            all_templates = self.get_templates_for_user(user_id)
+            cached = self._recommendations.get(user_id)
+            if cached is not None and cached[0] == version and cached[1] >= count:
+                _, depth, recommendations, profile, scored_at = cached
+                if time.monotonic() - scored_at < settings.recommendation_popularity_refresh_seconds:
+                    return recommendations[:count]
+            else:
+                # Analyze user's session history
+                depth = max(count, self.RECOMMENDATION_CACHE_DEPTH)
+                profile = SessionAnalytics.calculate_recommendation_profile(db, user_id, 30)
             
-            # Score templates based on user patterns
-            scored_templates = []
-            for template in all_templates:
-                score = self._calculate_template_score(template, user_stats, type_performance)
-                scored_templates.append((template, score))
+            # Score all templates at once and keep the top ones
+            all_templates = self.get_templates_for_user(user_id)
+            scores = self._score_templates(all_templates, profile)
+            top = heapq.nlargest(depth, range(len(all_templates)), key=scores.__getitem__)
+            recommendations = [all_templates[i] for i in top]
             
-            # Sort by score and return top recommendations
-            scored_templates.sort(key=lambda x: x[1], reverse=True)
-            return [template for template, score in scored_templates[:count]]
+            self._recommendations.set(user_id, (version, depth, recommendations, profile, time.monotonic()))
+            return recommendations[:count]
             
         except Exception as e:
             logger.error(f"Failed to get recommendations for user {user_id}: {e}")
@@ -508,58 +904,142 @@ class TemplateService:
             return sorted(self.system_templates, 
                         key=lambda t: t.usage_count, reverse=True)[:count]
     
-    def _calculate_template_score(self, template: SessionTemplate, 
-                                user_stats: Dict[str, Any],
-                                type_performance: Dict[str, Any]) -> float:
-        """Calculate recommendation score for a template"""
+    @staticmethod
+    def _score_templates(templates: List[SessionTemplate],
+                         profile: Dict[str, Any]) -> List[float]:
+        """Calculate recommendation scores for a list of templates
         
-        score = 0.0
+        The user-dependent terms only depend on session type and duration,
+        so they are computed once per distinct value rather than per template.
+        """
         
-        # Base score from template's success rate
-        score += template.average_completion_rate * 0.3
+        type_rates = profile["type_completion_rates"]
+        avg_user_duration = profile["average_planned_duration"]
         
         # Bonus for user's successful session types
-        template_type = template.session_type
-        if template_type in type_performance:
-            user_success_rate = type_performance[template_type].get("completion_rate", 0)
-            score += user_success_rate * 0.4
+        type_scores = {
+            session_type: type_rates.get(session_type, 0) * 0.4
+            for session_type in {t.session_type for t in templates}
+        }
         
-        # Duration preference matching
-        avg_user_duration = user_stats.get("average_planned_duration", 30)
-        duration_diff = abs(template.duration_minutes - avg_user_duration)
-        duration_score = max(0, 1.0 - (duration_diff / 60))  # Penalize large differences
-        score += duration_score * 0.2
+        # Duration preference matching, penalizing large differences
+        duration_scores = {
+            duration: max(0, 1.0 - (abs(duration - avg_user_duration) / 60)) * 0.2
+            for duration in {t.duration_minutes for t in templates}
+        }
         
-        # Popularity bonus
-        score += min(template.usage_count / 100, 0.1)  # Max 0.1 bonus for popular templates
-        
-        return score
+        return [
+            # Template's own success rate plus popularity bonus (max 0.1)
+            t.average_completion_rate * 0.3
+            + type_scores[t.session_type]
+            + duration_scores[t.duration_minutes]
+            + min(t.usage_count / 100, 0.1)
+            for t in templates
+        ]
     
     def get_presets_for_user(self, user_id: str) -> List[ProductivityPreset]:
         """Get productivity presets available to a user"""
         
         presets = list(self.system_presets)  # System presets
-        user_presets = self.user_presets.get(user_id, [])
-        presets.extend(user_presets)  # User's custom presets
+        presets.extend(self._get_user_index(user_id).presets_by_id.values())  # User's custom presets
         
         return presets
     
     def get_preset_by_id(self, preset_id: str, user_id: Optional[str] = None) -> Optional[ProductivityPreset]:
         """Get a specific preset by ID"""
         
-        # Check system presets
-        for preset in self.system_presets:
-            if preset.id == preset_id:
-                return preset
+        preset = self._system_presets_by_id.get(preset_id)
+        if preset is not None:
+            return preset
         
-        # Check user presets
         if user_id:
-            user_presets = self.user_presets.get(user_id, [])
-            for preset in user_presets:
-                if preset.id == preset_id:
-                    return preset
+            return self._get_user_index(user_id).presets_by_id.get(preset_id)
         
         return None
+    
+    _UPDATABLE_FIELDS = {
+        "name", "description", "category", "difficulty", "duration_minutes",
+        "break_duration_minutes", "allow_interruptions", "auto_start_breaks",
+        "reminder_intervals", "focus_music_enabled", "distraction_blocking",
+        "productivity_tracking", "background_theme", "notification_sound",
+        "completion_reward", "tags", "is_favorite"
+    }
+    
+    @staticmethod
+    def _template_to_row_values(template: SessionTemplate) -> Dict[str, Any]:
+        return {
+            "id": template.id,
+            "user_id": template.user_id,
+            "name": template.name,
+            "description": template.description,
+            "category": template.category.value,
+            "difficulty": template.difficulty.value,
+            "session_type": template.session_type,
+            "duration_minutes": template.duration_minutes,
+            "break_duration_minutes": template.break_duration_minutes,
+            "allow_interruptions": template.allow_interruptions,
+            "auto_start_breaks": template.auto_start_breaks,
+            "reminder_intervals": template.reminder_intervals,
+            "focus_music_enabled": template.focus_music_enabled,
+            "distraction_blocking": template.distraction_blocking,
+            "productivity_tracking": template.productivity_tracking,
+            "background_theme": template.background_theme,
+            "notification_sound": template.notification_sound,
+            "completion_reward": template.completion_reward,
+            "tags": template.tags,
+            "is_favorite": template.is_favorite,
+            "created_at": template.created_at,
+            "updated_at": template.updated_at
+        }
+    
+    @staticmethod
+    def _template_from_row(row: StoredTemplate, usage: Optional[TemplateUsage]) -> SessionTemplate:
+        template = SessionTemplate(
+            id=row.id,
+            user_id=row.user_id,
+            name=row.name,
+            description=row.description or "",
+            category=TemplateCategory(row.category),
+            difficulty=DifficultyLevel(row.difficulty),
+            session_type=row.session_type,
+            duration_minutes=row.duration_minutes,
+            break_duration_minutes=row.break_duration_minutes,
+            allow_interruptions=row.allow_interruptions,
+            auto_start_breaks=row.auto_start_breaks,
+            reminder_intervals=row.reminder_intervals,
+            focus_music_enabled=row.focus_music_enabled,
+            distraction_blocking=row.distraction_blocking,
+            productivity_tracking=row.productivity_tracking,
+            background_theme=row.background_theme,
+            notification_sound=row.notification_sound,
+            completion_reward=row.completion_reward,
+            tags=row.tags,
+            is_favorite=row.is_favorite,
+            created_at=row.created_at,
+            updated_at=row.updated_at
+        )
+        if usage is not None:
+            TemplateService._apply_usage(template, usage)
+        return template
+    
+    @staticmethod
+    def _preset_from_row(row: StoredPreset) -> ProductivityPreset:
+        return ProductivityPreset(
+            id=row.id,
+            name=row.name,
+            description=row.description or "",
+            templates=row.templates,
+            daily_goal_sessions=row.daily_goal_sessions,
+            daily_goal_minutes=row.daily_goal_minutes,
+            weekly_goal_sessions=row.weekly_goal_sessions,
+            weekly_goal_minutes=row.weekly_goal_minutes,
+            suggested_start_times=row.suggested_start_times or [],
+            suggested_days=row.suggested_days or [],
+            includes_breaks=row.includes_breaks,
+            adaptive_difficulty=row.adaptive_difficulty,
+            progress_tracking=row.progress_tracking,
+            created_at=row.created_at
+        )
 
 
 # Global template service instance
@@ -0,0 +1,89 @@
+"""
+Focus Engine test fixtures
+Runs the service against a throwaway SQLite database with Redis unreachable
+"""
+
+import os
+import sys
+import tempfile
+
+import pytest
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.dirname(SERVICE_DIR), SERVICE_DIR]
+
+_database_dir = tempfile.mkdtemp(prefix="focus_engine_tests_")
+os.environ.setdefault("FOCUS_FLOW_DATABASE_URL", f"sqlite:///{_database_dir}/focus_engine.db")
+os.environ.setdefault("FOCUS_FLOW_REDIS_URL", "redis://127.0.0.1:1/0")
+os.environ.setdefault("FOCUS_FLOW_DEBUG_MODE", "false")
+
+from httpx import AsyncClient  # noqa: E402
+
+from database.connection import Base, engine  # noqa: E402
+from focus_engine.main import app  # noqa: E402
+from focus_engine.routers.templates import _response_cache  # noqa: E402
+from focus_engine.services.notification_service import notification_service  # noqa: E402
+from focus_engine.services.session_service import session_cache  # noqa: E402
+from focus_engine.services.template_service import template_service  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def database():
+    """Fresh schema and empty caches for every test"""
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    session_cache.clear()
+    notification_service.preferences_cache.clear()
+    template_service._user_indexes.clear()
+    _response_cache.clear()
+    yield engine
+
+
+class LegacyDatabase:
+    """A SQLite file holding focus_sessions as it was before the migrations, with an Alembic config for it"""
+
+    def __init__(self, directory):
+        from alembic.config import Config
+        from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, create_engine
+
+        self.url = f"sqlite:///{directory}/legacy.db"
+        self.engine = create_engine(self.url)
+        self.focus_sessions = Table(
+            "focus_sessions", MetaData(),
+            Column("id", Integer, primary_key=True),
+            Column("user_id", String(255)),
+            Column("start_time", DateTime, nullable=False),
+            Column("end_time", DateTime),
+            Column("planned_duration", Integer),
+            Column("interruptions", Integer)
+        )
+        self.focus_sessions.create(self.engine)
+
+        self.config = Config(os.path.join(SERVICE_DIR, "alembic.ini"))
+        self.config.set_main_option("script_location", os.path.join(SERVICE_DIR, "migrations"))
+        self.config.set_main_option("sqlalchemy.url", self.url)
+
+    def upgrade(self, revision: str = "head"):
+        from alembic import command
+        command.upgrade(self.config, revision)
+
+    def downgrade(self, revision: str):
+        from alembic import command
+        command.downgrade(self.config, revision)
+
+    def indexes(self, table: str = "focus_sessions") -> set:
+        from sqlalchemy import inspect
+        return {index["name"] for index in inspect(self.engine).get_indexes(table)}
+
+
+@pytest.fixture
+def legacy_database(tmp_path):
+    database = LegacyDatabase(tmp_path)
+    yield database
+    database.engine.dispose()
+
+
+@pytest.fixture
+async def client():
+    async with AsyncClient(app=app, base_url="http://test") as http:
+        yield http
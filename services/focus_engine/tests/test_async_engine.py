@@ -0,0 +1,63 @@
+"""
+Tests for the asyncio database path and non-blocking cache invalidation
+"""
+
+import asyncio
+import time
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.connection import get_async_database_url
+from focus_engine.database.connection import get_async_db
+from focus_engine.utils.cache import CacheInvalidationBus
+
+
+def test_async_database_url_maps_drivers():
+    assert get_async_database_url("postgresql://u:p@db:5432/focus") == "postgresql+asyncpg://u:p@db:5432/focus"
+    assert get_async_database_url("sqlite:////tmp/focus.db") == "sqlite+aiosqlite:////tmp/focus.db"
+
+
+async def test_async_db_dependency_yields_async_session():
+    async for db in get_async_db():
+        assert isinstance(db, AsyncSession)
+
+
+async def test_sync_routes_resolve_get_db(client):
+    response = await client.get("/api/v1/analytics/users/alice/stats", params={"days": 7})
+    assert response.status_code == 200
+
+
+class _SlowRedis:
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.published = []
+
+    def publish(self, channel, message):
+        time.sleep(self.delay)
+        self.published.append(message)
+
+
+async def test_publish_does_not_block_event_loop():
+    bus = CacheInvalidationBus("redis://127.0.0.1:1/0", "test")
+    bus._client = _SlowRedis(delay=0.3)
+
+    started = time.perf_counter()
+    bus.publish("sessions", "1")
+    assert time.perf_counter() - started < 0.1
+
+    await asyncio.sleep(0.5)
+    assert len(bus._client.published) == 1
+
+
+def test_publish_outside_event_loop_is_synchronous():
+    bus = CacheInvalidationBus("redis://127.0.0.1:1/0", "test")
+    bus._client = _SlowRedis(delay=0)
+
+    bus.publish("sessions", "1")
+    assert len(bus._client.published) == 1
+
+
+async def test_publish_survives_unreachable_redis():
+    bus = CacheInvalidationBus("redis://127.0.0.1:1/0", "test")
+    bus.publish("sessions", "1")
+    await asyncio.sleep(0.1)
@@ -0,0 +1,146 @@
+"""
+Tests for quality scoring over a single stream of the window
+"""
+
+from datetime import datetime, timedelta
+
+from focus_engine.database.connection import SessionLocal
+from focus_engine.database.session_repository import SessionRepository
+from focus_engine.models.session_models import FocusSession
+from focus_engine.services.analytics_service import time_series_store
+from focus_engine.services.focus_scoring_service import FocusQualityScorer
+
+
+def seed(user_id: str = "alice"):
+    now = datetime.utcnow()
+    db = SessionLocal()
+    try:
+        for day in range(60):
+            start = now - timedelta(days=day, hours=1)
+            completed = day % 3 != 0
+            db.add(FocusSession(
+                user_id=user_id,
+                session_type=("deep_work", "pomodoro")[day % 2],
+                status="completed" if completed else "cancelled",
+                planned_duration=50,
+                actual_duration=45 if completed else 15,
+                interruption_count=day % 4,
+                productivity_score=6.0 + day % 4,
+                start_time=start,
+                start_date=start.date(),
+                start_hour=start.hour,
+                end_time=start + timedelta(minutes=45)
+            ))
+        db.commit()
+    finally:
+        db.close()
+
+
+def count_streams(monkeypatch):
+    calls = []
+    stream_records = SessionRepository.stream_records
+
+    def counting(*args, **kwargs):
+        calls.append(args)
+        return stream_records(*args, **kwargs)
+
+    monkeypatch.setattr(SessionRepository, "stream_records", staticmethod(counting))
+    return calls
+
+
+def test_scores_match_per_session_scoring_with_full_context():
+    seed()
+    db = SessionLocal()
+    try:
+        window = SessionRepository.user_window("alice", datetime.utcnow() - timedelta(days=30), datetime.utcnow())
+        records = list(SessionRepository.stream_records(db, *window))
+        context = FocusQualityScorer._build_user_context(records)
+        expected = {
+            str(record.id): FocusQualityScorer.calculate_session_quality_score(record, context)
+            for record in records
+        }
+
+        assert FocusQualityScorer.calculate_batch_quality_scores(db, "alice", 30) == expected
+    finally:
+        db.close()
+
+
+def test_insights_stream_the_window_once_and_fill_the_series_cache(monkeypatch):
+    seed()
+    time_series_store._series.clear()
+    calls = count_streams(monkeypatch)
+    db = SessionLocal()
+    try:
+        insights = FocusQualityScorer.get_quality_insights(db, "alice", 30)
+        assert len(calls) == 1
+        assert insights["total_sessions_analyzed"] == 30
+        assert insights["factor_analysis"]["total_sessions"] == 30
+
+        series = time_series_store.get(db, "alice")
+        assert len(calls) == 1
+        assert series.window(90)["total_sessions"] == 60
+
+        time_series_store._series.clear()
+        assert time_series_store.get(db, "alice").snapshot() == series.snapshot()
+    finally:
+        db.close()
+
+
+def test_insights_reuse_a_current_series(monkeypatch):
+    seed()
+    db = SessionLocal()
+    try:
+        time_series_store._series.clear()
+        time_series_store.get(db, "alice")
+        calls = count_streams(monkeypatch)
+
+        insights = FocusQualityScorer.get_quality_insights(db, "alice", 7)
+
+        # Only the 7-day scoring window is read, not the series' 90 days
+        [(_, _, window_start, _)] = calls
+        assert window_start.right.value > datetime.utcnow() - timedelta(days=8)
+        assert insights["total_sessions_analyzed"] == 7
+    finally:
+        db.close()
+
+
+def test_no_sessions_in_window():
+    db = SessionLocal()
+    try:
+        assert FocusQualityScorer.get_quality_insights(db, "nobody", 30) == {"message": "No sessions found for analysis"}
+    finally:
+        db.close()
+
+
+def test_quality_updates_are_written_in_chunks(monkeypatch):
+    seed()
+    monkeypatch.setattr(FocusQualityScorer, "QUALITY_UPDATE_CHUNK", 4)
+    db = SessionLocal()
+    try:
+        scores = FocusQualityScorer.calculate_batch_quality_scores(db, "alice", 30)
+        stored = dict(db.query(FocusSession.id, FocusSession.focus_quality).filter(
+            FocusSession.id.in_([int(session_id) for session_id in scores])
+        ))
+    finally:
+        db.close()
+
+    assert {str(session_id): quality for session_id, quality in stored.items()} == {
+        session_id: FocusQualityScorer._categorize_quality(score) for session_id, score in scores.items()
+    }
+
+
+def test_insights_distribution_matches_the_batch_scores():
+    seed()
+    db = SessionLocal()
+    try:
+        scores = FocusQualityScorer.calculate_batch_quality_scores(db, "alice", 30)
+        insights = FocusQualityScorer.get_quality_insights(db, "alice", 30)
+    finally:
+        db.close()
+
+    distribution = insights["quality_distribution"]
+    categories = [FocusQualityScorer._categorize_quality(score) for score in scores.values()]
+    assert [distribution[f"{name}_quality_sessions"] for name in ("high", "medium", "low")] == [
+        categories.count(name) for name in ("high", "medium", "low")
+    ]
+    assert insights["average_quality_score"] == round(sum(scores.values()) / len(scores), 2)
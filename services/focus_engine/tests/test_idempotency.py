@@ -0,0 +1,140 @@
+"""
+Tests for Idempotency-Key replays on session mutations
+"""
+
+import asyncio
+import json
+import uuid
+
+import pytest
+
+from focus_engine.utils.idempotency import IdempotencyKeyReusedError, IdempotencyStore
+
+
+class FakeRedis:
+    """Just enough of redis.asyncio for the idempotency store, shared between workers"""
+
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, nx=False, px=None, ex=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value.encode() if isinstance(value, str) else value
+        return True
+
+    async def delete(self, key):
+        self.data.pop(key, None)
+
+
+def redis_workers(count: int, redis: FakeRedis):
+    workers = []
+    for _ in range(count):
+        store = IdempotencyStore(backend="redis", redis_url="redis://fake", poll_interval_seconds=0.01)
+        store._client = redis
+        workers.append(store)
+    return workers
+
+
+async def test_retry_is_replayed_without_rerunning_handler():
+    store = IdempotencyStore()
+    calls = []
+
+    async def handler():
+        calls.append(1)
+        return {"id": 1}
+
+    assert await store.run("start", "key", "body", handler) == ({"id": 1}, False)
+    assert await store.run("start", "key", "body", handler) == ({"id": 1}, True)
+    assert len(calls) == 1
+
+
+async def test_reused_key_with_other_payload_is_rejected():
+    store = IdempotencyStore()
+
+    async def handler():
+        return {"id": 1}
+
+    await store.run("start", "key", "body", handler)
+    with pytest.raises(IdempotencyKeyReusedError):
+        await store.run("start", "key", "other body", handler)
+
+
+async def test_concurrent_duplicates_in_one_worker_wait_for_the_first():
+    store = IdempotencyStore()
+    calls = []
+
+    async def handler():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"id": 1}
+
+    results = await asyncio.gather(*(store.run("start", "key", "body", handler) for _ in range(5)))
+
+    assert len(calls) == 1
+    assert sorted(replayed for _, replayed in results) == [False, True, True, True, True]
+
+
+async def test_concurrent_duplicates_across_workers_run_once():
+    redis = FakeRedis()
+    calls = []
+
+    async def handler():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"id": 1}
+
+    results = await asyncio.gather(*(
+        worker.run("start", "key", "body", handler) for worker in redis_workers(3, redis)
+    ))
+
+    assert len(calls) == 1
+    assert [body for body, _ in results] == [{"id": 1}] * 3
+    assert not json.loads(redis.data["start:key"]).get("pending")
+
+
+async def test_failed_request_releases_claim_for_retry():
+    redis = FakeRedis()
+    first, second = redis_workers(2, redis)
+
+    async def failing():
+        raise RuntimeError("database unavailable")
+
+    async def succeeding():
+        return {"id": 2}
+
+    with pytest.raises(RuntimeError):
+        await first.run("start", "key", "body", failing)
+
+    assert "start:key" not in redis.data
+    assert await second.run("start", "key", "body", succeeding) == ({"id": 2}, False)
+
+
+async def test_retried_start_is_replayed_over_http(client):
+    key = str(uuid.uuid4())
+    payload = {"user_id": "alice", "planned_duration": 25}
+
+    first = await client.post("/api/v1/sessions/sessions/", json=payload, headers={"Idempotency-Key": key})
+    retry = await client.post("/api/v1/sessions/sessions/", json=payload, headers={"Idempotency-Key": key})
+
+    assert first.status_code == 201
+    assert retry.status_code == 201
+    assert retry.json() == first.json()
+    assert retry.headers["Idempotency-Replayed"] == "true"
+
+
+async def test_retried_complete_is_replayed_over_http(client):
+    session_id = (await client.post(
+        "/api/v1/sessions/sessions/", json={"user_id": "alice", "planned_duration": 25}
+    )).json()["id"]
+    key = str(uuid.uuid4())
+
+    first = await client.post(f"/api/v1/sessions/sessions/{session_id}/complete", headers={"Idempotency-Key": key})
+    retry = await client.post(f"/api/v1/sessions/sessions/{session_id}/complete", headers={"Idempotency-Key": key})
+
+    assert first.status_code == 200
+    assert retry.status_code == 200
+    assert retry.json()["status"] == "completed"
@@ -0,0 +1,179 @@
+"""
+Tests for the background notification jobs started by the app lifespan
+"""
+
+from datetime import datetime, timedelta
+import asyncio
+import threading
+
+from focus_engine import main
+from focus_engine.database.connection import SessionLocal
+from focus_engine.models.session_models import FocusSession
+from focus_engine.services.notification_service import (
+    NotificationChannel, NotificationMessage, NotificationPriority, NotificationService, NotificationType,
+    SmartReminderService
+)
+from focus_engine.utils.idempotency import IdempotencyStore
+
+_real_sleep = asyncio.sleep
+
+
+async def fast_sleep(seconds):
+    """Skip the wait until the next nightly run"""
+    await _real_sleep(0)
+
+
+class RecordingChannel(NotificationChannel):
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, notification) -> bool:
+        self.sent.append(notification.id)
+        return True
+
+
+def seed_sessions(user_id: str, hours_and_scores):
+    db = SessionLocal()
+    try:
+        for day in range(1, 4):
+            for hour, score in hours_and_scores:
+                start = datetime.utcnow().replace(hour=hour, minute=0, second=0, microsecond=0) - timedelta(days=day)
+                db.add(FocusSession(
+                    user_id=user_id,
+                    session_type="pomodoro",
+                    status="completed",
+                    planned_duration=25,
+                    start_time=start,
+                    start_date=start.date(),
+                    start_hour=start.hour,
+                    productivity_score=score
+                ))
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_optimal_time_buckets_pick_next_peak_hour():
+    seed_sessions("alice", [(8, 5.0), (14, 9.0), (20, 7.0)])
+    service = SmartReminderService(NotificationService())
+    now = datetime.utcnow().replace(hour=10, minute=30, second=0, microsecond=0)
+
+    buckets, users_seen = service._optimal_time_buckets(None, now, 30, 3, 100)
+
+    assert users_seen == 1
+    [(minute, [reminder])] = buckets.items()
+    assert minute == now.replace(hour=13, minute=50)
+    assert reminder.data["optimal_hour"] == 14
+
+
+async def test_optimal_time_query_runs_off_the_event_loop(monkeypatch):
+    service = SmartReminderService(NotificationService())
+    loop_thread = threading.get_ident()
+    query_threads = []
+
+    def fake_buckets(db, now, days, top_hours, chunk_size):
+        query_threads.append(threading.get_ident())
+        return {}, 0
+
+    monkeypatch.setattr(service, "_optimal_time_buckets", fake_buckets)
+    result = await service.schedule_optimal_time_reminders()
+
+    assert result["reminders_scheduled"] == 0
+    assert query_threads and query_threads[0] != loop_thread
+
+
+async def test_scheduler_sends_due_notifications():
+    service = NotificationService()
+    channel = RecordingChannel()
+    service.channels = {"websocket": channel}
+
+    notification = NotificationMessage(
+        id="reminder-1",
+        user_id="alice",
+        type=NotificationType.SESSION_REMINDER,
+        priority=NotificationPriority.MEDIUM,
+        title="Reminder",
+        message="Time to focus",
+        scheduled_time=datetime.utcnow() - timedelta(minutes=1)
+    )
+    service.schedule_notifications([notification])
+
+    scheduler = asyncio.create_task(service.run_scheduler(0.01))
+    try:
+        for _ in range(200):
+            if channel.sent:
+                break
+            await asyncio.sleep(0.01)
+    finally:
+        scheduler.cancel()
+
+    assert channel.sent == [notification.id]
+    assert service.pending_count == 0
+
+
+async def test_lifespan_starts_and_stops_notification_jobs(monkeypatch):
+    running = {}
+
+    def job(name):
+        async def run(*args):
+            running[name] = True
+            try:
+                await asyncio.Event().wait()
+            finally:
+                running[name] = False
+        return run
+
+    monkeypatch.setattr(main.notification_service, "run_scheduler", job("scheduler"))
+    monkeypatch.setattr(main.smart_reminder_service, "run_nightly_reminders", job("nightly"))
+    monkeypatch.setattr(main.template_service, "run_usage_flusher", job("flusher"))
+
+    async with main.lifespan(main.app):
+        await asyncio.sleep(0)
+        assert running == {"scheduler": True, "nightly": True, "flusher": True}
+
+    assert running == {"scheduler": False, "nightly": False, "flusher": False}
+
+
+async def test_claim_once_elects_a_single_runner(monkeypatch):
+    store = IdempotencyStore(backend="redis", redis_url="redis://unused")
+    claimed = {}
+
+    class FakeRedis:
+        async def set(self, key, value, nx=False, px=None):
+            assert nx and px == 60000
+            return claimed.setdefault(key, value) is value
+
+    monkeypatch.setattr(store, "_get_client", lambda: FakeRedis())
+
+    assert await store.claim_once("nightly", "2026-03-02", 60)
+    assert not await store.claim_once("nightly", "2026-03-02", 60)
+    assert await store.claim_once("nightly", "2026-03-03", 60)
+
+
+async def test_claim_once_skips_the_run_when_redis_is_down():
+    store = IdempotencyStore(backend="redis", redis_url="redis://127.0.0.1:1/0")
+
+    assert not await store.claim_once("nightly", "2026-03-02", 60)
+    await store.close()
+
+
+async def test_nightly_reminders_run_once_across_workers(monkeypatch):
+    store = IdempotencyStore()
+    monkeypatch.setattr("focus_engine.services.notification_service.idempotency_store", store)
+    monkeypatch.setattr("focus_engine.services.notification_service.asyncio.sleep", fast_sleep)
+    runs = []
+
+    workers = [SmartReminderService(NotificationService()) for _ in range(3)]
+    for worker in workers:
+        async def run(worker=worker):
+            runs.append(worker)
+            return {}
+        monkeypatch.setattr(worker, "schedule_optimal_time_reminders", run)
+
+    tasks = [asyncio.create_task(worker.run_nightly_reminders(0)) for worker in workers]
+    await _real_sleep(0.05)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    assert len(runs) == 1
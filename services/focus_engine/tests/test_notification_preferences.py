@@ -0,0 +1,137 @@
+"""
+Tests for the persistent, cached notification preferences
+"""
+
+import json
+
+from focus_engine.models.session_models import User
+from focus_engine.services.notification_service import (
+    DEFAULT_NOTIFICATION_PREFERENCES, NotificationMessage, NotificationPriority, NotificationService, NotificationType,
+    notification_service
+)
+from focus_engine.utils.cache import invalidation_bus
+from database.connection import SessionLocal
+
+
+class CountingSessions:
+    """Session factory that counts how often the database is opened"""
+
+    def __init__(self):
+        self.opened = 0
+
+    def __call__(self):
+        self.opened += 1
+        return SessionLocal()
+
+
+def add_users(*usernames: str):
+    db = SessionLocal()
+    try:
+        db.add_all(User(username=username) for username in usernames)
+        db.commit()
+    finally:
+        db.close()
+
+
+def notification(user_id: str, type: NotificationType = NotificationType.SESSION_REMINDER) -> NotificationMessage:
+    return NotificationMessage(
+        id=f"{user_id}-{type.value}",
+        user_id=user_id,
+        type=type,
+        priority=NotificationPriority.MEDIUM,
+        title="Reminder",
+        message="Time to focus"
+    )
+
+
+def test_preferences_persist_across_workers():
+    add_users("alice")
+    assert NotificationService().set_user_preferences("alice", {"disabled_types": ["session_reminder"]})
+
+    other_worker = NotificationService()
+    preferences = other_worker.get_user_preferences("alice")
+
+    assert preferences["disabled_types"] == ["session_reminder"]
+    assert preferences["channels"] == DEFAULT_NOTIFICATION_PREFERENCES["channels"]
+    db = SessionLocal()
+    try:
+        assert db.query(User.notification_preferences).filter(User.username == "alice").scalar() == {
+            "disabled_types": ["session_reminder"]
+        }
+    finally:
+        db.close()
+
+
+def test_updates_write_through_an_existing_user():
+    add_users("alice")
+    service = NotificationService()
+    service.set_user_preferences("alice", {"channels": ["email"]})
+    service.set_user_preferences("alice", {"channels": ["push"]})
+
+    assert service.preferences_cache.get("alice")["channels"] == ["push"]
+    assert NotificationService().get_user_preferences("alice")["channels"] == ["push"]
+
+
+def test_unknown_users_are_not_created():
+    service = NotificationService()
+
+    assert not service.set_user_preferences("mallory", {"channels": ["email"]})
+    assert "mallory" not in service.preferences_cache
+    db = SessionLocal()
+    try:
+        assert db.query(User).count() == 0
+    finally:
+        db.close()
+
+
+def test_reads_are_served_from_the_cache():
+    sessions = CountingSessions()
+    service = NotificationService(session_factory=sessions)
+
+    service.get_user_preferences("alice")
+    service.get_user_preferences("alice")
+
+    assert sessions.opened == 1
+
+
+async def test_scheduled_sends_use_one_prefetch_query():
+    sessions = CountingSessions()
+    service = NotificationService(session_factory=sessions)
+    add_users("bob")
+    NotificationService().set_user_preferences("bob", {"disabled_types": ["session_reminder"]})
+
+    assert service.prefetch_user_preferences(["alice", "bob", "carol"]) == 3
+    assert sessions.opened == 1
+    assert service.prefetch_user_preferences(["alice", "bob"]) == 0
+
+    assert await service._send_notification(notification("alice"))
+    assert not await service._send_notification(notification("bob"))
+    assert sessions.opened == 1
+
+
+def test_invalidations_from_other_workers_drop_the_cached_entry():
+    service = notification_service
+    service.get_user_preferences("alice")
+
+    invalidation_bus._on_message({"data": json.dumps({
+        "namespace": NotificationService.PREFERENCES_CACHE_NAMESPACE,
+        "key": "alice",
+        "origin": invalidation_bus.worker_id
+    })})
+    assert "alice" in service.preferences_cache
+
+    invalidation_bus._on_message({"data": json.dumps({
+        "namespace": NotificationService.PREFERENCES_CACHE_NAMESPACE,
+        "key": "alice",
+        "origin": "another-worker"
+    })})
+    assert "alice" not in service.preferences_cache
+
+
+def test_only_the_shared_service_listens_for_invalidations():
+    handlers = invalidation_bus._handlers[NotificationService.PREFERENCES_CACHE_NAMESPACE]
+    before = len(handlers)
+
+    NotificationService()
+
+    assert len(handlers) == before == 1
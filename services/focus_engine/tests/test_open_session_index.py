@@ -0,0 +1,80 @@
+"""
+Tests for the one-open-session-per-user index and its migration
+"""
+
+from datetime import datetime
+
+from sqlalchemy import inspect, text
+
+from focus_engine.services.session_service import _constraint_name
+
+
+async def test_second_start_conflicts(client):
+    payload = {"user_id": "alice", "planned_duration": 25}
+
+    assert (await client.post("/api/v1/sessions/sessions/", json=payload)).status_code == 201
+    response = await client.post("/api/v1/sessions/sessions/", json=payload)
+
+    assert response.status_code == 409
+
+
+async def test_start_after_completion_succeeds(client):
+    payload = {"user_id": "alice", "planned_duration": 25}
+    session_id = (await client.post("/api/v1/sessions/sessions/", json=payload)).json()["id"]
+    await client.post(f"/api/v1/sessions/sessions/{session_id}/complete")
+
+    assert (await client.post("/api/v1/sessions/sessions/", json=payload)).status_code == 201
+
+
+def test_constraint_name_from_driver_diagnostics():
+    class Diag:
+        constraint_name = "uq_focus_sessions_user_open"
+
+    class PsycopgError(Exception):
+        diag = Diag()
+
+    class AsyncpgError(Exception):
+        constraint_name = "focus_sessions_pkey"
+
+    class Wrapped:
+        def __init__(self, orig):
+            self.orig = orig
+
+    adapted = Exception()
+    adapted.__cause__ = AsyncpgError()
+
+    assert _constraint_name(Wrapped(PsycopgError())) == "uq_focus_sessions_user_open"
+    assert _constraint_name(Wrapped(adapted)) == "focus_sessions_pkey"
+    assert _constraint_name(Wrapped(Exception("UNIQUE constraint failed: focus_sessions.user_id"))) is None
+
+
+def test_migration_backfills_legacy_rows(legacy_database):
+    with legacy_database.engine.begin() as connection:
+        connection.execute(legacy_database.focus_sessions.insert(), [
+            {"user_id": "alice", "start_time": datetime(2026, 3, 2, 9, 30), "end_time": datetime(2026, 3, 2, 10, 0),
+             "planned_duration": 30, "interruptions": 2},
+            {"user_id": "alice", "start_time": datetime(2026, 3, 3, 22, 5), "end_time": None,
+             "planned_duration": 50, "interruptions": None},
+            {"user_id": "alice", "start_time": datetime(2026, 3, 4, 7, 0), "end_time": None,
+             "planned_duration": 25, "interruptions": 0}
+        ])
+
+    legacy_database.upgrade("0001")
+
+    with legacy_database.engine.connect() as connection:
+        rows = connection.execute(text(
+            "SELECT status, interruption_count, planned_end_time FROM focus_sessions ORDER BY id"
+        )).all()
+
+    assert [tuple(row[:2]) for row in rows] == [("completed", 2), ("cancelled", 0), ("cancelled", 0)]
+    assert rows[0].planned_end_time.startswith("2026-03-02 10:00")
+
+    columns = {column["name"]: column for column in inspect(legacy_database.engine).get_columns("focus_sessions")}
+    assert not columns["status"]["nullable"]
+    assert "start_date" not in columns
+    assert "uq_focus_sessions_user_open" in legacy_database.indexes()
+
+    legacy_database.downgrade("base")
+    assert "status" not in {
+        column["name"] for column in inspect(legacy_database.engine).get_columns("focus_sessions")
+    }
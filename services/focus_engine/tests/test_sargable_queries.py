@@ -0,0 +1,157 @@
+"""
+Tests that date-range analytics filter on bare, indexed columns
+
+Every analytics read is captured as it is sent. The SQL check runs on any
+backend; the EXPLAIN check needs Postgres (point FOCUS_FLOW_DATABASE_URL at
+one) and is skipped otherwise.
+"""
+
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+import re
+
+import pytest
+from sqlalchemy import event, inspect, text
+
+from focus_engine.database.connection import SessionLocal, engine
+from focus_engine.models.session_models import FocusSession
+from focus_engine.services.analytics_service import SessionAnalytics, time_series_store
+
+ANALYTICS_READS = (
+    lambda db: SessionAnalytics.calculate_user_stats(db, "alice", 90),
+    lambda db: SessionAnalytics.calculate_daily_trends(db, "alice", 90),
+    lambda db: SessionAnalytics.calculate_rolling_trends(db, "alice"),
+    lambda db: SessionAnalytics.calculate_hourly_patterns(db, "alice", 90),
+    lambda db: SessionAnalytics.calculate_session_type_performance(db, "alice", 90)
+)
+
+# A function applied to a timestamp column in the WHERE clause defeats its index
+WRAPPED_COLUMN = re.compile(
+    r"\b(date|extract|strftime|date_trunc|cast)\s*\([^)]*focus_sessions\.(start_time|start_date|end_time)",
+    re.IGNORECASE
+)
+
+
+def seed(sessions: int = 2000):
+    now = datetime.utcnow()
+    db = SessionLocal()
+    try:
+        for n in range(sessions):
+            start = now - timedelta(hours=7 * n)
+            db.add(FocusSession(
+                user_id="alice" if n % 20 == 0 else f"user-{n % 97}",
+                session_type="deep_work",
+                status="completed",
+                planned_duration=50,
+                actual_duration=45,
+                productivity_score=7.0,
+                start_time=start,
+                start_date=start.date(),
+                start_hour=start.hour,
+                end_time=start + timedelta(minutes=45)
+            ))
+        db.commit()
+    finally:
+        db.close()
+
+
+@contextmanager
+def captured_reads():
+    """(statement, parameters) of every SELECT on focus_sessions sent inside the block"""
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT") and "focus_sessions" in statement:
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+
+
+def analytics_reads():
+    time_series_store._series.clear()
+    db = SessionLocal()
+    try:
+        with captured_reads() as statements:
+            for read in ANALYTICS_READS:
+                read(db)
+    finally:
+        db.close()
+    return statements
+
+
+def where_clause(statement: str) -> str:
+    match = re.search(r"\bWHERE\b(.*?)(\bGROUP BY\b|\bORDER BY\b|\bLIMIT\b|$)", statement, re.IGNORECASE | re.DOTALL)
+    return match.group(1) if match else ""
+
+
+def test_date_range_predicates_compare_bare_columns():
+    seed(200)
+
+    statements = analytics_reads()
+
+    assert len(statements) >= len(ANALYTICS_READS)
+    for statement, _ in statements:
+        clause = where_clause(statement)
+        assert "focus_sessions.user_id" in clause, statement
+        assert not WRAPPED_COLUMN.search(clause), statement
+
+
+def _index_conditions(plan: dict):
+    """Index Cond of every node in an EXPLAIN (FORMAT JSON) plan"""
+    if "Index Cond" in plan:
+        yield plan.get("Index Name"), plan["Index Cond"]
+    for child in plan.get("Plans", []):
+        yield from _index_conditions(child)
+
+
+@pytest.mark.skipif(engine.dialect.name != "postgresql", reason="EXPLAIN plans are checked on Postgres only")
+def test_date_range_queries_use_the_composite_indexes():
+    seed()
+    with engine.connect() as connection:
+        connection.execute(text("ANALYZE focus_sessions"))
+
+    statements = analytics_reads()
+
+    with engine.connect() as connection:
+        # The table is small, so make the planner show whether an index can serve the predicate at all
+        connection.execute(text("SET enable_seqscan = off"))
+        for statement, parameters in statements:
+            plan = connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters).scalar()[0]["Plan"]
+            conditions = list(_index_conditions(plan))
+
+            assert any(
+                name in ("ix_focus_sessions_user_start_date", "ix_focus_sessions_user_start_id")
+                and "user_id" in condition
+                and ("start_date" in condition or "start_time" in condition)
+                for name, condition in conditions
+            ), f"{statement}\n{conditions}"
+
+
+def test_migration_backfills_start_buckets(legacy_database):
+    with legacy_database.engine.begin() as connection:
+        connection.execute(legacy_database.focus_sessions.insert(), [
+            {"user_id": "alice", "start_time": datetime(2026, 3, 2, 9, 30), "end_time": datetime(2026, 3, 2, 10, 0)},
+            {"user_id": "alice", "start_time": datetime(2026, 3, 3, 23, 55), "end_time": None}
+        ])
+
+    legacy_database.upgrade("0003")
+    columns = {column["name"] for column in inspect(legacy_database.engine).get_columns("focus_sessions")}
+    assert "start_date" not in columns
+
+    legacy_database.upgrade("0004")
+    with legacy_database.engine.connect() as connection:
+        rows = connection.execute(text("SELECT start_date, start_hour FROM focus_sessions ORDER BY id")).all()
+    assert [tuple(row) for row in rows] == [("2026-03-02", 9), ("2026-03-03", 23)]
+    columns = {column["name"]: column for column in inspect(legacy_database.engine).get_columns("focus_sessions")}
+    assert not columns["start_date"]["nullable"]
+    assert not columns["start_hour"]["nullable"]
+    assert "ix_focus_sessions_user_start_date" in legacy_database.indexes()
+
+    legacy_database.downgrade("0003")
+    columns = {column["name"] for column in inspect(legacy_database.engine).get_columns("focus_sessions")}
+    assert not {"start_date", "start_hour"} & columns
+    assert "ix_focus_sessions_user_start_date" not in legacy_database.indexes()
@@ -0,0 +1,72 @@
+"""
+Tests for the read-through session cache
+"""
+
+from focus_engine.services.session_service import SessionService, session_cache
+
+
+async def start(client, user_id: str = "alice", **headers):
+    return await client.post(
+        "/api/v1/sessions/sessions/",
+        json={"user_id": user_id, "planned_duration": 25},
+        headers=headers
+    )
+
+
+async def test_start_returns_integer_id_and_caches_session(client):
+    response = await start(client)
+
+    assert response.status_code == 201
+    body = response.json()
+    assert isinstance(body["id"], int)
+    assert session_cache.get(body["id"])["status"] == "active"
+
+
+async def test_get_session_is_served_from_cache(client, monkeypatch):
+    session_id = (await start(client)).json()["id"]
+
+    async def no_database(*args, **kwargs):
+        raise AssertionError("cache miss")
+
+    monkeypatch.setattr("sqlalchemy.ext.asyncio.AsyncSession.get", no_database)
+    response = await client.get(f"/api/v1/sessions/sessions/{session_id}")
+
+    assert response.status_code == 200
+    assert response.json()["id"] == session_id
+
+
+async def test_transitions_write_through(client):
+    session_id = (await start(client)).json()["id"]
+
+    await client.post(f"/api/v1/sessions/sessions/{session_id}/pause")
+    assert session_cache.get(session_id)["status"] == "paused"
+
+    response = await client.get(f"/api/v1/sessions/sessions/{session_id}")
+    assert response.json()["status"] == "paused"
+
+
+async def test_cold_read_fills_cache_by_id_and_uuid(client):
+    body = (await start(client)).json()
+    session_cache.clear()
+
+    response = await client.get(f"/api/v1/sessions/sessions/{body['id']}")
+    assert response.status_code == 200
+    assert body["id"] in session_cache
+
+
+async def test_delete_invalidates(client):
+    session_id = (await start(client)).json()["id"]
+
+    assert (await client.delete(f"/api/v1/sessions/sessions/{session_id}")).status_code == 204
+    assert session_id not in session_cache
+    assert (await client.get(f"/api/v1/sessions/sessions/{session_id}")).status_code == 404
+
+
+def test_serialization_failure_on_write_evicts_instead_of_raising():
+    class Unserializable:
+        id = 7
+        session_uuid = None
+
+    session_cache.set(7, {"id": 7, "status": "active"})
+    assert SessionService._cache_session(Unserializable()) is None
+    assert 7 not in session_cache
@@ -0,0 +1,74 @@
+"""
+Tests for bulk ingest of offline sessions
+"""
+
+from datetime import datetime, timedelta
+import uuid
+
+from focus_engine.routers import sessions as sessions_router
+from focus_engine.services.session_service import SessionService
+
+BATCH = "/api/v1/sessions/sessions/batch"
+
+
+def record(**overrides):
+    start = datetime(2026, 3, 2, 9, 0)
+    return {
+        "session_uuid": str(uuid.uuid4()),
+        "user_id": "alice",
+        "session_type": "pomodoro",
+        "planned_duration": 50,
+        "start_time": start.isoformat(),
+        "end_time": (start + timedelta(minutes=47, seconds=20)).isoformat(),
+        **overrides
+    }
+
+
+async def test_ingest_creates_and_reports_per_item(client):
+    duplicate = record()
+    response = await client.post(BATCH, json={"sessions": [
+        duplicate,
+        record(),
+        dict(duplicate),
+        record(status="active"),
+        record(end_time="2026-03-02T08:00:00")
+    ]})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["created"], body["duplicates"], body["invalid"]) == (2, 1, 2)
+    assert [item["result"] for item in body["results"]] == ["created", "created", "duplicate", "invalid", "invalid"]
+    assert isinstance(body["results"][0]["id"], int)
+
+    stored = await client.get(f"/api/v1/sessions/sessions/{body['results'][0]['id']}")
+    assert stored.json()["actual_duration"] == 47
+    assert stored.json()["status"] == "completed"
+
+
+async def test_replayed_batch_is_all_duplicates(client):
+    batch = {"sessions": [record(), record()]}
+
+    await client.post(BATCH, json=batch)
+    body = (await client.post(BATCH, json=batch)).json()
+
+    assert body["created"] == 0
+    assert body["duplicates"] == 2
+
+
+async def test_chunks_commit_together(client):
+    from focus_engine.database.connection import AsyncSessionLocal
+    from focus_engine.models.session_models import SessionIngestRecord
+
+    records = [SessionIngestRecord(**record()) for _ in range(25)]
+    async with AsyncSessionLocal() as db:
+        result = await SessionService.ingest_sessions(db, records, chunk_size=10)
+
+    assert result["created"] == 25
+
+
+async def test_oversized_batch_is_rejected(client, monkeypatch):
+    monkeypatch.setattr(sessions_router.settings, "max_ingest_batch_size", 2)
+
+    response = await client.post(BATCH, json={"sessions": [record(), record(), record()]})
+
+    assert response.status_code == 413
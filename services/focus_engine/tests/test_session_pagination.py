@@ -0,0 +1,117 @@
+"""
+Tests for keyset pagination of a user's session history
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import text
+
+from database.connection import SessionLocal, engine
+from focus_engine.models.session_models import FocusSession
+
+HISTORY = "/api/v1/sessions/sessions/user/{}"
+START = datetime(2026, 3, 2, 9)
+
+
+def seed(user_id: str = "alice", count: int = 7):
+    """Sessions an hour apart, with the last two sharing a start_time to exercise the id tie-break"""
+    db = SessionLocal()
+    try:
+        for n in range(count):
+            start = START + timedelta(hours=min(n, count - 2))
+            db.add(FocusSession(
+                user_id=user_id,
+                session_type="pomodoro" if n % 2 == 0 else "deep_work",
+                status="completed" if n % 3 else "cancelled",
+                planned_duration=25,
+                start_time=start,
+                start_date=start.date(),
+                start_hour=start.hour
+            ))
+        db.commit()
+    finally:
+        db.close()
+
+
+async def walk(client, user_id: str = "alice", **params):
+    pages, cursor = [], None
+    while True:
+        response = await client.get(HISTORY.format(user_id), params={**params, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200
+        body = response.json()
+        pages.append([session["id"] for session in body["sessions"]])
+        cursor = body["next_cursor"]
+        if cursor is None:
+            return pages
+
+
+async def test_pages_walk_history_newest_first_without_gaps(client):
+    seed()
+    seed("bob", 3)
+
+    pages = await walk(client, limit=3)
+
+    assert [len(page) for page in pages] == [3, 3, 1]
+    ids = [session_id for page in pages for session_id in page]
+    # Ids 6 and 7 share a start_time, so the higher id comes first
+    assert ids == [7, 6, 5, 4, 3, 2, 1]
+
+
+async def test_filters_apply_to_every_page(client):
+    seed()
+
+    pages = await walk(client, limit=1, session_type="pomodoro", status="completed")
+
+    assert pages == [[5], [3]]
+
+
+async def test_count_is_only_computed_on_request(client):
+    seed()
+
+    plain = (await client.get(HISTORY.format("alice"), params={"limit": 2})).json()
+    exact = (await client.get(HISTORY.format("alice"), params={"limit": 2, "count": "exact"})).json()
+    approximate = (await client.get(HISTORY.format("alice"), params={"count": "approximate", "status": "cancelled"})).json()
+
+    assert plain["total"] is None
+    assert exact["total"] == 7
+    # Off Postgres the estimate falls back to an exact count
+    assert approximate["total"] == 3
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", "WzFd", "bnVsbA"])
+async def test_malformed_cursors_are_rejected(client, cursor):
+    response = await client.get(HISTORY.format("alice"), params={"cursor": cursor})
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid pagination cursor"
+
+
+@pytest.mark.skipif(engine.dialect.name != "sqlite", reason="Checks the SQLite query plan")
+def test_page_query_walks_the_keyset_index():
+    with engine.connect() as connection:
+        plan = " ".join(str(row[-1]) for row in connection.execute(text(
+            "EXPLAIN QUERY PLAN SELECT id FROM focus_sessions "
+            "WHERE user_id = 'alice' AND (start_time, id) < ('2026-03-02 12:00:00', 5) "
+            "ORDER BY start_time DESC, id DESC LIMIT 11"
+        )))
+
+    assert "ix_focus_sessions_user_start_id" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+async def test_unknown_status_filter_is_rejected(client):
+    response = await client.get(HISTORY.format("alice"), params={"status": "abandoned"})
+
+    assert response.status_code == 400
+
+
+def test_migration_adds_and_drops_the_keyset_index(legacy_database):
+    legacy_database.upgrade("0002")
+    assert "ix_focus_sessions_user_start_id" not in legacy_database.indexes()
+
+    legacy_database.upgrade("0003")
+    assert "ix_focus_sessions_user_start_id" in legacy_database.indexes()
+
+    legacy_database.downgrade("0002")
+    assert "ix_focus_sessions_user_start_id" not in legacy_database.indexes()
@@ -0,0 +1,96 @@
+"""
+Tests for column-projected session reads
+"""
+
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from focus_engine.database.connection import SessionLocal, engine
+from focus_engine.database.session_repository import SessionRecord, SessionRepository
+from focus_engine.models.session_models import FocusSession
+
+START = datetime(2026, 3, 2, 9)
+
+
+def seed(db, count: int = 5):
+    for n in reversed(range(count)):
+        start = START + timedelta(days=n)
+        db.add(FocusSession(
+            user_id="alice",
+            status="completed",
+            planned_duration=25,
+            start_time=start,
+            productivity_score=float(n),
+            ai_insights="long generated text",
+            improvement_recommendations={"tips": ["take breaks"]}
+        ))
+    db.add(FocusSession(user_id="bob", status="completed", start_time=START))
+    db.commit()
+
+
+@contextmanager
+def captured_statements():
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, executemany))
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+
+
+def test_stream_records_projects_only_the_record_columns():
+    db = SessionLocal()
+    try:
+        seed(db)
+        with captured_statements() as statements:
+            records = list(SessionRepository.stream_records(
+                db, *SessionRepository.user_window("alice", START, START + timedelta(days=3)),
+                order_by_start=True
+            ))
+    finally:
+        db.close()
+
+    assert all(type(record) is SessionRecord for record in records)
+    assert [record.start_time for record in records] == [START + timedelta(days=n) for n in range(4)]
+    assert [record.start_date for record in records] == [(START + timedelta(days=n)).date() for n in range(4)]
+    [(select, _)] = statements
+    assert "ai_insights" not in select
+    assert "improvement_recommendations" not in select
+    assert "user_id" not in select.split("FROM")[0]
+
+
+def test_streaming_in_small_chunks_yields_every_row():
+    db = SessionLocal()
+    try:
+        seed(db)
+        records = list(SessionRepository.stream_records(
+            db, *SessionRepository.user_date_range("alice", START.date(), (START + timedelta(days=4)).date()),
+            chunk_size=2
+        ))
+    finally:
+        db.close()
+
+    assert sorted(record.productivity_score for record in records) == [0.0, 1.0, 2.0, 3.0, 4.0]
+
+
+def test_focus_quality_is_written_in_one_executemany():
+    db = SessionLocal()
+    try:
+        seed(db)
+        ids = [session_id for (session_id,) in db.query(FocusSession.id).filter(FocusSession.user_id == "alice")]
+        with captured_statements() as statements:
+            SessionRepository.update_focus_quality(db, {ids[0]: "high", ids[1]: "low"})
+
+        updates = [(statement, many) for statement, many in statements if statement.startswith("UPDATE")]
+        assert updates == [(updates[0][0], True)]
+        assert dict(db.query(FocusSession.id, FocusSession.focus_quality).filter(FocusSession.id.in_(ids[:2]))) == {
+            ids[0]: "high", ids[1]: "low"
+        }
+    finally:
+        db.close()
@@ -0,0 +1,81 @@
+"""
+Tests for single-statement conditional session transitions
+"""
+
+from datetime import datetime, timedelta
+import asyncio
+
+from sqlalchemy import update
+
+from database.connection import SessionLocal
+from focus_engine.models.session_models import FocusSession
+
+SESSIONS = "/api/v1/sessions/sessions"
+
+
+async def start(client, user_id: str = "alice") -> dict:
+    response = await client.post(f"{SESSIONS}/", json={"user_id": user_id, "planned_duration": 25})
+    assert response.status_code == 201
+    return response.json()
+
+
+def shift_session(session_id: int, **deltas: timedelta):
+    """Move stored timestamps into the past"""
+    db = SessionLocal()
+    try:
+        session = db.get(FocusSession, session_id)
+        db.execute(
+            update(FocusSession).where(FocusSession.id == session_id)
+            .values(**{name: getattr(session, name) - delta for name, delta in deltas.items()})
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+async def test_complete_computes_actual_duration(client):
+    session = await start(client)
+    shift_session(session["id"], start_time=timedelta(minutes=42, seconds=30))
+
+    response = await client.post(f"{SESSIONS}/{session['id']}/complete")
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["status"] == "completed"
+    assert body["actual_duration"] == 42
+    assert body["completion_reason"] == "completed"
+
+
+async def test_resume_pushes_planned_end_back_by_pause(client):
+    session = await start(client)
+    planned_end = datetime.fromisoformat(session["planned_end_time"])
+
+    await client.post(f"{SESSIONS}/{session['id']}/pause")
+    shift_session(session["id"], paused_at=timedelta(minutes=10))
+    response = await client.post(f"{SESSIONS}/{session['id']}/resume")
+
+    assert response.status_code == 200
+    new_end = datetime.fromisoformat(response.json()["planned_end_time"])
+    assert timedelta(minutes=10) <= new_end - planned_end < timedelta(minutes=10, seconds=5)
+
+
+async def test_precondition_failures(client):
+    session = await start(client)
+
+    assert (await client.post(f"{SESSIONS}/{session['id']}/resume")).status_code == 409
+    assert (await client.post(f"{SESSIONS}/{session['id']}/pause")).status_code == 200
+    assert (await client.post(f"{SESSIONS}/{session['id']}/pause")).status_code == 409
+    assert (await client.post(f"{SESSIONS}/999999/pause")).status_code == 404
+
+    await client.post(f"{SESSIONS}/{session['id']}/complete")
+    assert (await client.post(f"{SESSIONS}/{session['id']}/complete")).status_code == 409
+
+
+async def test_concurrent_pauses_succeed_once(client):
+    session = await start(client)
+
+    responses = await asyncio.gather(*(
+        client.post(f"{SESSIONS}/{session['id']}/pause") for _ in range(8)
+    ))
+
+    assert sorted(response.status_code for response in responses) == [200] + [409] * 7
@@ -0,0 +1,97 @@
+"""
+Tests that long analytics windows are streamed with flat memory
+"""
+
+import tracemalloc
+
+import pytest
+from sqlalchemy import text
+
+from focus_engine.database.connection import SessionLocal
+from focus_engine.services.analytics_service import SessionAnalytics
+from focus_engine.services.focus_scoring_service import FocusQualityScorer
+
+SESSIONS = 1_000_000
+
+# Peak Python allocations while folding the whole window; holding the rows
+# would take several hundred MiB, one yield_per chunk takes a few
+MEMORY_CEILING = 32 * 2 ** 20
+
+
+def _seed_sql(dialect: str) -> str:
+    """INSERT ... SELECT generating the sessions in the database, far faster than sending them"""
+    if dialect == "sqlite":
+        sequence = (
+            "WITH RECURSIVE seq(n) AS (SELECT 0 UNION ALL SELECT n + 1 FROM seq WHERE n + 1 < :sessions), "
+            "timed AS (SELECT n, datetime('now', '-' || ((n + 1) * :step_seconds) || ' seconds') AS start_time FROM seq)"
+        )
+        start_date, start_hour = "date(start_time)", "CAST(strftime('%H', start_time) AS INTEGER)"
+    else:
+        sequence = (
+            "WITH timed AS (SELECT n, (now() AT TIME ZONE 'utc') - (n + 1) * :step_seconds * INTERVAL '1 second' "
+            "AS start_time FROM generate_series(0, :sessions - 1) AS n)"
+        )
+        start_date, start_hour = "CAST(start_time AS DATE)", "EXTRACT(HOUR FROM start_time)"
+
+    return f"""
+        INSERT INTO focus_sessions (
+            user_id, session_type, status, planned_duration, actual_duration, productivity_score,
+            interruption_count, focus_quality, start_time, start_date, start_hour
+        )
+        {sequence}
+        SELECT
+            'heavy-user',
+            CASE n % 3 WHEN 0 THEN 'deep_work' WHEN 1 THEN 'pomodoro' ELSE 'custom' END,
+            CASE WHEN n % 5 = 0 THEN 'cancelled' ELSE 'completed' END,
+            50,
+            20 + n % 30,
+            n % 10,
+            n % 4,
+            CASE n % 3 WHEN 0 THEN 'high' WHEN 1 THEN 'medium' ELSE 'low' END,
+            start_time,
+            {start_date},
+            {start_hour}
+        FROM timed
+    """
+
+
+def seed(engine, sessions: int):
+    # Spread over 360 days so the whole set falls in a 365-day window
+    step_seconds = 360 * 86400 / sessions
+    with engine.begin() as connection:
+        connection.execute(text(_seed_sql(engine.dialect.name)), {"sessions": sessions, "step_seconds": step_seconds})
+
+
+@pytest.mark.slow
+def test_user_stats_over_1m_sessions_stay_under_the_memory_ceiling(database):
+    seed(database, SESSIONS)
+
+    db = SessionLocal()
+    try:
+        tracemalloc.start()
+        stats = SessionAnalytics.calculate_user_stats(db, "heavy-user", days=365)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        db.close()
+
+    assert stats["total_sessions"] == SESSIONS
+    assert stats["completed_sessions"] == SESSIONS - SESSIONS // 5
+    assert peak < MEMORY_CEILING, f"peak {peak / 2 ** 20:.1f} MiB"
+
+
+@pytest.mark.slow
+def test_quality_insights_over_1m_sessions_stay_under_the_memory_ceiling(database):
+    seed(database, SESSIONS)
+
+    db = SessionLocal()
+    try:
+        tracemalloc.start()
+        insights = FocusQualityScorer.get_quality_insights(db, "heavy-user", days=365)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        db.close()
+
+    assert insights["total_sessions_analyzed"] == SESSIONS
+    assert peak < MEMORY_CEILING, f"peak {peak / 2 ** 20:.1f} MiB"
@@ -0,0 +1,82 @@
+"""
+Tests for ETag / If-None-Match on template and preset listings
+"""
+
+from focus_engine.routers import templates as templates_router
+from focus_engine.services.template_service import SystemTemplates, TemplateService
+
+
+def template_payload(**overrides):
+    return {"name": "Morning writing", "session_type": "deep_work", "duration_minutes": 45, **overrides}
+
+
+async def test_listing_revalidates_with_304(client):
+    first = await client.get("/api/v1/templates/users/alice/templates")
+    etag = first.headers["ETag"]
+
+    second = await client.get("/api/v1/templates/users/alice/templates", headers={"If-None-Match": etag})
+
+    assert first.status_code == 200
+    assert second.status_code == 304
+    assert second.content == b""
+    assert second.headers["ETag"] == etag
+
+
+async def test_template_change_moves_etag(client):
+    etag = (await client.get("/api/v1/templates/users/alice/templates")).headers["ETag"]
+
+    created = await client.post("/api/v1/templates/users/alice/templates", json=template_payload())
+    assert created.status_code == 200
+
+    response = await client.get("/api/v1/templates/users/alice/templates", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert any(t["name"] == "Morning writing" for t in response.json()["templates"])
+
+
+async def test_static_listings_and_weak_validators(client):
+    for path in ("/api/v1/templates/categories", "/api/v1/templates/difficulties"):
+        etag = (await client.get(path)).headers["ETag"]
+        assert (await client.get(path, headers={"If-None-Match": f"W/{etag}"})).status_code == 304
+        assert (await client.get(path, headers={"If-None-Match": '"stale"'})).status_code == 200
+
+
+def test_system_catalog_serializes_identically_across_workers():
+    first, second = SystemTemplates.get_all_system_templates(), SystemTemplates.get_all_system_templates()
+
+    assert [templates_router._template_summary(t) for t in first] == \
+        [templates_router._template_summary(t) for t in second]
+    assert [p.created_at for p in SystemTemplates.get_productivity_presets()] == \
+        [p.created_at for p in SystemTemplates.get_productivity_presets()]
+
+
+def test_usage_reload_without_changes_keeps_system_version(monkeypatch):
+    service = TemplateService()
+    service._ensure_system_usage()
+    version = service.system_version
+
+    monkeypatch.setattr(service, "_system_usage_loaded_at", None)
+    service._ensure_system_usage()
+
+    assert service.system_version == version
+
+
+def test_response_cache_size_comes_from_settings():
+    assert templates_router._response_cache.maxsize == templates_router.settings.template_response_cache_max_entries
+    assert templates_router._response_cache.ttl_seconds == templates_router.settings.template_response_cache_ttl_seconds
+
+
+async def test_usage_flush_moves_etag(client):
+    listing = "/api/v1/templates/users/alice/templates"
+    first = await client.get(listing)
+    etag = first.headers["ETag"]
+    before = {t["id"]: t["usage_count"] for t in first.json()["templates"]}
+
+    templates_router.template_service.track_template_usage("pomodoro_classic", None)
+    templates_router.template_service.flush_usage()
+
+    response = await client.get(listing, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    after = {t["id"]: t["usage_count"] for t in response.json()["templates"]}
+    assert after["pomodoro_classic"] == before["pomodoro_classic"] + 1
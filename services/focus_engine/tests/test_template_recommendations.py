@@ -0,0 +1,73 @@
+"""
+Tests for the per-user recommendation cache
+"""
+
+import pytest
+
+from focus_engine.services import template_service as template_module
+from focus_engine.services.analytics_service import SessionAnalytics, analytics_versions
+from focus_engine.services.template_service import TemplateService
+
+
+@pytest.fixture
+def profiles(monkeypatch):
+    """Count profile computations, the expensive part of a recommendation"""
+    calls = []
+
+    def profile(db, user_id, days):
+        calls.append(user_id)
+        return {"type_completion_rates": {"deep_work": 0.9}, "average_planned_duration": 60}
+
+    monkeypatch.setattr(SessionAnalytics, "calculate_recommendation_profile", staticmethod(profile))
+    return calls
+
+
+def test_repeat_requests_are_served_from_cache(profiles):
+    service = TemplateService()
+
+    first = service.get_recommended_templates("alice", db=None)
+    second = service.get_recommended_templates("alice", db=None)
+
+    assert [t.id for t in first] == [t.id for t in second]
+    assert len(profiles) == 1
+
+
+def test_system_popularity_changes_do_not_recompute_profile(profiles):
+    service = TemplateService()
+    service.get_recommended_templates("alice", db=None)
+
+    service._bump_system_version()
+    service.get_recommended_templates("alice", db=None)
+
+    assert len(profiles) == 1
+
+
+def test_popularity_is_rescored_on_its_own_timer(profiles, monkeypatch):
+    service = TemplateService()
+    before = [t.id for t in service.get_recommended_templates("alice", db=None, count=20)]
+
+    top = service._system_templates_by_id[before[-1]]
+    top.usage_count, top.average_completion_rate = 10_000, 1.0
+
+    # Still inside the refresh interval: the cached ranking is served
+    assert [t.id for t in service.get_recommended_templates("alice", db=None, count=20)] == before
+
+    monkeypatch.setattr(template_module.settings, "recommendation_popularity_refresh_seconds", 0)
+    after = [t.id for t in service.get_recommended_templates("alice", db=None, count=20)]
+
+    assert after.index(top.id) < before.index(top.id)
+    assert len(profiles) == 1
+
+
+def test_analytics_and_template_changes_recompute(profiles):
+    service = TemplateService()
+    service.get_recommended_templates("alice", db=None)
+
+    analytics_versions.bump("alice")
+    service.get_recommended_templates("alice", db=None)
+    assert len(profiles) == 2
+
+    service.create_custom_template("alice", {"name": "Sprint", "session_type": "deep_work", "duration_minutes": 60})
+    recommendations = service.get_recommended_templates("alice", db=None, count=20)
+    assert len(profiles) == 3
+    assert "Sprint" in [t.name for t in recommendations]
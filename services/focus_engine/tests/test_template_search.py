@@ -0,0 +1,73 @@
+"""
+Tests for inverted-index template search
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+from focus_engine.utils.search_index import InvertedIndex
+
+
+def test_prefix_terms_must_all_match():
+    index = InvertedIndex()
+    index.add("a", ["Deep work sprint", "writing"])
+    index.add("b", ["Deep breathing", "wellness"])
+
+    assert index.search("dee") == {"a", "b"}
+    assert index.search("deep wri") == {"a"}
+    assert index.search("deep xyz") == set()
+
+    index.add("a", ["Reading"])
+    assert index.search("wri") == set()
+    assert index.remove("b") and index.search("deep") == set()
+
+
+def test_concurrent_updates_and_searches_stay_consistent():
+    index = InvertedIndex()
+    stop = threading.Event()
+    errors = []
+
+    def writer(worker: int):
+        for n in range(2000):
+            doc = f"{worker}-{n % 50}"
+            index.add(doc, [f"focus token{n % 7} alpha{n % 13}"])
+            if n % 3 == 0:
+                index.remove(doc)
+
+    def reader():
+        while not stop.is_set():
+            try:
+                index.search("focus tok")
+                index.search("alp")
+            except Exception as e:
+                errors.append(e)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        readers = [pool.submit(reader) for _ in range(4)]
+        for future in [pool.submit(writer, worker) for worker in range(4)]:
+            future.result()
+        stop.set()
+        for future in readers:
+            future.result()
+
+    assert errors == []
+    assert index._sorted_tokens == sorted(index._postings)
+    assert all(index._postings.values())
+
+
+async def test_search_endpoint_ranks_and_paginates(client):
+    for name in ("Deep focus one", "Deep focus two", "Deep focus three"):
+        await client.post(
+            "/api/v1/templates/users/alice/templates",
+            json={"name": name, "session_type": "deep_work", "duration_minutes": 45, "tags": ["writing"]}
+        )
+
+    response = await client.get(
+        "/api/v1/templates/users/alice/templates/search",
+        params={"q": "deep wri", "include_system": False, "limit": 2}
+    )
+
+    body = response.json()
+    assert response.status_code == 200
+    assert body["total_count"] == 3
+    assert len(body["templates"]) == 2
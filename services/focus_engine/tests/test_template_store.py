@@ -0,0 +1,130 @@
+"""
+Tests for the persisted, indexed template store
+"""
+
+from sqlalchemy import inspect
+
+from database.connection import Base, SessionLocal
+from focus_engine.models.template_models import StoredPreset
+from focus_engine.services.template_service import DifficultyLevel, TemplateCategory, TemplateService
+
+TEMPLATE_TABLES = ("session_templates", "productivity_presets", "template_usage")
+
+
+def create(service: TemplateService, user_id: str = "alice", **overrides):
+    return service.create_custom_template(user_id, {
+        "name": "Morning writing",
+        "session_type": "deep_work",
+        "duration_minutes": 50,
+        "category": "creative",
+        "difficulty": "advanced",
+        **overrides
+    })
+
+
+def test_templates_persist_across_workers():
+    template = create(TemplateService(), tags=["writing"])
+
+    other_worker = TemplateService()
+    loaded = other_worker.get_template_by_id(template.id, "alice")
+
+    assert loaded is not None
+    assert (loaded.name, loaded.category, loaded.tags) == ("Morning writing", TemplateCategory.CREATIVE, ["writing"])
+    assert other_worker.get_template_by_id(template.id, "bob") is None
+    assert other_worker.get_template_by_id(template.id) is None
+
+
+def test_listings_are_filtered_sorted_and_memoized():
+    service = TemplateService()
+    plain = create(service, name="Plain")
+    favorite = create(service, name="Favorite")
+    service.update_template(favorite.id, "alice", {"is_favorite": True})
+    create(service, name="Study block", category="study", difficulty="beginner")
+
+    listing = service.get_templates_for_user("alice", category=TemplateCategory.CREATIVE, include_system=False)
+    assert [t.name for t in listing] == ["Favorite", "Plain"]
+
+    everything = service.get_templates_for_user("alice")
+    assert everything[0].id == favorite.id
+    assert plain.id in {t.id for t in everything}
+    assert len(everything) == len(service.system_templates) + 3
+
+    index = service._get_user_index("alice")
+    memoized = dict(index.listings)
+    assert service.get_templates_for_user("alice", category=TemplateCategory.CREATIVE, include_system=False) == listing
+    assert index.listings == memoized
+
+    beginner = service.get_templates_for_user("alice", difficulty=DifficultyLevel.BEGINNER, include_system=False)
+    assert [t.name for t in beginner] == ["Study block"]
+
+
+def test_changes_reset_memoized_listings():
+    service = TemplateService()
+    template = create(service)
+    assert service.get_templates_for_user("alice", include_system=False) == [template]
+    version = service.get_template_version("alice")
+
+    service.update_template(template.id, "alice", {"name": "Evening writing"})
+    assert [t.name for t in service.get_templates_for_user("alice", include_system=False)] == ["Evening writing"]
+    assert service.get_template_version("alice") != version
+
+    assert service.delete_template(template.id, "alice")
+    assert service.get_templates_for_user("alice", include_system=False) == []
+    assert TemplateService().get_template_by_id(template.id, "alice") is None
+
+
+def test_only_the_owner_can_change_a_template():
+    service = TemplateService()
+    template = create(service)
+
+    assert service.update_template(template.id, "bob", {"name": "Taken"}) is None
+    assert not service.delete_template(template.id, "bob")
+    assert service.get_template_by_id(template.id, "alice").name == "Morning writing"
+
+
+def test_remote_invalidation_reloads_from_the_database():
+    worker = TemplateService()
+    other_worker = TemplateService()
+    assert other_worker.get_templates_for_user("alice", include_system=False) == []
+
+    template = create(worker)
+    other_worker._on_remote_invalidation("alice")
+
+    assert [t.id for t in other_worker.get_templates_for_user("alice", include_system=False)] == [template.id]
+
+
+def test_presets_are_loaded_per_user():
+    db = SessionLocal()
+    try:
+        db.add(StoredPreset(
+            id="alice-routine",
+            user_id="alice",
+            name="Alice's routine",
+            templates=["pomodoro_classic"],
+            daily_goal_sessions=4,
+            daily_goal_minutes=100,
+            weekly_goal_sessions=20,
+            weekly_goal_minutes=500
+        ))
+        db.commit()
+    finally:
+        db.close()
+    service = TemplateService()
+
+    assert service.get_preset_by_id("alice-routine", "alice").templates == ["pomodoro_classic"]
+    assert service.get_preset_by_id("alice-routine", "bob") is None
+    assert len(service.get_presets_for_user("alice")) == len(service.system_presets) + 1
+
+
+def test_migration_creates_the_template_tables(legacy_database):
+    legacy_database.upgrade()
+
+    inspector = inspect(legacy_database.engine)
+    for table in TEMPLATE_TABLES:
+        migrated = {column["name"] for column in inspector.get_columns(table)}
+        assert migrated == set(Base.metadata.tables[table].columns.keys())
+    assert "ix_session_templates_user_id" in legacy_database.indexes("session_templates")
+    assert "ix_productivity_presets_user_id" in legacy_database.indexes("productivity_presets")
+
+    legacy_database.downgrade("0001")
+    assert not set(TEMPLATE_TABLES) & set(inspect(legacy_database.engine).get_table_names())
@@ -0,0 +1,98 @@
+"""
+Tests for write-batched template usage counters
+"""
+
+from sqlalchemy import select
+
+from database.connection import SessionLocal
+from focus_engine.models.template_models import TemplateUsage
+from focus_engine.services.template_service import TemplateService
+
+
+def stored_usage(template_id: str):
+    db = SessionLocal()
+    try:
+        return db.execute(
+            select(TemplateUsage.usage_count, TemplateUsage.completed_count)
+            .where(TemplateUsage.template_id == template_id)
+        ).one()
+    finally:
+        db.close()
+
+
+def test_flush_increments_atomically_and_updates_in_place():
+    service = TemplateService()
+    service.track_template_usage("pomodoro_classic", None, completed=True)
+    service.track_template_usage("pomodoro_classic", None, completed=False)
+
+    assert service.flush_usage() == 1
+    assert tuple(stored_usage("pomodoro_classic")) == (2, 1)
+
+    template = service.get_template_by_id("pomodoro_classic")
+    assert template.usage_count == 2
+    assert template.average_completion_rate == 0.5
+
+    # A second worker's flush adds to the same row
+    other = TemplateService()
+    other.track_template_usage("pomodoro_classic", None)
+    other.flush_usage()
+    assert tuple(stored_usage("pomodoro_classic")) == (3, 2)
+
+
+def test_flush_does_not_invalidate(monkeypatch):
+    published = []
+    monkeypatch.setattr(
+        "focus_engine.services.template_service.invalidation_bus.publish",
+        lambda namespace, key: published.append((namespace, key))
+    )
+
+    service = TemplateService()
+    template = service.create_custom_template(
+        "alice", {"name": "Sprint", "session_type": "deep_work", "duration_minutes": 60}
+    )
+    published.clear()
+    index = service._get_user_index("alice")
+    user_version, system_version = index.version, service.system_version
+
+    service.track_template_usage(template.id, "alice")
+    service.track_template_usage("deep_work_90", "alice")
+    service.flush_usage()
+
+    assert published == []
+    assert (index.version, service.system_version) == (user_version, system_version)
+    assert index.templates_by_id[template.id].usage_count == 1
+
+
+def test_system_listing_reorders_on_next_usage_reload(monkeypatch):
+    service = TemplateService()
+    service._ensure_system_usage()
+    version = service.system_version
+
+    service.track_template_usage("mindful_break", None)
+    service.flush_usage()
+    assert service.system_version == version
+
+    monkeypatch.setattr(service, "_system_usage_loaded_at", None)
+    service._ensure_system_usage()
+    assert service.system_version == version + 1
+
+
+def test_delete_drops_unflushed_usage():
+    service = TemplateService()
+    template = service.create_custom_template(
+        "alice", {"name": "Sprint", "session_type": "deep_work", "duration_minutes": 60}
+    )
+    service.track_template_usage(template.id, "alice")
+    service.track_template_usage("pomodoro_classic", "alice")
+
+    assert service.delete_template(template.id, "alice")
+    service.flush_usage()
+
+    db = SessionLocal()
+    try:
+        assert db.execute(
+            select(TemplateUsage.template_id).where(TemplateUsage.template_id == template.id)
+        ).first() is None
+    finally:
+        db.close()
+    assert tuple(stored_usage("pomodoro_classic"))[0] >= 1
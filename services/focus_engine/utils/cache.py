@@ -0,0 +1,167 @@
+"""
+Cache Utilities
+In-process TTL/LRU caching and cross-worker invalidation over Redis
+"""
+
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional
+import asyncio
+import json
+import logging
+import threading
+import time
+import uuid
+
+import redis
+
+from ..config.settings import get_settings
+
+logger = logging.getLogger("focus_engine.cache")
+settings = get_settings()
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe LRU cache with per-entry expiry"""
+
+    def __init__(self, maxsize: int = 10000, ttl_seconds: float = 300):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Get a live entry, refreshing its LRU position"""
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                return default
+
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None):
+        """Store an entry, evicting the least recently used one when full"""
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> bool:
+        """Drop an entry if present"""
+        with self._lock:
+            return self._data.pop(key, _MISSING) is not _MISSING
+
+    def clear(self):
+        """Drop all entries"""
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class CacheInvalidationBus:
+    """Cross-worker cache invalidation over Redis pub/sub
+
+    Each worker invalidates its own cache directly and publishes the key so
+    other workers can drop their copies. Redis outages only degrade
+    cross-worker freshness to the cache TTL; they never fail the caller.
+    Publishing from the event loop is handed to the default executor, so a
+    slow or unreachable Redis never stalls request handling.
+    """
+
+    def __init__(self, redis_url: str, channel: str):
+        self.redis_url = redis_url
+        self.channel = channel
+        self.worker_id = str(uuid.uuid4())
+        self._handlers: Dict[str, List[Callable[[str], None]]] = {}
+        self._client: Optional[redis.Redis] = None
+        self._pubsub = None
+        self._thread: Optional[threading.Thread] = None
+
+    def subscribe(self, namespace: str, handler: Callable[[str], None]):
+        """Register a handler called with each key invalidated by another worker"""
+        self._handlers.setdefault(namespace, []).append(handler)
+
+    def publish(self, namespace: str, key: str):
+        """Announce that a key changed in this worker, without blocking the event loop"""
+        message = json.dumps({"namespace": namespace, "key": key, "origin": self.worker_id})
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Called from a worker thread, which may block on Redis
+            self._publish(namespace, key, message)
+            return
+
+        loop.run_in_executor(None, self._publish, namespace, key, message)
+
+    def _publish(self, namespace: str, key: str, message: str):
+        try:
+            self._get_client().publish(self.channel, message)
+        except Exception as e:
+            logger.warning(f"Failed to publish cache invalidation for {namespace}:{key}: {e}")
+
+    def start(self):
+        """Start listening for invalidations from other workers"""
+        if self._thread is not None:
+            return
+
+        try:
+            self._pubsub = self._get_client().pubsub(ignore_subscribe_messages=True)
+            self._pubsub.subscribe(**{self.channel: self._on_message})
+            self._thread = self._pubsub.run_in_thread(sleep_time=1.0, daemon=True)
+            logger.info(f"Listening for cache invalidations on {self.channel}")
+        except Exception as e:
+            logger.warning(f"Cache invalidation listener unavailable: {e}")
+
+    def stop(self):
+        """Stop the listener thread"""
+        if self._thread is not None:
+            self._thread.stop()
+            self._thread = None
+        if self._pubsub is not None:
+            self._pubsub.close()
+            self._pubsub = None
+
+    def _get_client(self) -> redis.Redis:
+        if self._client is None:
+            self._client = redis.from_url(
+                self.redis_url,
+                socket_connect_timeout=settings.redis_socket_timeout_seconds,
+                socket_timeout=settings.redis_socket_timeout_seconds
+            )
+        return self._client
+
+    def _on_message(self, message: Dict[str, Any]):
+        try:
+            payload = json.loads(message["data"])
+        except (TypeError, ValueError):
+            return
+
+        if payload.get("origin") == self.worker_id:
+            return
+
+        for handler in self._handlers.get(payload.get("namespace"), []):
+            try:
+                handler(payload["key"])
+            except Exception as e:
+                logger.error(f"Cache invalidation handler failed: {e}")
+
+
+# Shared invalidation bus for this worker
+invalidation_bus = CacheInvalidationBus(settings.redis_url, settings.cache_invalidation_channel)
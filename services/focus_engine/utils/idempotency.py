@@ -0,0 +1,203 @@
+"""
+Idempotency Utilities
+Replay stored responses for retried requests carrying an Idempotency-Key
+"""
+
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+import asyncio
+import json
+import logging
+import uuid
+
+import redis.asyncio as aioredis
+
+from ..config.settings import get_settings
+from .cache import TTLCache
+
+logger = logging.getLogger("focus_engine.idempotency")
+settings = get_settings()
+
+
+class IdempotencyKeyReusedError(ValueError):
+    """Raised when a key is replayed with a different request payload"""
+    pass
+
+
+class IdempotencyStore:
+    """Stores the response of each keyed request for a bounded time
+
+    Completed responses live in memory or in Redis so retries are answered
+    without running the handler again. A retry that arrives while the first
+    request is still running waits for it instead of racing it: within a
+    worker on the in-flight future, across workers on a pending marker the
+    first request claims with SET NX PX. Only successful responses are
+    stored; a failed request releases its claim and can be retried with the
+    same key.
+    """
+
+    def __init__(self, backend: str = "memory", redis_url: Optional[str] = None,
+                 ttl_seconds: int = 86400, maxsize: int = 10000,
+                 claim_ttl_seconds: float = 30, poll_interval_seconds: float = 0.05):
+        self.backend = backend
+        self.redis_url = redis_url
+        self.ttl_seconds = ttl_seconds
+        self.claim_ttl_seconds = claim_ttl_seconds
+        self.poll_interval_seconds = poll_interval_seconds
+        self._memory = TTLCache(maxsize=maxsize, ttl_seconds=ttl_seconds)
+        self._client: Optional[aioredis.Redis] = None
+        self._in_flight: Dict[str, asyncio.Future] = {}
+
+    async def run(self, scope: str, key: str, fingerprint: str,
+                  handler: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Run handler once per key; returns (body, replayed)"""
+        store_key = f"{scope}:{key}"
+
+        stored = await self._get(store_key)
+        if stored is not None and not stored.get("pending"):
+            return self._replay(stored, fingerprint), True
+
+        pending = self._in_flight.get(store_key)
+        if pending is not None:
+            stored = await asyncio.shield(pending)
+            return self._replay(stored, fingerprint), True
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[store_key] = future
+        claim = str(uuid.uuid4())
+        claimed = False
+
+        try:
+            while True:
+                if stored is not None and not stored.get("pending"):
+                    replayed = True
+                    break
+
+                if stored is not None:
+                    # Another worker holds the claim; wait for its response or for the claim to lapse
+                    if stored["fingerprint"] != fingerprint:
+                        raise IdempotencyKeyReusedError("Idempotency-Key was already used for a different request")
+                    await asyncio.sleep(self.poll_interval_seconds)
+                elif await self._claim(store_key, fingerprint, claim):
+                    claimed = True
+                    body = await handler()
+                    stored = {"fingerprint": fingerprint, "body": body}
+                    # Store before leaving the in-flight map so no retry slips between them
+                    await self._set(store_key, stored)
+                    replayed = False
+                    break
+
+                stored = await self._get(store_key)
+        except BaseException as e:
+            del self._in_flight[store_key]
+            if claimed:
+                await self._release(store_key, claim)
+            future.set_exception(e)
+            # Mark the exception retrieved when no duplicate was waiting on it
+            future.exception()
+            raise
+
+        del self._in_flight[store_key]
+        future.set_result(stored)
+        return self._replay(stored, fingerprint), replayed
+
+    async def claim_once(self, scope: str, key: str, ttl_seconds: float) -> bool:
+        """Claim a one-off run of a job; True for exactly one caller per key
+
+        Across workers this needs the Redis backend (SET NX PX); the memory
+        backend only coordinates this worker. If Redis is unreachable nobody
+        gets the claim, so the run is skipped rather than repeated by every
+        worker.
+        """
+        store_key = f"{scope}:{key}"
+
+        if self.backend != "redis":
+            if store_key in self._memory:
+                return False
+            self._memory.set(store_key, {"claimed": True}, ttl_seconds=ttl_seconds)
+            return True
+
+        try:
+            return bool(await self._get_client().set(
+                store_key, json.dumps({"claimed": True}), nx=True, px=int(ttl_seconds * 1000)
+            ))
+        except Exception as e:
+            logger.warning(f"Failed to claim {store_key}, skipping this run: {e}")
+            return False
+
+    async def close(self):
+        """Close the Redis connection pool if one was opened"""
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+    @staticmethod
+    def _replay(stored: Dict[str, Any], fingerprint: str) -> Any:
+        if stored["fingerprint"] != fingerprint:
+            raise IdempotencyKeyReusedError("Idempotency-Key was already used for a different request")
+        return stored["body"]
+
+    async def _get(self, store_key: str) -> Optional[Dict[str, Any]]:
+        if self.backend != "redis":
+            return self._memory.get(store_key)
+
+        try:
+            raw = await self._get_client().get(store_key)
+        except Exception as e:
+            logger.warning(f"Idempotency lookup failed for {store_key}: {e}")
+            return self._memory.get(store_key)
+        return json.loads(raw) if raw is not None else None
+
+    async def _claim(self, store_key: str, fingerprint: str, claim: str) -> bool:
+        """Mark a key as in progress; False when another worker already holds it"""
+        if self.backend != "redis":
+            # The in-flight future already serializes requests within this worker
+            return True
+
+        marker = json.dumps({"pending": True, "fingerprint": fingerprint, "claim": claim})
+        try:
+            return bool(await self._get_client().set(
+                store_key, marker, nx=True, px=int(self.claim_ttl_seconds * 1000)
+            ))
+        except Exception as e:
+            logger.warning(f"Failed to claim idempotency key {store_key}: {e}")
+            return True
+
+    async def _release(self, store_key: str, claim: str):
+        """Drop our pending marker after a failed request so the key can be retried"""
+        if self.backend != "redis":
+            return
+
+        try:
+            client = self._get_client()
+            raw = await client.get(store_key)
+            if raw is not None and json.loads(raw).get("claim") == claim:
+                await client.delete(store_key)
+        except Exception as e:
+            logger.warning(f"Failed to release idempotency key {store_key}: {e}")
+
+    async def _set(self, store_key: str, stored: Dict[str, Any]):
+        if self.backend != "redis":
+            self._memory.set(store_key, stored)
+            return
+
+        try:
+            await self._get_client().set(store_key, json.dumps(stored), ex=self.ttl_seconds)
+        except Exception as e:
+            # Keep this worker idempotent even while Redis is unavailable
+            logger.warning(f"Failed to store idempotent response for {store_key}: {e}")
+            self._memory.set(store_key, stored)
+
+    def _get_client(self) -> aioredis.Redis:
+        if self._client is None:
+            self._client = aioredis.from_url(self.redis_url)
+        return self._client
+
+
+# Shared idempotency store for this worker
+idempotency_store = IdempotencyStore(
+    backend=settings.idempotency_backend,
+    redis_url=settings.redis_url,
+    ttl_seconds=settings.idempotency_ttl_seconds,
+    maxsize=settings.idempotency_max_entries,
+    claim_ttl_seconds=settings.idempotency_claim_ttl_seconds
+)
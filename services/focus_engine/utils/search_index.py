@@ -0,0 +1,107 @@
+"""
+Search Index Utilities
+Incremental inverted index with prefix matching
+"""
+
+from bisect import bisect_left, insort
+from typing import Dict, Hashable, Iterable, List, Set
+import re
+import threading
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase alphanumeric tokens"""
+    if not text:
+        return []
+    return _TOKEN_PATTERN.findall(text.lower())
+
+
+class InvertedIndex:
+    """Token to document postings, updated one document at a time
+
+    Tokens are also kept in a sorted list so prefix queries are a bisect
+    plus a scan over the matching token range. Updates and searches hold
+    a lock, since handlers run on a threadpool and a search must never see
+    the token list and postings halfway through an update.
+    """
+
+    def __init__(self):
+        self._postings: Dict[str, Set[Hashable]] = {}
+        self._doc_tokens: Dict[Hashable, Set[str]] = {}
+        self._sorted_tokens: List[str] = []
+        self._lock = threading.Lock()
+
+    def add(self, doc_id: Hashable, texts: Iterable[str]):
+        """Index a document, replacing any previous version of it"""
+        tokens = {token for text in texts for token in tokenize(text)}
+
+        with self._lock:
+            self._remove(doc_id)
+            self._doc_tokens[doc_id] = tokens
+
+            for token in tokens:
+                postings = self._postings.get(token)
+                if postings is None:
+                    postings = self._postings[token] = set()
+                    insort(self._sorted_tokens, token)
+                postings.add(doc_id)
+
+    def remove(self, doc_id: Hashable) -> bool:
+        """Drop a document from the index"""
+        with self._lock:
+            return self._remove(doc_id)
+
+    def _remove(self, doc_id: Hashable) -> bool:
+        tokens = self._doc_tokens.pop(doc_id, None)
+        if tokens is None:
+            return False
+
+        for token in tokens:
+            postings = self._postings[token]
+            postings.discard(doc_id)
+            if not postings:
+                del self._postings[token]
+                position = bisect_left(self._sorted_tokens, token)
+                del self._sorted_tokens[position]
+
+        return True
+
+    def prefix_matches(self, prefix: str) -> Set[Hashable]:
+        """Documents containing any token that starts with prefix"""
+        with self._lock:
+            return self._prefix_matches(prefix)
+
+    def _prefix_matches(self, prefix: str) -> Set[Hashable]:
+        matches: Set[Hashable] = set()
+        position = bisect_left(self._sorted_tokens, prefix)
+
+        while position < len(self._sorted_tokens):
+            token = self._sorted_tokens[position]
+            if not token.startswith(prefix):
+                break
+            matches |= self._postings[token]
+            position += 1
+
+        return matches
+
+    def search(self, query: str) -> Set[Hashable]:
+        """Documents matching every query term as a prefix"""
+        terms = tokenize(query)
+        if not terms:
+            return set()
+
+        # Most selective terms first so the intersection shrinks quickly
+        results = None
+        with self._lock:
+            for term in sorted(set(terms), key=len, reverse=True):
+                matches = self._prefix_matches(term)
+                results = matches if results is None else results & matches
+                if not results:
+                    break
+
+        return results
+
+    def __len__(self) -> int:
+        return len(self._doc_tokens)
@@ -0,0 +1,4 @@
+"""
+Focus Flow Shared
+Session aggregation code used by both the focus engine and the analytics service
+"""
@@ -0,0 +1,515 @@
+"""
+Session Aggregator
+Mergeable partial aggregates over focus sessions
+
+Every aggregate supports add() for single values and an associative,
+commutative merge() so partials built per day, per shard or per worker
+combine into the aggregate for any window without rescanning rows.
+Partials round-trip through to_dict()/from_dict() for storage.
+"""
+
+from abc import ABC, abstractmethod
+from bisect import bisect_right
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Type, TypeVar
+import copy
+import math
+import random
+
+A = TypeVar("A", bound="Aggregate")
+
+
+class Aggregate(ABC):
+    """Base class for mergeable aggregates"""
+
+    # Empty, so subclasses that declare __slots__ really have no __dict__
+    __slots__ = ()
+
+    @abstractmethod
+    def add(self, value: Any):
+        """Fold one value in; None is ignored"""
+        pass
+
+    @abstractmethod
+    def merge(self: A, other: A) -> A:
+        """Fold another partial of the same kind into this one and return self"""
+        pass
+
+    @abstractmethod
+    def to_dict(self) -> Dict[str, Any]:
+        pass
+
+    @classmethod
+    @abstractmethod
+    def from_dict(cls: Type[A], data: Dict[str, Any]) -> A:
+        pass
+
+    def copy(self: A) -> A:
+        return copy.deepcopy(self)
+
+
+def merge_all(partials: Iterable[A], empty: Optional[A] = None) -> Optional[A]:
+    """Merge partials into a new aggregate, leaving the inputs untouched"""
+    result = empty.copy() if empty is not None else None
+    for partial in partials:
+        result = partial.copy() if result is None else result.merge(partial)
+    return result
+
+
+class Count(Aggregate):
+    """Number of non-null values"""
+
+    __slots__ = ("count",)
+
+    def __init__(self, count: int = 0):
+        self.count = count
+
+    def add(self, value: Any = True):
+        if value is not None:
+            self.count += 1
+
+    def merge(self, other: "Count") -> "Count":
+        self.count += other.count
+        return self
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"count": self.count}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Count":
+        return cls(data["count"])
+
+
+class Sum(Aggregate):
+    """Sum of non-null values"""
+
+    __slots__ = ("total",)
+
+    def __init__(self, total: float = 0):
+        self.total = total
+
+    def add(self, value: Optional[float]):
+        if value is not None:
+            self.total += value
+
+    def merge(self, other: "Sum") -> "Sum":
+        self.total += other.total
+        return self
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"total": self.total}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Sum":
+        return cls(data["total"])
+
+
+class Moments(Aggregate):
+    """Count, sum, mean and variance; merged with Chan's parallel formula"""
+
+    __slots__ = ("count", "total", "_mean", "_m2")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self._mean = 0.0
+        self._m2 = 0.0
+
+    def add(self, value: Optional[float]):
+        if value is None:
+            return
+
+        self.count += 1
+        self.total += value
+        delta = value - self._mean
+        self._mean += delta / self.count
+        self._m2 += delta * (value - self._mean)
+
+    def merge(self, other: "Moments") -> "Moments":
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            self.count, self.total, self._mean, self._m2 = other.count, other.total, other._mean, other._m2
+            return self
+
+        count = self.count + other.count
+        delta = other._mean - self._mean
+        self._mean += delta * other.count / count
+        self._m2 += other._m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.total += other.total
+        return self
+
+    @property
+    def mean(self) -> float:
+        return self._mean if self.count else 0
+
+    @property
+    def variance(self) -> float:
+        """Sample variance, matching statistics.variance"""
+        return self._m2 / (self.count - 1) if self.count > 1 else 0
+
+    @property
+    def stdev(self) -> float:
+        return math.sqrt(self.variance)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"count": self.count, "total": self.total, "mean": self._mean, "m2": self._m2}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Moments":
+        moments = cls()
+        moments.count = data["count"]
+        moments.total = data["total"]
+        moments._mean = data["mean"]
+        moments._m2 = data["m2"]
+        return moments
+
+
+class MinMax(Aggregate):
+    """Smallest and largest non-null values"""
+
+    __slots__ = ("min", "max")
+
+    def __init__(self, minimum: Optional[float] = None, maximum: Optional[float] = None):
+        self.min = minimum
+        self.max = maximum
+
+    def add(self, value: Optional[float]):
+        if value is None:
+            return
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def merge(self, other: "MinMax") -> "MinMax":
+        self.add(other.min)
+        self.add(other.max)
+        return self
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"min": self.min, "max": self.max}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "MinMax":
+        return cls(data["min"], data["max"])
+
+
+class Histogram(Aggregate):
+    """Counts per bucket over fixed edges
+
+    Bucket i holds values in [edges[i-1], edges[i]); the first and last
+    buckets catch values below and above the edges. Only histograms with
+    identical edges can be merged.
+    """
+
+    def __init__(self, edges: Sequence[float], counts: Optional[List[int]] = None):
+        self.edges = list(edges)
+        self.counts = list(counts) if counts is not None else [0] * (len(self.edges) + 1)
+
+    def add(self, value: Optional[float]):
+        if value is not None:
+            self.counts[bisect_right(self.edges, value)] += 1
+
+    def merge(self, other: "Histogram") -> "Histogram":
+        if other.edges != self.edges:
+            raise ValueError("Cannot merge histograms with different bucket edges")
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        return self
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"edges": self.edges, "counts": self.counts}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Histogram":
+        return cls(data["edges"], data["counts"])
+
+
+class KLLSketch(Aggregate):
+    """KLL quantile sketch (Karnin, Lang, Liberty 2016)
+
+    Keeps O(k) items in levels of compactors; an item at level h stands for
+    2**h inputs. Rank error is about 1.7/k with high probability, and
+    merging two sketches gives the same guarantee as sketching the union.
+    """
+
+    def __init__(self, k: int = 200, seed: Optional[int] = None):
+        self.k = k
+        self.count = 0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+        self.compactors: List[List[float]] = []
+        self._size = 0
+        self._max_size = 0
+        self._rng = random.Random(seed)
+        self._grow()
+
+    def add(self, value: Optional[float]):
+        if value is None:
+            return
+
+        self.count += 1
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+        self.compactors[0].append(value)
+        self._size += 1
+        if self._size >= self._max_size:
+            self._compress()
+
+    def merge(self, other: "KLLSketch") -> "KLLSketch":
+        while len(self.compactors) < len(other.compactors):
+            self._grow()
+        for height, items in enumerate(other.compactors):
+            self.compactors[height].extend(items)
+
+        self.count += other.count
+        for bound in (other.min, other.max):
+            if bound is not None:
+                self.min = bound if self.min is None else min(self.min, bound)
+                self.max = bound if self.max is None else max(self.max, bound)
+
+        self._size = sum(len(items) for items in self.compactors)
+        while self._size >= self._max_size:
+            self._compress()
+        return self
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Approximate value at quantile q in [0, 1]"""
+        if self.count == 0:
+            return None
+        if q <= 0:
+            return self.min
+        if q >= 1:
+            return self.max
+
+        weighted = self._weighted_items()
+        target = q * sum(weight for _, weight in weighted)
+        cumulative = 0
+        for value, weight in weighted:
+            cumulative += weight
+            if cumulative >= target:
+                return value
+        return self.max
+
+    def rank(self, value: float) -> float:
+        """Approximate fraction of inputs less than or equal to value"""
+        if self.count == 0:
+            return 0.0
+
+        weighted = self._weighted_items()
+        total = sum(weight for _, weight in weighted)
+        below = sum(weight for item, weight in weighted if item <= value)
+        return below / total
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "k": self.k,
+            "count": self.count,
+            "min": self.min,
+            "max": self.max,
+            "compactors": self.compactors
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "KLLSketch":
+        sketch = cls(k=data["k"])
+        while len(sketch.compactors) < len(data["compactors"]):
+            sketch._grow()
+        sketch.compactors = [list(items) for items in data["compactors"]]
+        sketch.count = data["count"]
+        sketch.min = data["min"]
+        sketch.max = data["max"]
+        sketch._size = sum(len(items) for items in sketch.compactors)
+        return sketch
+
+    def _weighted_items(self) -> List[tuple]:
+        weighted = [
+            (value, 1 << height)
+            for height, items in enumerate(self.compactors)
+            for value in items
+        ]
+        weighted.sort(key=lambda pair: pair[0])
+        return weighted
+
+    def _capacity(self, height: int) -> int:
+        depth = len(self.compactors) - height - 1
+        return int(math.ceil(self.k * (2 / 3) ** depth)) + 1
+
+    def _grow(self):
+        self.compactors.append([])
+        self._max_size = sum(self._capacity(height) for height in range(len(self.compactors)))
+
+    def _compress(self):
+        for height in range(len(self.compactors)):
+            if len(self.compactors[height]) >= self._capacity(height):
+                if height + 1 >= len(self.compactors):
+                    self._grow()
+
+                # Keep every other item of the sorted level, starting at random,
+                # and promote them; an odd leftover stays behind
+                items = sorted(self.compactors[height])
+                leftover = [items.pop()] if len(items) % 2 else []
+                offset = self._rng.randint(0, 1)
+                self.compactors[height + 1].extend(items[offset::2])
+                self.compactors[height] = leftover
+
+                self._size = sum(len(level) for level in self.compactors)
+                if self._size < self._max_size:
+                    break
+
+
+class SessionAggregate(Aggregate):
+    """Mergeable totals for a group of sessions (a day, an hour, a type, a shard ...)"""
+
+    __slots__ = (
+        "total_sessions",
+        "completed_sessions",
+        "total_minutes",
+        "completed_minutes",
+        "total_interruptions",
+        "planned_duration",
+        "actual_duration",
+        "productivity"
+    )
+
+    def __init__(self):
+        self.total_sessions = 0
+        self.completed_sessions = 0
+        self.total_minutes = 0
+        self.completed_minutes = 0
+        self.total_interruptions = 0
+        self.planned_duration = Moments()
+        self.actual_duration = Moments()
+        self.productivity = Moments()
+
+    def add(self, session: Any):
+        """Fold one session (any object with the session columns as attributes) in"""
+        minutes = session.actual_duration or session.planned_duration or 0
+
+        self.total_sessions += 1
+        self.total_minutes += minutes
+        if session.status == "completed":
+            self.completed_sessions += 1
+            self.completed_minutes += minutes
+
+        self.total_interruptions += session.interruption_count or 0
+        self.planned_duration.add(session.planned_duration)
+        self.actual_duration.add(session.actual_duration)
+        self.productivity.add(session.productivity_score)
+
+    def merge(self, other: "SessionAggregate") -> "SessionAggregate":
+        self.total_sessions += other.total_sessions
+        self.completed_sessions += other.completed_sessions
+        self.total_minutes += other.total_minutes
+        self.completed_minutes += other.completed_minutes
+        self.total_interruptions += other.total_interruptions
+        self.planned_duration.merge(other.planned_duration)
+        self.actual_duration.merge(other.actual_duration)
+        self.productivity.merge(other.productivity)
+        return self
+
+    @property
+    def completion_rate(self) -> float:
+        return self.completed_sessions / self.total_sessions if self.total_sessions else 0
+
+    @property
+    def average_interruptions(self) -> float:
+        return self.total_interruptions / self.total_sessions if self.total_sessions else 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "total_sessions": self.total_sessions,
+            "completed_sessions": self.completed_sessions,
+            "total_minutes": self.total_minutes,
+            "completed_minutes": self.completed_minutes,
+            "total_interruptions": self.total_interruptions,
+            "planned_duration": self.planned_duration.to_dict(),
+            "actual_duration": self.actual_duration.to_dict(),
+            "productivity": self.productivity.to_dict()
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "SessionAggregate":
+        aggregate = cls()
+        aggregate.total_sessions = data["total_sessions"]
+        aggregate.completed_sessions = data["completed_sessions"]
+        aggregate.total_minutes = data["total_minutes"]
+        aggregate.completed_minutes = data["completed_minutes"]
+        aggregate.total_interruptions = data["total_interruptions"]
+        aggregate.planned_duration = Moments.from_dict(data["planned_duration"])
+        aggregate.actual_duration = Moments.from_dict(data["actual_duration"])
+        aggregate.productivity = Moments.from_dict(data["productivity"])
+        return aggregate
+
+
+class Tally(Aggregate):
+    """Occurrences per category"""
+
+    __slots__ = ("counts",)
+
+    def __init__(self, counts: Optional[Dict[str, int]] = None):
+        self.counts: Dict[str, int] = dict(counts or {})
+
+    def add(self, value: Optional[str]):
+        if value is not None:
+            self.counts[value] = self.counts.get(value, 0) + 1
+
+    def merge(self, other: "Tally") -> "Tally":
+        for key, count in other.counts.items():
+            self.counts[key] = self.counts.get(key, 0) + count
+        return self
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"counts": self.counts}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Tally":
+        return cls(data["counts"])
+
+
+class SessionRollup(Aggregate):
+    """Everything the user stats report needs for a span of sessions
+
+    Kept per user and day, so the stats for any range of days are the
+    merge of that range's rollups.
+    """
+
+    __slots__ = ("totals", "focus_quality", "session_types")
+
+    def __init__(self):
+        self.totals = SessionAggregate()
+        self.focus_quality = Tally()
+        self.session_types = Tally()
+
+    def add(self, session: Any):
+        self.totals.add(session)
+        self.focus_quality.add(session.focus_quality)
+        self.session_types.add(session.session_type or "unknown")
+
+    def merge(self, other: "SessionRollup") -> "SessionRollup":
+        self.totals.merge(other.totals)
+        self.focus_quality.merge(other.focus_quality)
+        self.session_types.merge(other.session_types)
+        return self
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "totals": self.totals.to_dict(),
+            "focus_quality": self.focus_quality.to_dict(),
+            "session_types": self.session_types.to_dict()
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "SessionRollup":
+        rollup = cls()
+        rollup.totals = SessionAggregate.from_dict(data["totals"])
+        rollup.focus_quality = Tally.from_dict(data["focus_quality"])
+        rollup.session_types = Tally.from_dict(data["session_types"])
+        return rollup
@@ -0,0 +1,235 @@
+"""
+Time Series Processor
+Rolling daily focus series updated incrementally per session and per day
+"""
+
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+# Rolling windows maintained for every metric, in days
+WINDOWS = (7, 30, 90)
+
+METRICS = ("focus_minutes", "completion_rate", "productivity")
+
+
+class RollingSum:
+    """Sum of per-day values over the last `span` days, including today
+
+    Days live in a ring buffer indexed by ordinal, so adding a value is
+    O(1) and moving to the next day clears a single slot.
+    """
+
+    __slots__ = ("span", "total", "_slots", "_day")
+
+    def __init__(self, span: int, day: int = 0):
+        self.span = span
+        self.total = 0.0
+        self._slots = [0.0] * span
+        self._day = day
+
+    def advance(self, day: int):
+        """Move today forward to the given day ordinal"""
+        if day <= self._day:
+            return
+        if day - self._day >= self.span:
+            self._slots = [0.0] * self.span
+            self.total = 0.0
+        else:
+            for expired in range(self._day + 1, day + 1):
+                slot = expired % self.span
+                self.total -= self._slots[slot]
+                self._slots[slot] = 0.0
+        self._day = day
+
+    def add(self, day: int, value: float):
+        """Add a value to a day; days that have left the window are ignored"""
+        if self._day - self.span < day <= self._day:
+            self._slots[day % self.span] += value
+            self.total += value
+
+    def nonzero_days(self) -> int:
+        return sum(1 for value in self._slots if value)
+
+
+class Ewma:
+    """Exponentially weighted moving average with span-style smoothing (alpha = 2 / (span + 1))"""
+
+    __slots__ = ("alpha", "value")
+
+    def __init__(self, span: int):
+        self.alpha = 2 / (span + 1)
+        self.value: Optional[float] = None
+
+    def update(self, observation: float, repeat: int = 1):
+        """Fold in an observation seen `repeat` days in a row, in O(1)"""
+        if self.value is None:
+            self.value = observation
+            return
+        keep = (1 - self.alpha) ** repeat
+        self.value = observation + (self.value - observation) * keep
+
+
+class DailyTotals:
+    """Totals for a single day"""
+
+    __slots__ = ("sessions", "completed", "minutes", "productivity_total", "productivity_count")
+
+    def __init__(self):
+        self.sessions = 0
+        self.completed = 0
+        self.minutes = 0
+        self.productivity_total = 0.0
+        self.productivity_count = 0
+
+    def values(self) -> Tuple[int, int, int, float, int]:
+        return self.sessions, self.completed, self.minutes, self.productivity_total, self.productivity_count
+
+
+class UserTimeSeries:
+    """Rolling 7/30/90-day sums, means and EWMAs of a user's daily focus
+
+    Sessions are bucketed by start_date. add_session() and each day
+    boundary cost O(1) per window, so a cached series can be kept current
+    as sessions complete instead of being recomputed from raw rows.
+    EWMAs fold in each day's value once the day has closed: focus minutes
+    treat idle days as 0, while completion rate and productivity only
+    move on days with sessions.
+    """
+
+    def __init__(self, today: date):
+        self.today = today
+        self._today_totals = DailyTotals()
+        self._sums: Dict[int, Dict[str, RollingSum]] = {
+            span: {
+                name: RollingSum(span, today.toordinal())
+                for name in ("sessions", "completed", "minutes", "productivity_total", "productivity_count")
+            }
+            for span in WINDOWS
+        }
+        self._ewmas: Dict[int, Dict[str, Ewma]] = {
+            span: {metric: Ewma(span) for metric in METRICS}
+            for span in WINDOWS
+        }
+
+    @classmethod
+    def from_sessions(cls, sessions: Iterable[Any], today: date) -> "UserTimeSeries":
+        """Build a series from sessions ordered by start time"""
+        first = today - timedelta(days=max(WINDOWS) - 1)
+        series = None
+        for session in sessions:
+            if session.start_date < first:
+                continue
+            if series is None:
+                series = cls(session.start_date)
+            series.add_session(session)
+
+        if series is None:
+            series = cls(today)
+        series.advance_to(today)
+        return series
+
+    def add_session(self, session: Any):
+        """Fold one finished session into its start day"""
+        day = session.start_date
+        if day > self.today:
+            self.advance_to(day)
+
+        completed = 1 if session.status == "completed" else 0
+        minutes = session.actual_duration or session.planned_duration or 0
+        productivity = session.productivity_score
+
+        if day == self.today:
+            totals = self._today_totals
+            totals.sessions += 1
+            totals.completed += completed
+            totals.minutes += minutes
+            if productivity is not None:
+                totals.productivity_total += productivity
+                totals.productivity_count += 1
+
+        # Late arrivals for closed days still count towards the rolling sums;
+        # the closed days' EWMA contributions are not revisited
+        ordinal = day.toordinal()
+        for sums in self._sums.values():
+            sums["sessions"].add(ordinal, 1)
+            sums["completed"].add(ordinal, completed)
+            sums["minutes"].add(ordinal, minutes)
+            if productivity is not None:
+                sums["productivity_total"].add(ordinal, productivity)
+                sums["productivity_count"].add(ordinal, 1)
+
+    def advance_to(self, day: date):
+        """Close every day before `day`, folding today's values into the EWMAs"""
+        if day <= self.today:
+            return
+
+        sessions, completed, minutes, productivity_total, productivity_count = self._today_totals.values()
+        idle_days = (day - self.today).days - 1
+
+        for ewmas in self._ewmas.values():
+            ewmas["focus_minutes"].update(minutes)
+            if idle_days:
+                ewmas["focus_minutes"].update(0, repeat=idle_days)
+            if sessions:
+                ewmas["completion_rate"].update(completed / sessions)
+            if productivity_count:
+                ewmas["productivity"].update(productivity_total / productivity_count)
+
+        ordinal = day.toordinal()
+        for sums in self._sums.values():
+            for rolling in sums.values():
+                rolling.advance(ordinal)
+
+        self.today = day
+        self._today_totals = DailyTotals()
+
+    def active_days(self, span: int) -> int:
+        """Days with at least one session in a rolling window"""
+        return self._sums[span]["sessions"].nonzero_days()
+
+    def window(self, span: int) -> Dict[str, Any]:
+        """Sums, daily means and EWMAs for one rolling window"""
+        sums = {name: rolling.total for name, rolling in self._sums[span].items()}
+        ewmas = self._ewmas[span]
+
+        return {
+            "days": span,
+            "total_sessions": int(sums["sessions"]),
+            "completed_sessions": int(sums["completed"]),
+            "total_focus_time_minutes": int(sums["minutes"]),
+            "average_daily_focus_minutes": round(sums["minutes"] / span, 1),
+            "completion_rate": round(sums["completed"] / sums["sessions"], 3) if sums["sessions"] else 0,
+            "average_productivity_score": (
+                round(sums["productivity_total"] / sums["productivity_count"], 2)
+                if sums["productivity_count"] else 0
+            ),
+            "ewma": {
+                metric: round(ewma.value, 3) if ewma.value is not None else None
+                for metric, ewma in ewmas.items()
+            }
+        }
+
+    def trend(self, metric: str, tolerance: float, short: int = 7, long: int = 30,
+              min_active_days: int = 5) -> str:
+        """Compare the short and long EWMAs of a metric
+
+        Returns improving/declining when the short average is more than
+        `tolerance` above/below the long one, stable otherwise.
+        """
+        short_value = self._ewmas[short][metric].value
+        long_value = self._ewmas[long][metric].value
+        if short_value is None or long_value is None or self.active_days(long) < min_active_days:
+            return "insufficient_data"
+
+        if short_value - long_value > tolerance:
+            return "improving"
+        elif long_value - short_value > tolerance:
+            return "declining"
+        else:
+            return "stable"
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "as_of": self.today.isoformat(),
+            "windows": {f"{span}d": self.window(span) for span in WINDOWS}
+        }
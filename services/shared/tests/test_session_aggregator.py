@@ -0,0 +1,124 @@
+"""
+Tests for mergeable session aggregates
+"""
+
+from types import SimpleNamespace
+import random
+import statistics
+
+import pytest
+
+from focus_flow_shared.session_aggregator import (
+    Count, Histogram, KLLSketch, MinMax, Moments, SessionAggregate, SessionRollup, Sum, Tally, merge_all
+)
+
+
+def session(**overrides):
+    return SimpleNamespace(**{
+        "status": "completed",
+        "session_type": "deep_work",
+        "planned_duration": 50,
+        "actual_duration": 45,
+        "productivity_score": 7.0,
+        "interruption_count": 1,
+        "focus_quality": "good",
+        **overrides
+    })
+
+
+def build(aggregate_type, values, *args):
+    aggregate = aggregate_type(*args)
+    for value in values:
+        aggregate.add(value)
+    return aggregate
+
+
+def test_moments_merge_matches_a_single_pass():
+    values = [random.Random(1).uniform(0, 100) for _ in range(1000)]
+    parts = [build(Moments, values[start:start + 137]) for start in range(0, len(values), 137)]
+
+    merged = merge_all(parts)
+
+    assert merged.count == len(values)
+    assert merged.mean == pytest.approx(statistics.mean(values))
+    assert merged.variance == pytest.approx(statistics.variance(values))
+    assert parts[0].count == 137
+
+
+def test_merge_is_associative():
+    chunks = [[1, 5, 9], [2, 2], [7, 100, -3]]
+    left = build(Moments, chunks[0]).merge(build(Moments, chunks[1])).merge(build(Moments, chunks[2]))
+    right = build(Moments, chunks[0]).merge(build(Moments, chunks[1]).merge(build(Moments, chunks[2])))
+
+    assert left.mean == pytest.approx(right.mean)
+    assert left.variance == pytest.approx(right.variance)
+
+
+def test_minmax_and_histogram_merge():
+    merged = build(MinMax, [3, 8]).merge(build(MinMax, [None, -1]))
+    assert (merged.min, merged.max) == (-1, 8)
+
+    edges = [10, 20, 30]
+    histogram = build(Histogram, [5, 15], edges).merge(build(Histogram, [25, 35, 15], edges))
+    assert histogram.counts == [1, 2, 1, 1]
+    assert Histogram.from_dict(histogram.to_dict()).counts == histogram.counts
+
+    with pytest.raises(ValueError):
+        histogram.merge(Histogram([1, 2]))
+
+
+def test_kll_merge_keeps_rank_error_bounded():
+    rng = random.Random(7)
+    values = [rng.gauss(50, 15) for _ in range(50000)]
+    shards = [build(KLLSketch, values[start::8], 200) for start in range(8)]
+
+    merged = merge_all(shards, KLLSketch(200))
+
+    assert merged.count == len(values)
+    ordered = sorted(values)
+    for q in (0.1, 0.25, 0.5, 0.75, 0.9):
+        true_value = ordered[int(q * len(ordered))]
+        assert merged.rank(true_value) == pytest.approx(q, abs=0.02)
+    assert sum(len(items) for items in merged.compactors) < 2000
+
+
+def test_kll_round_trips_through_dict():
+    sketch = build(KLLSketch, range(10000), 100)
+    restored = KLLSketch.from_dict(sketch.to_dict())
+
+    assert restored.count == sketch.count
+    assert restored.quantile(0.5) == sketch.quantile(0.5)
+    restored.merge(build(KLLSketch, range(10000, 20000), 100))
+    assert restored.rank(10000) == pytest.approx(0.5, abs=0.03)
+
+
+def test_session_rollup_merge_equals_rollup_of_union():
+    sessions = [
+        session(),
+        session(status="cancelled", actual_duration=10, focus_quality="poor"),
+        session(session_type=None, productivity_score=None, interruption_count=None),
+        session(session_type="pomodoro", actual_duration=None, planned_duration=25)
+    ]
+    whole = build(SessionRollup, sessions)
+    merged = build(SessionRollup, sessions[:2]).merge(build(SessionRollup, sessions[2:]))
+
+    assert merged.to_dict() == whole.to_dict()
+    assert merged.totals.total_minutes == 45 + 10 + 45 + 25
+    assert merged.totals.completed_sessions == 3
+    assert merged.session_types.counts == {"deep_work": 2, "unknown": 1, "pomodoro": 1}
+    assert SessionRollup.from_dict(whole.to_dict()).to_dict() == whole.to_dict()
+
+
+def test_merge_all_leaves_inputs_untouched():
+    parts = [build(SessionAggregate, [session()]) for _ in range(3)]
+
+    merged = merge_all(parts, SessionAggregate())
+
+    assert merged.total_sessions == 3
+    assert [part.total_sessions for part in parts] == [1, 1, 1]
+    assert merge_all([]) is None
+
+
+@pytest.mark.parametrize("aggregate", [Count, Sum, Moments, MinMax, SessionAggregate, Tally, SessionRollup])
+def test_slotted_aggregates_have_no_instance_dict(aggregate):
+    assert not hasattr(aggregate(), "__dict__")
@@ -0,0 +1,71 @@
+"""
+Tests for incrementally maintained rolling time series
+"""
+
+from datetime import date, timedelta
+from types import SimpleNamespace
+import random
+
+import pytest
+
+from focus_flow_shared.time_series_processor import UserTimeSeries, WINDOWS
+
+TODAY = date(2026, 3, 18)
+
+
+def sessions(count: int, days: int = 120, seed: int = 3):
+    rng = random.Random(seed)
+    rows = []
+    for _ in range(count):
+        rows.append(SimpleNamespace(
+            start_date=TODAY - timedelta(days=rng.randrange(days)),
+            status=rng.choice(["completed", "completed", "cancelled"]),
+            actual_duration=rng.randrange(5, 60),
+            planned_duration=50,
+            productivity_score=rng.choice([None, rng.uniform(1, 10)])
+        ))
+    return sorted(rows, key=lambda row: row.start_date)
+
+
+@pytest.mark.parametrize("span", WINDOWS)
+def test_window_sums_match_a_rescan(span):
+    rows = sessions(500)
+    series = UserTimeSeries.from_sessions(rows, TODAY)
+
+    in_window = [row for row in rows if row.start_date > TODAY - timedelta(days=span)]
+    window = series.window(span)
+
+    assert window["total_sessions"] == len(in_window)
+    assert window["total_focus_time_minutes"] == sum(row.actual_duration for row in in_window)
+    assert window["completed_sessions"] == sum(row.status == "completed" for row in in_window)
+    assert series.active_days(span) == len({row.start_date for row in in_window})
+
+
+def test_incremental_updates_match_a_rebuild():
+    # Both builds must start from the same first day for their EWMAs to agree
+    rows = sessions(300, days=60)
+    cutoff = TODAY - timedelta(days=20)
+
+    series = UserTimeSeries.from_sessions([row for row in rows if row.start_date <= cutoff], cutoff)
+    for row in rows:
+        if row.start_date > cutoff:
+            series.add_session(row)
+    series.advance_to(TODAY)
+
+    assert series.snapshot() == UserTimeSeries.from_sessions(rows, TODAY).snapshot()
+
+
+def test_idle_days_decay_focus_minutes():
+    series = UserTimeSeries(TODAY)
+    series.add_session(SimpleNamespace(
+        start_date=TODAY, status="completed", actual_duration=60, planned_duration=50, productivity_score=8.0
+    ))
+    series.advance_to(TODAY + timedelta(days=1))
+    after_one_day = series.window(7)["ewma"]["focus_minutes"]
+
+    series.advance_to(TODAY + timedelta(days=10))
+
+    assert series.window(7)["total_sessions"] == 0
+    assert series.window(30)["total_sessions"] == 1
+    assert series.window(7)["ewma"]["focus_minutes"] < after_one_day
+    assert series.window(7)["ewma"]["productivity"] == 8.0